@@ -5,6 +5,8 @@ from flask import Blueprint, request, jsonify, send_from_directory
 from flask import current_app as app
 from werkzeug.utils import secure_filename
 from database import get_connection
+from data_versions import conditional_get
+from query_cache import cached, invalidates
 
 eln_bp = Blueprint("eln", __name__)
 
@@ -20,9 +22,12 @@ BASE_UPLOAD = MEDIA_ROOT
 VIDEO_DIR = os.path.join(BASE_UPLOAD, "videos")
 COVER_DIR = os.path.join(BASE_UPLOAD, "covers")
 
-# Tạo thư mục trên UNC share (đòi hỏi service account có quyền ghi)
-os.makedirs(VIDEO_DIR, exist_ok=True)
-os.makedirs(COVER_DIR, exist_ok=True)
+
+def ensure_media_dirs():
+    """Tạo thư mục trên UNC share (đòi hỏi service account có quyền ghi); gọi từ bootstrap, không chạy lúc import."""
+    os.makedirs(VIDEO_DIR, exist_ok=True)
+    os.makedirs(COVER_DIR, exist_ok=True)
+
 
 ALLOWED_IMAGE = {"png", "jpg", "jpeg", "gif", "webp"}
 ALLOWED_VIDEO = {"mp4", "mov", "avi", "mkv", "webm"}
@@ -56,6 +61,7 @@ def _save_file(file_storage, folder, allow_set):
     ext = fname.rsplit(".", 1)[1].lower()
     new_name = f"{uuid.uuid4().hex}.{ext}"
 
+    os.makedirs(folder, exist_ok=True)
     abs_path = os.path.join(folder, new_name)
     file_storage.save(abs_path)
 
@@ -122,6 +128,8 @@ def serve_cover(filename):
 
 # ========== APIs ==========
 @eln_bp.route("/eln", methods=["GET"])
+@conditional_get("eln")
+@cached("eln")
 def list_eln():
     conn = get_connection()
     cur = conn.cursor(dictionary=True)
@@ -177,6 +185,7 @@ def get_eln(item_id):
 
 
 @eln_bp.route("/eln/<int:item_id>", methods=["PUT"])
+@invalidates("eln")
 def update_eln(item_id):
     title = request.form.get("title", "").strip()
     positions = request.form.get("positions")
@@ -267,11 +276,12 @@ def update_eln(item_id):
 
         cur4 = conn.cursor(dictionary=True)
         cur4.execute("""
-            SELECT employee_id
+            SELECT employee_id, status
             FROM nsh.eln_employee_courses
             WHERE course_id = %s
         """, (item_id,))
-        existing_emps = {r["employee_id"] for r in cur4.fetchall()}
+        existing_status = {r["employee_id"]: r["status"] for r in cur4.fetchall()}
+        existing_emps = set(existing_status)
         cur4.close()
 
         to_insert = list(target_emps - existing_emps)
@@ -356,26 +366,18 @@ def update_eln(item_id):
                 )
                 curSI3.close()
 
-        # 2b) Tính lại counter cho môn học
-        cur_cnt = conn.cursor(dictionary=True)
-        cur_cnt.execute("""
-            SELECT
-              COUNT(*) AS total,
-              SUM(CASE WHEN ket_qua = 'pass' THEN 1 ELSE 0 END) AS passed
-            FROM nsh.eln_employee_courses
-            WHERE course_id = %s
-        """, (item_id,))
-        cnt = cur_cnt.fetchone() or {"total": 0, "passed": 0}
-        cur_cnt.close()
-
-        cur_upd_count = conn.cursor()
-        cur_upd_count.execute("""
-            UPDATE eln
-            SET tong_nhan_vien_hoc = %s,
-                so_nhan_vien_hoan_thanh = %s
-            WHERE id = %s
-        """, (cnt["total"] or 0, cnt["passed"] or 0, item_id))
-        cur_upd_count.close()
+        # 2b) Cập nhật counter môn học theo số dòng vừa thêm / xoá (không đếm lại toàn bảng;
+        #     job eln_counter_reconcile trong jobs.py đối soát định kỳ)
+        if to_insert or to_delete:
+            deleted_passed = sum(1 for eid in to_delete if (existing_status[eid] or "").strip().lower() == "pass")
+            cur_upd_count = conn.cursor()
+            cur_upd_count.execute("""
+                UPDATE eln
+                SET tong_nhan_vien_hoc = GREATEST(COALESCE(tong_nhan_vien_hoc, 0) + %s - %s, 0),
+                    so_nhan_vien_hoan_thanh = GREATEST(COALESCE(so_nhan_vien_hoan_thanh, 0) - %s, 0)
+                WHERE id = %s
+            """, (len(to_insert), len(to_delete), deleted_passed, item_id))
+            cur_upd_count.close()
 
         conn.commit()
 
@@ -410,6 +412,7 @@ def update_eln(item_id):
 
 
 @eln_bp.route("/eln", methods=["POST"])
+@invalidates("eln")
 def create_eln():
     title = request.form.get("title", "").strip()
     positions = request.form.get("positions", "")
@@ -546,6 +549,7 @@ def create_eln():
 
 
 @eln_bp.route("/eln/<int:item_id>", methods=["DELETE"])
+@invalidates("eln")
 def delete_eln(item_id):
     conn = get_connection()
     cur = conn.cursor(dictionary=True)
@@ -1,9 +1,7 @@
 # ELearning/eln_courses.py
 from flask import Blueprint, request, jsonify
 from mysql.connector import Error
-from database import get_connection
-from datetime import date, datetime
-from decimal import Decimal
+from database import get_connection, READ
 
 eln_courses_bp = Blueprint("eln_courses", __name__)
 
@@ -17,30 +15,6 @@ COLUMNS = [
 ]
 
 
-# -----------------------------
-# Các hàm tiện ích xử lý JSON
-# -----------------------------
-def _to_jsonable(v):
-    if isinstance(v, (datetime, date)):
-        return v.isoformat()
-    if isinstance(v, Decimal):
-        return int(v) if v == int(v) else float(v)
-    if isinstance(v, (bytes, bytearray)):
-        try:
-            return v.decode("utf-8")
-        except Exception:
-            return v.hex()
-    if isinstance(v, set):
-        return sorted(list(v))
-    if isinstance(v, list) and len(v) == 1:
-        return v[0]
-    return v
-
-
-def _serialize_row(row: dict) -> dict:
-    return {k: _to_jsonable(v) for k, v in row.items()}
-
-
 # -----------------------------
 # Hàm phụ: Lấy vị trí nhân viên
 # -----------------------------
@@ -70,7 +44,7 @@ def get_courses_by_employee():
 
     conn = None
     try:
-        conn = get_connection()
+        conn = get_connection(READ)
 
         # 1️⃣ Lấy vị trí công việc của nhân viên
         with conn.cursor(dictionary=True) as cur:
@@ -132,7 +106,7 @@ def get_courses_by_employee():
             rows = cur.fetchall() or []
 
         # 3️⃣ Trả danh sách kết quả (không bao giờ null)
-        return jsonify([_serialize_row(x) for x in rows]), 200
+        return jsonify(rows), 200
 
     except Exception as e:
         return jsonify({"error": "SERVER_ERROR", "message": str(e)}), 500
@@ -164,7 +138,7 @@ def get_quiz_submissions_by_employee_and_course():
 
     conn = None
     try:
-        conn = get_connection()
+        conn = get_connection(READ)
         sql = """
             SELECT
                 id,
@@ -182,7 +156,7 @@ def get_quiz_submissions_by_employee_and_course():
             rows = cur.fetchall() or []
 
         # Trả luôn mảng (kể cả rỗng)
-        return jsonify([_serialize_row(r) for r in rows]), 200
+        return jsonify(rows), 200
 
     except Exception as e:
         return jsonify({"error": "SERVER_ERROR", "message": str(e)}), 500
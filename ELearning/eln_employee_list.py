@@ -1,8 +1,7 @@
 # eln_employee_list.py
 # -*- coding: utf-8 -*-
 from flask import Blueprint, request, jsonify
-from decimal import Decimal
-from database import get_connection
+from database import get_connection, READ
 
 eln_employee_bp = Blueprint("eln_employee_bp", __name__)
 
@@ -39,20 +38,10 @@ def employees_with_status():
     conn = None
     cur = None
     try:
-        conn = get_connection()
+        conn = get_connection(READ)
         cur = conn.cursor(dictionary=True)
         cur.execute(sql, (limit, offset))
         rows = cur.fetchall()
-
-        # Chuẩn hoá kiểu ngày cho JSON
-        for r in rows:
-            v = r.get("ngay_vao_cong_ty")
-            if v is not None:
-                try:
-                    r["ngay_vao_cong_ty"] = v.isoformat()
-                except Exception:
-                    r["ngay_vao_cong_ty"] = str(v)
-
         return jsonify(rows)
     except Exception as ex:
         return jsonify({"error": str(ex)}), 500
@@ -77,7 +66,7 @@ def get_employee_courses():
     conn = None
     cur = None
     try:
-        conn = get_connection()
+        conn = get_connection(READ)
         cur = conn.cursor(dictionary=True)
 
         sql = """
@@ -95,15 +84,6 @@ def get_employee_courses():
         """
         cur.execute(sql)
         rows = cur.fetchall()
-
-        # Chuẩn hoá kiểu dữ liệu cho JSON (date/datetime, decimal)
-        for r in rows:
-            for key, val in r.items():
-                if isinstance(val, Decimal):
-                    r[key] = float(val)
-                elif hasattr(val, "isoformat"):
-                    r[key] = val.isoformat()
-
         return jsonify(rows)
     except Exception as ex:
         return jsonify({"error": str(ex)}), 500
@@ -155,21 +135,10 @@ def get_employee_courses_by_employee(employee_id: int):
     conn = None
     cur = None
     try:
-        conn = get_connection()
+        conn = get_connection(READ)
         cur = conn.cursor(dictionary=True)
         cur.execute(sql, (employee_id, limit, offset))
         rows = cur.fetchall()
-
-        # Chuẩn hoá kiểu dữ liệu cho JSON
-        for r in rows:
-            for k, v in list(r.items()):
-                # Decimal -> float
-                if isinstance(v, Decimal):
-                    r[k] = float(v)
-                # date/datetime -> ISO string
-                elif hasattr(v, "isoformat"):
-                    r[k] = v.isoformat()
-
         return jsonify(rows)
     except Exception as ex:
         return jsonify({"error": str(ex)}), 500
@@ -276,28 +245,10 @@ def get_employees_by_course():
     conn = None
     cur = None
     try:
-        conn = get_connection()
+        conn = get_connection(READ)
         cur = conn.cursor(dictionary=True)
         cur.execute(base_sql, params)
         rows = cur.fetchall()
-
-        # Chuẩn hoá dữ liệu trả về (Decimal -> float, date/datetime -> ISO string)
-        for r in rows:
-            # Chuẩn hoá entry_date và ngay
-            for k in ["entry_date", "ngay"]:
-                v = r.get(k)
-                if hasattr(v, "isoformat"):
-                    try:
-                        r[k] = v.isoformat()
-                    except Exception:
-                        r[k] = str(v)
-
-            # Các trường số thập phân (nếu có)
-            for k, v in list(r.items()):
-                from decimal import Decimal as _D
-                if isinstance(v, _D):
-                    r[k] = float(v)
-
         return jsonify(rows)
     except Exception as ex:
         return jsonify({"error": str(ex)}), 500
@@ -0,0 +1,196 @@
+# eln_reminders.py
+# Nhắc nhân viên các môn học quá hạn / sắp đến hạn (thoi_gian_yeu_cau do eln_request đặt).
+#
+#   - Quét eln_employee_courses theo khoảng hạn [hôm nay - LOOKBACK, hôm nay + DUE_SOON] trên index
+#     idx_eec_deadline, bỏ môn đã pass và các nhắc đã gửi (anti-join eln_reminder_log) ngay trong query.
+#   - Gom theo nhân viên => 1 thông báo tổng hợp / người / lượt chạy (không phải 1 thông báo / môn).
+#   - Ghi theo lô: INSERT nhiều dòng eln_notifications + eln_reminder_log, commit từng lô.
+#   - Chống trùng: mỗi (nhân viên, môn, hạn) nhắc tối đa 1 lần "sắp đến hạn" và 1 lần "quá hạn";
+#     đổi hạn mới (eln_request) => được nhắc lại theo hạn mới.
+#
+# Chạy qua scheduler (job eln_course_reminders trong jobs.py), hoặc tay:
+#   python -m ELearning.eln_reminders [--dry-run]   (chạy ở thư mục gốc)
+import argparse
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+from database import get_connection
+
+REMINDER_LOG_TABLE = "nsh.eln_reminder_log"
+REMINDER_DUE_SOON_DAYS = int(os.getenv("REMINDER_DUE_SOON_DAYS", "3"))
+REMINDER_OVERDUE_LOOKBACK_DAYS = int(os.getenv("REMINDER_OVERDUE_LOOKBACK_DAYS", "90"))
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "500"))  # số nhân viên / lô
+REMINDER_MAX_ITEMS = 5  # số môn liệt kê trong 1 nhóm, còn lại ghi "và N môn khác"
+
+DUE_SOON = "due_soon"
+OVERDUE = "overdue"
+
+
+# ======================
+# DDL
+# ======================
+def ensure_reminder_tables():
+    """Bảng log nhắc + index theo hạn trên eln_employee_courses (tạo nếu chưa có)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {REMINDER_LOG_TABLE} (
+                employee_id INT NOT NULL,
+                course_id   INT NOT NULL,
+                deadline    DATE NOT NULL,
+                kind        VARCHAR(16) NOT NULL,
+                sent_at     DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (employee_id, course_id, deadline, kind),
+                KEY idx_reminder_sent (sent_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        cursor.execute("""
+            SELECT 1
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = 'nsh'
+              AND TABLE_NAME = 'eln_employee_courses'
+              AND INDEX_NAME = 'idx_eec_deadline'
+            LIMIT 1
+        """)
+        if cursor.fetchone() is None:
+            cursor.execute("""
+                ALTER TABLE nsh.eln_employee_courses
+                    ADD KEY idx_eec_deadline (thoi_gian_yeu_cau, employee_id)
+            """)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# ======================
+# Quét + gom nhóm
+# ======================
+def _fetch_pending(cursor, today):
+    cursor.execute(f"""
+        SELECT ec.employee_id, ec.course_id, ec.thoi_gian_yeu_cau AS deadline, e.title,
+               CASE WHEN ec.thoi_gian_yeu_cau < %s THEN '{OVERDUE}' ELSE '{DUE_SOON}' END AS kind
+        FROM nsh.eln_employee_courses ec
+        JOIN nsh.eln e ON e.id = ec.course_id
+        LEFT JOIN {REMINDER_LOG_TABLE} l
+               ON l.employee_id = ec.employee_id
+              AND l.course_id = ec.course_id
+              AND l.deadline = ec.thoi_gian_yeu_cau
+              AND l.kind = CASE WHEN ec.thoi_gian_yeu_cau < %s THEN '{OVERDUE}' ELSE '{DUE_SOON}' END
+        WHERE ec.thoi_gian_yeu_cau >= %s
+          AND ec.thoi_gian_yeu_cau <= %s
+          AND COALESCE(ec.status, '') <> 'pass'
+          AND l.employee_id IS NULL
+        ORDER BY ec.employee_id, ec.thoi_gian_yeu_cau
+    """, (
+        today, today,
+        today - timedelta(days=REMINDER_OVERDUE_LOOKBACK_DAYS),
+        today + timedelta(days=REMINDER_DUE_SOON_DAYS),
+    ))
+    return cursor.fetchall()
+
+
+def _format_items(items):
+    parts = [f"{it['title']} (hạn {it['deadline'].strftime('%d/%m/%Y')})" for it in items[:REMINDER_MAX_ITEMS]]
+    if len(items) > REMINDER_MAX_ITEMS:
+        parts.append(f"và {len(items) - REMINDER_MAX_ITEMS} môn khác")
+    return ", ".join(parts)
+
+
+def build_digest(items):
+    """Nội dung 1 thông báo tổng hợp cho 1 nhân viên."""
+    overdue = [it for it in items if it["kind"] == OVERDUE]
+    due_soon = [it for it in items if it["kind"] == DUE_SOON]
+    lines = []
+    if overdue:
+        lines.append(f"Bạn có {len(overdue)} môn học đã quá hạn: {_format_items(overdue)}.")
+    if due_soon:
+        lines.append(f"Bạn có {len(due_soon)} môn học sắp đến hạn: {_format_items(due_soon)}.")
+    return " ".join(lines)
+
+
+def _group_by_employee(rows):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row["employee_id"], []).append(row)
+    return grouped
+
+
+# ======================
+# Gửi
+# ======================
+def send_course_reminders(dry_run=False, today=None):
+    """Trả thống kê; dry_run=True chỉ quét + dựng nội dung, không ghi DB."""
+    today = today or date.today()
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        rows = _fetch_pending(cursor, today)
+        grouped = _group_by_employee(rows)
+        stats = {
+            "items": len(rows),
+            "employees": len(grouped),
+            "overdue": sum(1 for r in rows if r["kind"] == OVERDUE),
+            "due_soon": sum(1 for r in rows if r["kind"] == DUE_SOON),
+            "notifications": 0,
+            "batches": 0,
+        }
+        if dry_run:
+            stats["preview"] = {eid: build_digest(items) for eid, items in list(grouped.items())[:20]}
+            return stats
+
+        employee_ids = list(grouped)
+        for start in range(0, len(employee_ids), REMINDER_BATCH_SIZE):
+            batch = employee_ids[start:start + REMINDER_BATCH_SIZE]
+            notifications = [(eid, build_digest(grouped[eid])) for eid in batch]
+            logs = [
+                (it["employee_id"], it["course_id"], it["deadline"], it["kind"])
+                for eid in batch for it in grouped[eid]
+            ]
+            # executemany với INSERT ... VALUES được connector gộp thành 1 câu nhiều dòng
+            cursor.executemany("""
+                INSERT INTO nsh.eln_notifications (employee_id, content, status, created_at)
+                VALUES (%s, %s, 'unread', NOW())
+            """, notifications)
+            cursor.executemany(f"""
+                INSERT IGNORE INTO {REMINDER_LOG_TABLE} (employee_id, course_id, deadline, kind)
+                VALUES (%s, %s, %s, %s)
+            """, logs)
+            conn.commit()
+            stats["notifications"] += len(notifications)
+            stats["batches"] += 1
+        return stats
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def purge_reminder_log():
+    """Log của hạn đã ra khỏi khoảng quét thì không còn cần để chống trùng."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            DELETE FROM {REMINDER_LOG_TABLE}
+            WHERE deadline < CURDATE() - INTERVAL %s DAY
+        """, (REMINDER_OVERDUE_LOOKBACK_DAYS + 1,))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gửi nhắc học môn quá hạn / sắp đến hạn")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ quét và in nội dung, không ghi DB")
+    args = parser.parse_args()
+    ensure_reminder_tables()
+    print(json.dumps(send_course_reminders(dry_run=args.dry_run), ensure_ascii=False, default=str, indent=2))
+    sys.exit(0)
@@ -2,34 +2,13 @@
 from datetime import datetime
 from flask import Blueprint, request, jsonify
 from database import get_connection  # dùng kết nối có sẵn
+from data_versions import read_only
+from query_cache import invalidates
 
 eln_request_bp = Blueprint("eln_request", __name__)
 
-def cleanup_old_notifications(conn):
-    """
-    Xoá thông báo đã đọc quá 30 ngày.
-    Gọi hàm này sau khi tạo thông báo mới.
-    """
-    cur = None
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            DELETE FROM nsh.eln_notifications
-            WHERE status = 'read'
-              AND created_at < DATE_SUB(NOW(), INTERVAL 30 DAY)
-            """
-        )
-        # Không commit ở đây, để hàm gọi chủ động commit một lần.
-    finally:
-        try:
-            if cur:
-                cur.close()
-        except:
-            pass
-
-
 @eln_request_bp.route("/eln/request", methods=["POST"])
+@invalidates("eln")  # reopen từ pass giảm so_nhan_vien_hoan_thanh
 def request_course_deadline():
     """
     API cập nhật thời gian yêu cầu học và tạo thông báo cho nhân viên.
@@ -191,9 +170,6 @@ def request_course_deadline():
             (employee_id, content),
         )
 
-        # Sau khi tạo thông báo mới -> xoá các thông báo đã đọc quá 30 ngày
-        cleanup_old_notifications(conn)
-
         conn.commit()
         return jsonify({
             "message": "Đã cập nhật thành công và tạo thông báo mới.",
@@ -224,6 +200,7 @@ def request_course_deadline():
 
 
 @eln_request_bp.route("/eln/notifications", methods=["POST"])
+@read_only  # tra cứu, body JSON
 def get_notifications_by_employee():
     """
     Body JSON:
@@ -295,6 +272,7 @@ def get_notifications_by_employee():
 # API: Đánh dấu thông báo đã đọc
 # ============================
 @eln_request_bp.route("/eln/notifications/read/<int:notification_id>", methods=["PUT"])
+@read_only  # chỉ ghi eln_notifications, không đổi dữ liệu nhóm eln
 def mark_notification_as_read(notification_id):
     """
     Cập nhật trạng thái thông báo từ 'unread' sang 'read' theo ID.
@@ -352,6 +330,7 @@ def mark_notification_as_read(notification_id):
 # API: Đánh dấu thông báo CHƯA ĐỌC
 # ============================
 @eln_request_bp.route("/eln/notifications/unread/<int:notification_id>", methods=["PUT"])
+@read_only  # chỉ ghi eln_notifications, không đổi dữ liệu nhóm eln
 def mark_notification_as_unread(notification_id):
     """
     Cập nhật trạng thái thông báo về 'unread' theo ID.
@@ -449,6 +428,7 @@ def count_notifications(employee_id):
             if conn: conn.close()
         except: pass
 @eln_request_bp.route("/eln/notifications/delete", methods=["POST"])
+@read_only  # chỉ ghi eln_notifications, không đổi dữ liệu nhóm eln
 def delete_notification():
     """
     Body JSON:
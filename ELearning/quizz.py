@@ -3,6 +3,7 @@ from flask import Blueprint, request, jsonify, make_response
 from typing import Dict, Any, List, Optional
 from mysql.connector import Error
 from database import get_connection
+from query_cache import invalidates
 
 bp = Blueprint("eln_quiz", __name__, url_prefix="/eln")
 
@@ -226,6 +227,7 @@ def upsert_quiz(course_id: int):
 
 # ========= CORS preflight cho submit =========
 @bp.post("/<int:course_id>/quiz/submit")
+@invalidates("eln")  # tăng so_nhan_vien_hoan_thanh
 def submit_quiz_result(course_id: int):
     """
     Nhận kết quả nộp bài cho một employee trong một course và cập nhật:
@@ -0,0 +1,186 @@
+# allocation_graph.py
+# Chỉ mục đồ thị phân bổ (goal người gửi -> goal người nhận -> ...) theo từng mbo_year, cache trong bộ nhớ.
+# Dùng cho GET /allocations/graph: trả về cả cây phân bổ nhiều cấp của 1 mục tiêu trong 1 request,
+# kèm tổng giá trị phân bổ và tỉ lệ hoàn thành cộng dồn ở mỗi node.
+import os
+import re
+import threading
+import time
+
+from data_versions import ALLOCATIONS, bump_data_version, get_data_version
+from database import get_connection
+from schema_registry import has_column
+
+# Chỉ mục gắn version nhóm "mbo_allocations" (bảng data_versions, dùng chung mọi worker) => ghi ở worker nào
+# thì worker khác cũng build lại sau tối đa DATA_VERSION_TTL giây; TTL chỉ là giới hạn trên.
+ALLOCATION_GRAPH_TTL = int(os.getenv("ALLOCATION_GRAPH_TTL", "120"))
+
+_NUMBER_RE = re.compile(r"^\s*(-?\d+(?:[.,]\d+)?)\s*(%?)\s*$")
+_RATING_COLUMNS = ("approved_ey_rating", "reviewed_ey_rating", "self_ey_rating")  # ưu tiên từ trái sang
+
+_lock = threading.Lock()
+_indexes = {}  # mbo_year -> AllocationIndex
+
+
+def bump_allocation_version():
+    """Gọi sau khi commit thay đổi mbo_allocations hoặc mục tiêu có phân bổ."""
+    return bump_data_version(ALLOCATIONS)[ALLOCATIONS]
+
+
+def _parse_value(value):
+    """'30' -> (30.0, False); '10%' -> (10.0, True); chuỗi khác -> (None, False)."""
+    match = _NUMBER_RE.match(str(value or ""))
+    if not match:
+        return None, False
+    return float(match.group(1).replace(",", ".")), bool(match.group(2))
+
+
+class AllocationIndex:
+    """
+    Đồ thị phân bổ của 1 năm:
+    - goals:    goal_id -> thông tin mục tiêu (người sở hữu, tên, muc_tieu, rating)
+    - children: goal_id -> [cạnh phân bổ] (mỗi cạnh trỏ tới receiver_goal_id)
+    Cây của từng goal được build 1 lần rồi memo lại.
+    """
+
+    def __init__(self, version, mbo_year, allocations, goals, names):
+        self.version = version
+        self.mbo_year = mbo_year
+        self.loaded_at = time.monotonic()
+        self.goals = goals
+        self.names = names
+        self.children = {}
+        self.roots_by_sender = {}
+        received = set()
+        for a in allocations:
+            self.children.setdefault(a["goal_id"], []).append(a)
+            if a.get("receiver_goal_id"):
+                received.add(a["receiver_goal_id"])
+        for goal_id, edges in self.children.items():
+            if goal_id not in received:
+                sender = str(edges[0]["sender_code"])
+                self.roots_by_sender.setdefault(sender, []).append(goal_id)
+        self._trees = {}
+        self._trees_lock = threading.Lock()
+
+    def _node(self, goal_id, edge, seen):
+        goal = self.goals.get(goal_id) or {}
+        owner = goal.get("employee_code") or (edge or {}).get("receiver_code")
+        rating = next((goal.get(c) for c in _RATING_COLUMNS if goal.get(c)), None)
+
+        node = {
+            "goal_id": goal_id,
+            "employee_code": owner,
+            "full_name": self.names.get(str(owner)),
+            "ten_muc_tieu": goal.get("ten_muc_tieu"),
+            "don_vi_do_luong": goal.get("don_vi_do_luong"),
+            "muc_tieu": goal.get("muc_tieu"),
+            "rating": rating,
+            "completed": rating is not None,
+            "allocation_id": edge["id"] if edge else None,
+            "allocation_value": edge["allocation_value"] if edge else None,
+            "children": [],
+        }
+
+        allocated, allocated_pct = 0.0, 0.0
+        descendants = completed = 0
+        for child in self.children.get(goal_id, []) if goal_id not in seen else []:
+            value, is_pct = _parse_value(child["allocation_value"])
+            if value is not None:
+                if is_pct:
+                    allocated_pct += value
+                else:
+                    allocated += value
+            child_goal = child.get("receiver_goal_id")
+            child_node = self._node(child_goal, child, seen | {goal_id})
+            node["children"].append(child_node)
+            descendants += 1 + child_node["totals"]["descendants"]
+            completed += int(child_node["completed"]) + child_node["totals"]["completed"]
+
+        node["totals"] = {
+            "receivers": len(node["children"]),
+            "allocated_value": allocated,
+            "allocated_percent": allocated_pct,
+            "descendants": descendants,
+            "completed": completed,
+            "completion_rate": round(completed / descendants, 4) if descendants else None,
+        }
+        return node
+
+    def tree(self, goal_id):
+        """Cây phân bổ bắt đầu từ goal_id (memo theo index); None nếu goal không có trong năm."""
+        with self._trees_lock:
+            cached = self._trees.get(goal_id)
+        if cached:
+            return cached
+        if goal_id not in self.goals and goal_id not in self.children:
+            return None
+        node = self._node(goal_id, None, frozenset())
+        with self._trees_lock:
+            self._trees[goal_id] = node
+        return node
+
+    def sender_roots(self, sender_code):
+        return list(self.roots_by_sender.get(str(sender_code), []))
+
+
+def _load_index(version, mbo_year):
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        has_receiver_goal = has_column("mbo_allocations", "receiver_goal_id")
+        cursor.execute(f"""
+            SELECT id, goal_id, sender_code, receiver_code, allocation_value,
+                   {'receiver_goal_id' if has_receiver_goal else 'NULL AS receiver_goal_id'}
+            FROM mbo_allocations
+            WHERE mbo_year = %s
+            ORDER BY id
+        """, (mbo_year,))
+        allocations = cursor.fetchall()
+
+        goal_ids = {a["goal_id"] for a in allocations} | {
+            a["receiver_goal_id"] for a in allocations if a["receiver_goal_id"]
+        }
+        rating_cols = [c for c in _RATING_COLUMNS if has_column("personalmbo", c)]
+        goals = {}
+        if goal_ids:
+            ids = sorted(goal_ids)
+            placeholders = ", ".join(["%s"] * len(ids))
+            extra = "".join(f", {c}" for c in rating_cols)
+            cursor.execute(f"""
+                SELECT id, employee_code, ten_muc_tieu, don_vi_do_luong, muc_tieu{extra}
+                FROM personalmbo
+                WHERE id IN ({placeholders})
+            """, ids)
+            goals = {row["id"]: row for row in cursor.fetchall()}
+
+        codes = sorted({str(a["sender_code"]) for a in allocations} | {str(a["receiver_code"]) for a in allocations})
+        names = {}
+        if codes:
+            placeholders = ", ".join(["%s"] * len(codes))
+            cursor.execute(
+                f"SELECT employee_code, full_name FROM employees2026 WHERE employee_code IN ({placeholders})",
+                codes,
+            )
+            names = {str(row["employee_code"]): row["full_name"] for row in cursor.fetchall()}
+    finally:
+        cursor.close()
+        conn.close()
+
+    return AllocationIndex(version, mbo_year, allocations, goals, names)
+
+
+def get_allocation_index(mbo_year) -> AllocationIndex:
+    """Chỉ mục của năm; build lại khi version đổi hoặc quá TTL."""
+    version = get_data_version(ALLOCATIONS)
+    index = _indexes.get(mbo_year)
+    if index and index.version == version and time.monotonic() - index.loaded_at < ALLOCATION_GRAPH_TTL:
+        return index
+
+    with _lock:
+        index = _indexes.get(mbo_year)
+        if index and index.version == version and time.monotonic() - index.loaded_at < ALLOCATION_GRAPH_TTL:
+            return index
+        index = _load_index(version, mbo_year)
+        _indexes[mbo_year] = index
+        return index
@@ -1,5 +1,12 @@
+
 from flask import Blueprint, request, jsonify
 from database import get_connection
+from schema_registry import has_column, has_table
+from MBO.receiver_goal_backfill import backfill_receiver_goal_ids
+from MBO.allocation_graph import get_allocation_index, bump_allocation_version
+from data_versions import read_only
+from http_cache import make_etag, is_not_modified, not_modified_response, json_response
+from json_provider import dumps_bytes as dumps_json_bytes
 
 # Blueprint
 allocations_bp = Blueprint("allocations", __name__)
@@ -17,56 +24,6 @@ def _require_mbo_year(payload):
         return None
     return year
 
-# ======================
-# Schema helpers
-# ======================
-def _table_has_column(cursor, table, column):
-    cursor.execute(
-        """
-        SELECT 1
-        FROM information_schema.COLUMNS
-        WHERE TABLE_SCHEMA = DATABASE()
-          AND TABLE_NAME = %s
-          AND COLUMN_NAME = %s
-        LIMIT 1
-    """,
-        (table, column),
-    )
-    return cursor.fetchone() is not None
-
-
-def _has_receiver_goal_id(cursor):
-    cursor.execute("SHOW COLUMNS FROM mbo_allocations LIKE 'receiver_goal_id'")
-    return cursor.fetchone() is not None
-
-
-def _table_has_table(cursor, schema_table):
-    """
-    Kiểm tra sự tồn tại của bảng (hỗ trợ cả dạng 'nsh.personalmbo' hoặc chỉ 'personalmbo').
-    """
-    if "." in schema_table:
-        schema, table = schema_table.split(".", 1)
-        cursor.execute(
-            """
-            SELECT 1 FROM information_schema.TABLES
-            WHERE TABLE_SCHEMA=%s AND TABLE_NAME=%s
-            LIMIT 1
-            """,
-            (schema, table),
-        )
-    else:
-        table = schema_table
-        cursor.execute(
-            """
-            SELECT 1 FROM information_schema.TABLES
-            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME=%s
-            LIMIT 1
-            """,
-            (table,),
-        )
-    return cursor.fetchone() is not None
-
-
 # ======================
 # Domain helpers
 # ======================
@@ -75,7 +32,7 @@ def _fetch_sender_goal(cursor, goal_id, sender_code, mbo_year):
     """
     Lấy record nguồn từ personalmbo theo id + employee_code (+ mbo_year nếu có cột).
     """
-    has_year = _table_has_column(cursor, "personalmbo", "mbo_year")
+    has_year = has_column("personalmbo", "mbo_year")
     select_sql = f"""
         SELECT id, employee_code{', mbo_year' if has_year else ''},
                ten_muc_tieu, mo_ta, don_vi_do_luong,
@@ -100,8 +57,8 @@ def _insert_receiver_goal(cursor, receiver_code, mbo_year, src_goal, allocation_
     - nếu có cột phan_loai => set 'nhan'
     - nếu có cột mbo_year => chèn năm
     """
-    has_year = _table_has_column(cursor, "personalmbo", "mbo_year")
-    has_phan_loai = _table_has_column(cursor, "personalmbo", "phan_loai")
+    has_year = has_column("personalmbo", "mbo_year")
+    has_phan_loai = has_column("personalmbo", "phan_loai")
 
     if has_year and has_phan_loai:
         cursor.execute(
@@ -209,48 +166,122 @@ def _insert_receiver_goal(cursor, receiver_code, mbo_year, src_goal, allocation_
     return cursor.lastrowid
 
 
-def _guess_receiver_goal_id(cursor, sender_goal_row, receiver_code, mbo_year, expected_muc_tieu):
+_INSERT_BATCH_SIZE = 500
+
+
+def _fetch_sender_goals(cursor, keys):
     """
-    Dò id record đã copy khi không có receiver_goal_id (fallback).
-    Thêm điều kiện theo schema động:
-      - nếu có mbo_year => lọc theo năm
-      - nếu có phan_loai => ép phan_loai = 'nhan'
+    Lấy nhiều mục tiêu nguồn trong 1 query.
+    keys: iterable (goal_id, sender_code, mbo_year) -> {key: row}
+    (kiểm tra employee_code / mbo_year trong Python, giống điều kiện của _fetch_sender_goal).
     """
-    has_year = _table_has_column(cursor, "personalmbo", "mbo_year")
-    has_phan_loai = _table_has_column(cursor, "personalmbo", "phan_loai")
-
-    year_cond = "AND mbo_year = %s" if has_year else ""
-    phanloai_cond = "AND phan_loai = 'nhan'" if has_phan_loai else ""
-
-    sql = f"""
-        SELECT id FROM personalmbo
-        WHERE employee_code = %s
-          {year_cond}
-          AND ten_muc_tieu = %s AND mo_ta = %s
-          AND don_vi_do_luong = %s
-          AND IFNULL(gia_tri_ban_dau,'') = IFNULL(%s,'')
-          AND IFNULL(han_hoan_thanh,'') = IFNULL(%s,'')
-          AND muc_tieu = %s
-          {phanloai_cond}
-        ORDER BY id DESC
-        LIMIT 1
+    keys = set(keys)
+    if not keys:
+        return {}
+    has_year = has_column("personalmbo", "mbo_year")
+    goal_ids = sorted({int(k[0]) for k in keys if str(k[0]).isdigit()})
+    if not goal_ids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(goal_ids))
+    cursor.execute(f"""
+        SELECT id, employee_code{', mbo_year' if has_year else ''},
+               ten_muc_tieu, mo_ta, don_vi_do_luong,
+               gia_tri_ban_dau, muc_tieu, han_hoan_thanh,
+               created_at, updated_at
+        FROM personalmbo
+        WHERE id IN ({placeholders})
+    """, goal_ids)
+    by_id = {row["id"]: row for row in cursor.fetchall()}
+
+    result = {}
+    for key in keys:
+        goal_id, sender_code, mbo_year = key
+        row = by_id.get(int(goal_id)) if str(goal_id).isdigit() else None
+        if not row or str(row["employee_code"]).strip().lower() != str(sender_code).strip().lower():
+            continue
+        if has_year and row.get("mbo_year") != mbo_year:
+            continue
+        result[key] = row
+    return result
+
+
+def _insert_receiver_goals(cursor, items):
     """
+    Copy nhiều goal sang người nhận bằng INSERT nhiều dòng.
+    items: [(receiver_code, mbo_year, src_goal, allocation_value)] -> [id mới] (cùng thứ tự).
 
-    params = [receiver_code]
-    if has_year:
-        params.append(mbo_year)
-    params += [
-        sender_goal_row["ten_muc_tieu"],
-        sender_goal_row["mo_ta"],
-        sender_goal_row["don_vi_do_luong"],
-        sender_goal_row["gia_tri_ban_dau"],
-        sender_goal_row["han_hoan_thanh"],
-        str(expected_muc_tieu),
+    Id lấy từ LAST_INSERT_ID() (id dòng đầu) + auto_increment_increment, sau đó đối chiếu lại;
+    nếu không khớp (vd. autoinc không liên tục) thì quay về SAVEPOINT và insert từng dòng.
+    """
+    if not items:
+        return []
+    has_year = has_column("personalmbo", "mbo_year")
+    has_phan_loai = has_column("personalmbo", "phan_loai")
+
+    cols = ["employee_code"] + (["mbo_year"] if has_year else []) + [
+        "ten_muc_tieu", "mo_ta", "don_vi_do_luong",
+        "gia_tri_ban_dau", "muc_tieu", "han_hoan_thanh",
     ]
+    row_sql = "(" + ", ".join(["%s"] * len(cols)) + (", 'nhan'" if has_phan_loai else "") + ", NOW(), NOW())"
+    col_sql = ", ".join(cols + (["phan_loai"] if has_phan_loai else []) + ["created_at", "updated_at"])
+
+    cursor.execute("SELECT @@auto_increment_increment AS inc")
+    step = int(cursor.fetchone()["inc"] or 1)
+
+    ids = []
+    for start in range(0, len(items), _INSERT_BATCH_SIZE):
+        chunk = items[start:start + _INSERT_BATCH_SIZE]
+        params = []
+        for receiver_code, mbo_year, src, allocation_value in chunk:
+            params.append(receiver_code)
+            if has_year:
+                params.append(mbo_year)
+            params += [
+                src["ten_muc_tieu"], src["mo_ta"], src["don_vi_do_luong"],
+                src["gia_tri_ban_dau"], str(allocation_value), src["han_hoan_thanh"],
+            ]
+
+        cursor.execute("SAVEPOINT receiver_goals_batch")
+        cursor.execute(
+            f"INSERT INTO personalmbo ({col_sql}) VALUES {', '.join([row_sql] * len(chunk))}",
+            params,
+        )
+        first_id = cursor.lastrowid
+        chunk_ids = [first_id + i * step for i in range(len(chunk))]
+
+        id_placeholders = ", ".join(["%s"] * len(chunk_ids))
+        cursor.execute(f"SELECT id, employee_code FROM personalmbo WHERE id IN ({id_placeholders})", chunk_ids)
+        found = {row["id"]: str(row["employee_code"]) for row in cursor.fetchall()}
+        if all(found.get(i) == str(item[0]) for i, item in zip(chunk_ids, chunk)):
+            cursor.execute("RELEASE SAVEPOINT receiver_goals_batch")
+            ids.extend(chunk_ids)
+            continue
+
+        # Id không liên tục -> huỷ lô này, insert từng dòng để lấy đúng id
+        cursor.execute("ROLLBACK TO SAVEPOINT receiver_goals_batch")
+        for receiver_code, mbo_year, src, allocation_value in chunk:
+            ids.append(_insert_receiver_goal(cursor, receiver_code, mbo_year, src, allocation_value))
+    return ids
+
+
+def _insert_allocations(cursor, rows, has_receiver_goal):
+    """rows: [(goal_id, sender_code, receiver_code, mbo_year, allocation_value, receiver_goal_id)]"""
+    if has_receiver_goal:
+        cols = "(goal_id, sender_code, receiver_code, mbo_year, allocation_value, receiver_goal_id, created_at)"
+        row_sql = "(%s, %s, %s, %s, %s, %s, NOW())"
+    else:
+        cols = "(goal_id, sender_code, receiver_code, mbo_year, allocation_value, created_at)"
+        row_sql = "(%s, %s, %s, %s, %s, NOW())"
+        rows = [r[:5] for r in rows]
 
-    cursor.execute(sql, params)
-    row = cursor.fetchone()
-    return row["id"] if row else None
+    for start in range(0, len(rows), _INSERT_BATCH_SIZE):
+        chunk = rows[start:start + _INSERT_BATCH_SIZE]
+        params = [v for r in chunk for v in r]
+        cursor.execute(
+            f"INSERT INTO mbo_allocations {cols} VALUES {', '.join([row_sql] * len(chunk))}",
+            params,
+        )
+    return len(rows)
 
 
 # ======================
@@ -269,20 +300,20 @@ def _reset_mbo_to_draft_by_codes(cursor, employee_codes, mbo_year):
     # Dò bảng có prefix schema hay không
     TABLE_COMP = "competencymbo"
     TABLE_PERS = "personalmbo"
-    if _table_has_table(cursor, "nsh.competencymbo"):
+    if has_table("nsh.competencymbo"):
         TABLE_COMP = "nsh.competencymbo"
-    if _table_has_table(cursor, "nsh.personalmbo"):
+    if has_table("nsh.personalmbo"):
         TABLE_PERS = "nsh.personalmbo"
 
-    has_comp_year = _table_has_column(cursor, TABLE_COMP.split(".")[-1], "mbo_year")
-    has_pers_year = _table_has_column(cursor, TABLE_PERS.split(".")[-1], "mbo_year")
+    has_comp_year = has_column(TABLE_COMP, "mbo_year")
+    has_pers_year = has_column(TABLE_PERS, "mbo_year")
 
-    has_comp_rev = _table_has_column(cursor, TABLE_COMP.split(".")[-1], "reviewer_ti_trong")
-    has_comp_app = _table_has_column(cursor, TABLE_COMP.split(".")[-1], "approver_ti_trong")
-    has_pers_rev = _table_has_column(cursor, TABLE_PERS.split(".")[-1], "reviewer_ti_trong")
-    has_pers_app = _table_has_column(cursor, TABLE_PERS.split(".")[-1], "approver_ti_trong")
-    has_pers_rr  = _table_has_column(cursor, TABLE_PERS.split(".")[-1], "reviewer_rating")
-    has_pers_ar  = _table_has_column(cursor, TABLE_PERS.split(".")[-1], "approver_rating")
+    has_comp_rev = has_column(TABLE_COMP, "reviewer_ti_trong")
+    has_comp_app = has_column(TABLE_COMP, "approver_ti_trong")
+    has_pers_rev = has_column(TABLE_PERS, "reviewer_ti_trong")
+    has_pers_app = has_column(TABLE_PERS, "approver_ti_trong")
+    has_pers_rr  = has_column(TABLE_PERS, "reviewer_rating")
+    has_pers_ar  = has_column(TABLE_PERS, "approver_rating")
 
     affected_comp = affected_pers = drafted = 0
 
@@ -355,6 +386,70 @@ def _reset_mbo_to_draft_by_codes(cursor, employee_codes, mbo_year):
     }
 
 
+def _create_allocations(cursor, data):
+    """
+    Tạo phân bổ theo lô (trong transaction của caller):
+      1 query lấy mục tiêu nguồn -> INSERT nhiều dòng personalmbo -> INSERT nhiều dòng mbo_allocations
+      -> reset người nhận theo từng năm (set-based).
+    """
+    has_receiver_goal = has_column("mbo_allocations", "receiver_goal_id")
+    skipped = []
+
+    valid = []  # [(idx, goal_id, sender_code, receiver_code, allocation_value, mbo_year)]
+    for idx, item in enumerate(data):
+        goal_id = item.get("goal_id")
+        sender_code = item.get("sender_code")
+        receiver_code = item.get("receiver_code")
+        allocation_value = item.get("allocation_value")  # giữ KIỂU CHUỖI
+        mbo_year = _require_mbo_year(item)
+
+        if not all([goal_id, sender_code, receiver_code]) or allocation_value is None or mbo_year is None:
+            skipped.append(idx)
+            continue
+        valid.append((idx, goal_id, sender_code, receiver_code, allocation_value, mbo_year))
+
+    # 1) Lấy mục tiêu nguồn từ người gửi (1 query)
+    sources = _fetch_sender_goals(cursor, [(v[1], v[2], v[5]) for v in valid])
+
+    copies = []
+    for idx, goal_id, sender_code, receiver_code, allocation_value, mbo_year in valid:
+        src = sources.get((goal_id, sender_code, mbo_year))
+        if not src:
+            skipped.append(idx)
+            continue
+        copies.append((goal_id, sender_code, receiver_code, allocation_value, mbo_year, src))
+    skipped.sort()
+
+    # 2) Copy sang người nhận (muc_tieu = allocation_value, phan_loai='nhan' nếu có)
+    receiver_goal_ids = _insert_receiver_goals(
+        cursor, [(c[2], c[4], c[5], c[3]) for c in copies]
+    )
+
+    # 3) Ghi phân bổ
+    inserted = _insert_allocations(cursor, [
+        (goal_id, sender_code, receiver_code, mbo_year, str(allocation_value), rg_id)
+        for (goal_id, sender_code, receiver_code, allocation_value, mbo_year, _), rg_id
+        in zip(copies, receiver_goal_ids)
+    ], has_receiver_goal)
+
+    # 4) Reset trạng thái cho các nhân viên nhận bị ảnh hưởng theo từng năm
+    impacted_by_year = {}  # {mbo_year: set(receiver_codes)}
+    for _, _, receiver_code, _, mbo_year, _ in copies:
+        impacted_by_year.setdefault(mbo_year, set()).add(receiver_code)
+
+    reset_summary = {}
+    for year, codes in impacted_by_year.items():
+        reset_summary[str(year)] = _reset_mbo_to_draft_by_codes(cursor, list(codes), year)
+
+    return {
+        "inserted": inserted,
+        "copied_personalmbo": len(receiver_goal_ids),
+        "skipped_indexes": skipped,
+        # bổ sung thông tin reset (không phá vỡ logic cũ)
+        "reset": reset_summary,
+    }
+
+
 # =========================
 # Tạo danh sách phân bổ + copy mục tiêu (+ reset)
 # =========================
@@ -376,72 +471,14 @@ def create_allocations():
     try:
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
-        has_receiver_goal = _has_receiver_goal_id(cursor)
-
-        inserted, skipped, copied = 0, [], 0
-
-        # Thu thập người nhận bị ảnh hưởng theo từng năm (để reset đúng năm)
-        impacted_by_year = {}  # {mbo_year: set(receiver_codes)}
-
-        for idx, item in enumerate(data):
-            goal_id = item.get("goal_id")
-            sender_code = item.get("sender_code")
-            receiver_code = item.get("receiver_code")
-            allocation_value = item.get("allocation_value")  # giữ KIỂU CHUỖI
-            mbo_year = _require_mbo_year(item)
-
-            if not all([goal_id, sender_code, receiver_code]) or allocation_value is None or mbo_year is None:
-                skipped.append(idx)
-                continue
-
-            # 1) Lấy mục tiêu nguồn từ người gửi
-            src = _fetch_sender_goal(cursor, goal_id, sender_code, mbo_year)
-            if not src:
-                skipped.append(idx)
-                continue
-
-            # 2) Copy sang người nhận (muc_tieu = allocation_value, phan_loai='nhan' nếu có)
-            receiver_goal_id = _insert_receiver_goal(cursor, receiver_code, mbo_year, src, allocation_value)
-            copied += 1
-
-            # 3) Ghi phân bổ
-            if has_receiver_goal:
-                cursor.execute(
-                    """
-                    INSERT INTO mbo_allocations
-                        (goal_id, sender_code, receiver_code, mbo_year, allocation_value, receiver_goal_id, created_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, NOW())
-                """,
-                    (goal_id, sender_code, receiver_code, mbo_year, str(allocation_value), receiver_goal_id),
-                )
-            else:
-                cursor.execute(
-                    """
-                    INSERT INTO mbo_allocations
-                        (goal_id, sender_code, receiver_code, mbo_year, allocation_value, created_at)
-                    VALUES (%s, %s, %s, %s, %s, NOW())
-                """,
-                    (goal_id, sender_code, receiver_code, mbo_year, str(allocation_value)),
-                )
-
-            inserted += 1
-            impacted_by_year.setdefault(mbo_year, set()).add(receiver_code)
-
-        # 4) Reset trạng thái cho các nhân viên nhận bị ảnh hưởng theo từng năm
-        reset_summary = {}
-        for year, codes in impacted_by_year.items():
-            if codes:
-                reset_summary[str(year)] = _reset_mbo_to_draft_by_codes(cursor, list(codes), year)
+        result = _create_allocations(cursor, data)
 
         conn.commit()
+        bump_allocation_version()
         return jsonify(
             {
                 "message": "Thêm danh sách phân bổ thành công và đã copy mục tiêu.",
-                "inserted": inserted,
-                "copied_personalmbo": copied,
-                "skipped_indexes": skipped,
-                # bổ sung thông tin reset (không phá vỡ logic cũ)
-                "reset": reset_summary,
+                **result,
             }
         ), 201
 
@@ -460,6 +497,19 @@ def create_allocations():
             pass
 
 
+# =================
+# Phân bổ cũ chưa có receiver_goal_id: không sửa / xoá được mục tiêu đã copy
+# =================
+def _receiver_goal_missing(allocation_id: int):
+    """409 + hướng dẫn chạy backfill (không đoán mục tiêu theo nội dung, không để sót bản copy)."""
+    return jsonify({
+        "error": "Phân bổ cũ chưa có receiver_goal_id nên không định vị được mục tiêu đã copy của người nhận. "
+                 "Chạy POST /allocations/backfill-receiver-goals rồi thử lại.",
+        "id": allocation_id,
+        "backfill": "/allocations/backfill-receiver-goals",
+    }), 409
+
+
 # =========================
 # Cập nhật giá trị phân bổ + cập nhật muc_tieu người nhận (+ reset)
 # =========================
@@ -492,8 +542,6 @@ def update_allocation_value(allocation_id: int):
                 """
                 SELECT id, goal_id, sender_code, receiver_code, mbo_year, allocation_value, 
                        created_at,
-                       (SELECT COUNT(*) FROM information_schema.COLUMNS 
-                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='mbo_allocations' AND COLUMN_NAME='receiver_goal_id') AS has_receiver_goal_id,
                        receiver_goal_id
                 FROM mbo_allocations
                 WHERE id = %s AND sender_code = %s
@@ -506,8 +554,6 @@ def update_allocation_value(allocation_id: int):
                 """
                 SELECT id, goal_id, sender_code, receiver_code, mbo_year, allocation_value, 
                        created_at,
-                       (SELECT COUNT(*) FROM information_schema.COLUMNS 
-                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='mbo_allocations' AND COLUMN_NAME='receiver_goal_id') AS has_receiver_goal_id,
                        receiver_goal_id
                 FROM mbo_allocations
                 WHERE id = %s
@@ -520,6 +566,12 @@ def update_allocation_value(allocation_id: int):
         if not alloc:
             return jsonify({"error": "Không tìm thấy bản ghi phù hợp để cập nhật"}), 404
 
+        receiver_goal_id = None
+        if has_column("mbo_allocations", "receiver_goal_id"):
+            receiver_goal_id = alloc.get("receiver_goal_id")
+        if not receiver_goal_id:
+            return _receiver_goal_missing(allocation_id)
+
         # 2) Cập nhật allocation_value tại bảng phân bổ (giữ chuỗi)
         if sender_code_cond:
             cursor.execute(
@@ -545,40 +597,20 @@ def update_allocation_value(allocation_id: int):
             return jsonify({"error": "Không cập nhật được allocation_value"}), 400
 
         # 3) Cập nhật muc_tieu của goal đã copy cho người nhận
-        receiver_goal_id = None
-        has_receiver_goal = bool(alloc["has_receiver_goal_id"])
-
-        if has_receiver_goal and alloc.get("receiver_goal_id"):
-            receiver_goal_id = alloc["receiver_goal_id"]
-        else:
-            # Dự phòng: đoán id dựa theo fingerprint của goal nguồn
-            src = _fetch_sender_goal(cursor, alloc["goal_id"], alloc["sender_code"], alloc["mbo_year"])
-            if src:
-                receiver_goal_id = _guess_receiver_goal_id(
-                    cursor,
-                    src,
-                    alloc["receiver_code"],
-                    alloc["mbo_year"],
-                    expected_muc_tieu=alloc["allocation_value"],  # muc_tieu trước đó bằng allocation_value cũ (chuỗi)
-                )
-
-        if receiver_goal_id:
-            cursor.execute(
-                """
-                UPDATE personalmbo
-                SET muc_tieu = %s, updated_at = NOW()
-                WHERE id = %s
-            """,
-                (allocation_value, receiver_goal_id),
-            )
-        else:
-            conn.rollback()
-            return jsonify({"error": "Không định vị được mục tiêu đã copy của người nhận để cập nhật"}), 500
+        cursor.execute(
+            """
+            UPDATE personalmbo
+            SET muc_tieu = %s, updated_at = NOW()
+            WHERE id = %s
+        """,
+            (allocation_value, receiver_goal_id),
+        )
 
         # 4) Reset trạng thái người nhận (không đổi logic trả về cũ)
         reset_info = _reset_mbo_to_draft_by_codes(cursor, [alloc["receiver_code"]], alloc["mbo_year"])
 
         conn.commit()
+        bump_allocation_version()
         return jsonify(
             {
                 "message": "Cập nhật allocation_value và mục tiêu người nhận thành công",
@@ -625,13 +657,11 @@ def delete_allocation(allocation_id: int):
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
 
-        # 1) Lấy record phân bổ để biết receiver_goal_id / fallback info
+        # 1) Lấy record phân bổ để biết receiver_goal_id
         if sender_code_cond:
             cursor.execute(
                 """
                 SELECT id, goal_id, sender_code, receiver_code, mbo_year, allocation_value,
-                       (SELECT COUNT(*) FROM information_schema.COLUMNS 
-                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='mbo_allocations' AND COLUMN_NAME='receiver_goal_id') AS has_receiver_goal_id,
                        receiver_goal_id
                 FROM mbo_allocations
                 WHERE id = %s AND sender_code = %s
@@ -643,8 +673,6 @@ def delete_allocation(allocation_id: int):
             cursor.execute(
                 """
                 SELECT id, goal_id, sender_code, receiver_code, mbo_year, allocation_value,
-                       (SELECT COUNT(*) FROM information_schema.COLUMNS 
-                        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='mbo_allocations' AND COLUMN_NAME='receiver_goal_id') AS has_receiver_goal_id,
                        receiver_goal_id
                 FROM mbo_allocations
                 WHERE id = %s
@@ -656,23 +684,12 @@ def delete_allocation(allocation_id: int):
         if not alloc:
             return jsonify({"error": "Không tìm thấy bản ghi để xoá"}), 404
 
-        # 2) Tìm id mục tiêu đã copy bên personalmbo
+        # 2) id mục tiêu đã copy bên personalmbo; chưa có => từ chối xoá (tránh để sót bản copy)
         receiver_goal_id = None
-        has_receiver_goal = bool(alloc["has_receiver_goal_id"])
-
-        if has_receiver_goal and alloc.get("receiver_goal_id"):
-            receiver_goal_id = alloc["receiver_goal_id"]
-        else:
-            # fallback đoán id
-            src = _fetch_sender_goal(cursor, alloc["goal_id"], alloc["sender_code"], alloc["mbo_year"])
-            if src:
-                receiver_goal_id = _guess_receiver_goal_id(
-                    cursor,
-                    src,
-                    alloc["receiver_code"],
-                    alloc["mbo_year"],
-                    expected_muc_tieu=alloc["allocation_value"],  # chuỗi
-                )
+        if has_column("mbo_allocations", "receiver_goal_id"):
+            receiver_goal_id = alloc.get("receiver_goal_id")
+        if not receiver_goal_id:
+            return _receiver_goal_missing(allocation_id)
 
         # 3) Xoá phân bổ
         if sender_code_cond:
@@ -686,18 +703,17 @@ def delete_allocation(allocation_id: int):
             conn.rollback()
             return jsonify({"error": "Không xoá được phân bổ"}), 400
 
-        # 4) Xoá mục tiêu đã copy (nếu tìm được)
-        if receiver_goal_id:
-            cursor.execute("DELETE FROM personalmbo WHERE id = %s", (receiver_goal_id,))
+        # 4) Xoá mục tiêu đã copy
+        cursor.execute("DELETE FROM personalmbo WHERE id = %s", (receiver_goal_id,))
 
         # 5) Reset trạng thái người nhận
         reset_info = _reset_mbo_to_draft_by_codes(cursor, [alloc["receiver_code"]], alloc["mbo_year"])
 
         conn.commit()
+        bump_allocation_version()
         return jsonify(
             {
-                "message": "Xoá phân bổ thành công"
-                + (" và đã xoá mục tiêu đã copy" if receiver_goal_id else " (không tìm thấy mục tiêu để xoá)"),
+                "message": "Xoá phân bổ thành công và đã xoá mục tiêu đã copy",
                 "id": allocation_id,
                 "receiver_goal_id": receiver_goal_id,
                 # bổ sung để FE biết các nhân viên bị reset
@@ -724,6 +740,7 @@ def delete_allocation(allocation_id: int):
 # Lấy danh sách phân bổ theo người gửi (GET/POST)
 # =================
 @allocations_bp.route("/allocations/by-sender", methods=["GET", "POST"])
+@read_only
 def get_allocations_by_sender():
     """
     Hỗ trợ:
@@ -805,3 +822,57 @@ def get_allocations_by_sender():
                 conn.close()
         except Exception:
             pass
+
+
+# =========================
+# Cây phân bổ nhiều cấp (cascade) của 1 mục tiêu
+# =========================
+@allocations_bp.route("/allocations/graph", methods=["GET"])
+def get_allocation_graph():
+    """
+    GET /allocations/graph?mbo_year=2025&goal_id=123      -> cây phân bổ của goal 123
+    GET /allocations/graph?mbo_year=2025&sender_code=E001 -> các cây gốc do E001 phân bổ
+    Mỗi node có totals: receivers, allocated_value, allocated_percent, descendants, completed, completion_rate.
+    Hỗ trợ ETag/304.
+    """
+    mbo_year = _require_mbo_year(request.args)
+    if mbo_year is None:
+        return jsonify({"error": "Thiếu hoặc sai định dạng mbo_year (2000..2100)"}), 400
+
+    goal_id = request.args.get("goal_id", type=int)
+    sender_code = (request.args.get("sender_code") or "").strip()
+    if goal_id is None and not sender_code:
+        return jsonify({"error": "Cần goal_id hoặc sender_code"}), 400
+
+    try:
+        index = get_allocation_index(mbo_year)
+        if goal_id is not None:
+            tree = index.tree(goal_id)
+            if tree is None:
+                return jsonify({"error": "Không tìm thấy mục tiêu trong năm yêu cầu"}), 404
+            body = {"mbo_year": mbo_year, "tree": tree}
+        else:
+            trees = [index.tree(gid) for gid in index.sender_roots(sender_code)]
+            body = {"mbo_year": mbo_year, "sender_code": sender_code, "trees": trees, "count": len(trees)}
+
+        body_json = dumps_json_bytes(body)
+        etag = "alloc-" + make_etag(body_json)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        return json_response(body_json, etag=etag)
+    except Exception as e:
+        print("Lỗi get_allocation_graph:", repr(e))
+        return jsonify({"error": str(e)}), 500
+
+
+# =========================
+# Điền receiver_goal_id cho các phân bổ cũ (chạy 1 lần)
+# =========================
+@allocations_bp.route("/allocations/backfill-receiver-goals", methods=["POST"])
+def backfill_receiver_goals():
+    try:
+        result = backfill_receiver_goal_ids()
+        return jsonify({"message": "Đã điền receiver_goal_id cho các phân bổ cũ", **result}), 200
+    except Exception as e:
+        print("Lỗi backfill_receiver_goals:", repr(e))
+        return jsonify({"error": str(e)}), 500
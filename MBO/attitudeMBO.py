@@ -1,7 +1,7 @@
 # attitude.py
 from flask import Blueprint, request, jsonify
 from database import get_connection
-from decimal import Decimal
+from MBO.phase_guard import require_phase
 
 attitude_bp = Blueprint("attitude", __name__)
 
@@ -22,22 +22,6 @@ def _require_params(params: dict, required_keys: list[str]):
 def _normalize_title(s: str) -> str:
     return " ".join((s or "").strip().split())
 
-def _jsonify_row(row: dict) -> dict:
-    if not row:
-        return row
-    out = {}
-    for k, v in row.items():
-        if isinstance(v, Decimal):
-            out[k] = float(v)
-        elif isinstance(v, (bytes, bytearray)):
-            out[k] = v.decode("utf-8", errors="ignore")
-        else:
-            out[k] = v
-    return out
-
-def _jsonify_rows(rows: list[dict]) -> list[dict]:
-    return [_jsonify_row(r) for r in rows]
-
 def _get_employee_id(cur, employee_code: str):
     cur.execute("SELECT id FROM employees2026 WHERE employee_code=%s LIMIT 1", (employee_code,))
     row = cur.fetchone()
@@ -95,7 +79,7 @@ def list_scores_by_employee_year():
             (employee_code, mbo_year),
         )
         rows = cur.fetchall()
-        return jsonify({"data": _jsonify_rows(rows)})
+        return jsonify({"data": rows})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
@@ -104,6 +88,7 @@ def list_scores_by_employee_year():
 
 # ===== API 2: Cập nhật nhiều mục trong 1 lần =====
 @attitude_bp.route("/scores", methods=["PUT"])
+@require_phase("self_assessment", "final_review")
 def upsert_scores_bulk():
     """
     PUT /attitude/scores
@@ -227,7 +212,7 @@ def upsert_scores_bulk():
             "updated": updated,
             "inserted": inserted,
             "attitude_status": "scored" if is_scored else None,
-            "data": _jsonify_rows(rows),
+            "data": rows,
         }), 200
 
     except Exception as e:
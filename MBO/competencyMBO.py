@@ -1,33 +1,30 @@
+import os
+import threading
+import time
+
 from flask import Blueprint, request, jsonify
 from database import get_connection
+from MBO.phase_guard import require_mbo_year, require_phase
+from http_cache import make_etag, is_not_modified, not_modified_response, json_response
+from data_versions import ROLE_COMPETENCY, get_data_version
+from query_cache import cached, invalidate_tags
 
 competency_bp = Blueprint("competency_bp", __name__)
 
 # ---- helper chung: lấy & validate năm (CHỈ dùng 'mbo_year' ở body hoặc query) ----
 def _require_mbo_year_from_body_or_query():
     """
-    Đọc năm từ body JSON key 'mbo_year' hoặc query string '?mbo_year='.
-    Chỉ chấp nhận 2000..2100. Không hỗ trợ key 'year'.
+    Đọc năm từ body JSON key 'mbo_year' / query string '?mbo_year=' / header X-MBO-Year (phải khớp nhau).
+    Chỉ chấp nhận 2000..2100. Không hỗ trợ key 'year'. Cùng resolver với require_phase.
     """
-    year = None
-    if request.is_json:
-        data = request.get_json(silent=True) or {}
-        year = data.get("mbo_year")
-    if year is None:
-        year = request.args.get("mbo_year")
-    try:
-        year = int(year)
-    except (TypeError, ValueError):
-        return None
-    if year < 2000 or year > 2100:
-        return None
-    return year
+    return require_mbo_year()
 
 
 # -----------------------------
 # Tạo mục tiêu (CREATE)
 # -----------------------------
 @competency_bp.route("/competency", methods=["POST"])
+@require_phase("create", "early_review")
 def create_competency():
     try:
         data = request.get_json() or {}
@@ -127,6 +124,7 @@ def get_competency_list(employee_code):
 # Cập nhật mục tiêu theo id + employee_code + năm (UPDATE)
 # -----------------------------
 @competency_bp.route("/competency/<employee_code>/<int:id>", methods=["PUT"])
+@require_phase("create", "early_review", "self_assessment", "final_review")
 def update_competency(employee_code, id):
     try:
         data = request.get_json() or {}
@@ -258,6 +256,7 @@ def update_competency(employee_code, id):
 # Xoá mục tiêu theo id + employee_code + năm (DELETE)
 # -----------------------------
 @competency_bp.route("/competency/<employee_code>/<int:id>", methods=["DELETE"])
+@require_phase("create", "early_review")
 def delete_competency(employee_code, id):
     try:
         mbo_year = _require_mbo_year_from_body_or_query()
@@ -288,10 +287,73 @@ def delete_competency(employee_code, id):
             conn.close()
 
 
+# -----------------------------
+# Cache bảng role_competency_content (dữ liệu tham chiếu, ít thay đổi)
+# Gắn version nhóm "role_competency_content" (data_versions, dùng chung với tag của query_cache):
+# /reload ở 1 worker bump version => mọi worker nạp lại trước khi query cache lưu entry theo key mới.
+# -----------------------------
+ROLE_COMPETENCY_TTL = int(os.getenv("ROLE_COMPETENCY_TTL", "3600"))
+
+_role_lock = threading.Lock()
+_role_cache = None  # {"loaded_at": float, "version": int, "by_position": {pos_key: {name_key: {...}}}}
+
+
+def _norm_key(value):
+    # So khớp giống MySQL collation *_ci: không phân biệt hoa thường, bỏ khoảng trắng thừa
+    return (value or "").strip().lower()
+
+
+def _load_role_competency(version):
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("""
+            SELECT position, competency_name, description
+            FROM role_competency_content
+        """)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    by_position = {}
+    for row in rows:
+        competencies = by_position.setdefault(_norm_key(row["position"]), {})
+        entry = competencies.setdefault(_norm_key(row["competency_name"]), {
+            "competency_name": row["competency_name"],
+            "descriptions": [],
+        })
+        entry["descriptions"].append(row["description"])
+    return {"loaded_at": time.monotonic(), "version": version, "by_position": by_position, "rows": len(rows)}
+
+
+def _role_cache_fresh(cache, version):
+    return cache and cache["version"] == version and time.monotonic() - cache["loaded_at"] < ROLE_COMPETENCY_TTL
+
+
+def get_role_competency_cache(force=False):
+    """
+    Toàn bộ role_competency_content trong bộ nhớ; nạp lại khi version nhóm đổi (worker khác /reload),
+    quá TTL hoặc force=True.
+    """
+    global _role_cache
+    version = get_data_version(ROLE_COMPETENCY)  # đọc trước khi nạp: bump trong lúc nạp => lần sau nạp lại
+    cache = _role_cache
+    if not force and _role_cache_fresh(cache, version):
+        return cache
+    with _role_lock:
+        cache = _role_cache
+        if not force and _role_cache_fresh(cache, version):
+            return cache
+        _role_cache = _load_role_competency(version)
+        return _role_cache
+
+
 # -----------------------------
 # Tra cứu nội dung năng lực theo vị trí & tên năng lực (KHÔNG dính năm)
 # -----------------------------
 @competency_bp.route("/role_competency_content/filter", methods=["GET"])
+@cached("role_competency_content")
 def get_role_competency_by_position_and_name():
     try:
         position = request.args.get("position")
@@ -300,24 +362,53 @@ def get_role_competency_by_position_and_name():
         if not position or not competency_name:
             return jsonify({"error": "Thiếu tham số position hoặc competency_name"}), 400
 
-        conn = get_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        sql = """
-            SELECT description
-            FROM role_competency_content
-            WHERE position = %s
-              AND competency_name = %s
-        """
-        cursor.execute(sql, (position, competency_name))
-        rows = cursor.fetchall()
+        competencies = get_role_competency_cache()["by_position"].get(_norm_key(position), {})
+        entry = competencies.get(_norm_key(competency_name))
+        rows = [{"description": d} for d in entry["descriptions"]] if entry else []
 
         return jsonify(rows), 200
 
     except Exception as e:
         return jsonify({"error": f"Lỗi khi lấy thông tin năng lực: {str(e)}"}), 500
 
-    finally:
-        if 'conn' in locals() and conn.is_connected():
-            cursor.close()
-            conn.close()
+
+# -----------------------------
+# Tất cả nội dung năng lực của 1 vị trí (1 request thay cho mỗi năng lực 1 request)
+# -----------------------------
+@competency_bp.route("/role_competency_content/by-position", methods=["GET"])
+def get_role_competency_by_position():
+    position = request.args.get("position")
+    if not position:
+        return jsonify({"error": "Thiếu tham số position"}), 400
+
+    try:
+        competencies = get_role_competency_cache()["by_position"].get(_norm_key(position), {})
+        body = {
+            "position": position,
+            "competencies": list(competencies.values()),
+            "count": len(competencies),
+        }
+        etag = "rcc-" + make_etag(body)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+        return json_response(body, etag=etag)
+    except Exception as e:
+        return jsonify({"error": f"Lỗi khi lấy thông tin năng lực: {str(e)}"}), 500
+
+
+# -----------------------------
+# Nạp lại cache role_competency_content (sau khi admin sửa bảng)
+# -----------------------------
+@competency_bp.route("/role_competency_content/reload", methods=["POST"])
+def reload_role_competency():
+    try:
+        # bump trước rồi mới nạp: bản nạp ở worker này gắn version mới, worker khác thấy version đổi
+        invalidate_tags("role_competency_content")
+        cache = get_role_competency_cache(force=True)
+        return jsonify({
+            "message": "Đã nạp lại role_competency_content",
+            "rows": cache["rows"],
+            "positions": len(cache["by_position"]),
+        }), 200
+    except Exception as e:
+        return jsonify({"error": f"Lỗi khi nạp lại năng lực: {str(e)}"}), 500
@@ -1,5 +1,9 @@
 from flask import Blueprint, request, jsonify
-from database import get_connection
+from database import get_connection, READ
+from MBO.phase_guard import require_mbo_year, require_phase
+from schema_registry import has_column
+from MBO.allocation_graph import bump_allocation_version
+from data_versions import read_only
 
 employees_bpp = Blueprint('employees_bp', __name__, url_prefix='/employees')
 
@@ -8,52 +12,17 @@ employees_bpp = Blueprint('employees_bp', __name__, url_prefix='/employees')
 # ======================
 def _require_mbo_year():
     """
-    Lấy mbo_year từ body JSON hoặc querystring (?mbo_year=),
-    hợp lệ khi là số 2000..2100. Không hợp lệ -> None.
+    Lấy mbo_year từ body JSON / querystring (?mbo_year=) / header X-MBO-Year (các nguồn phải khớp),
+    hợp lệ khi là số 2000..2100. Không hợp lệ -> None. Cùng resolver với require_phase.
     """
-    year = None
-    if request.is_json:
-        year = (request.get_json(silent=True) or {}).get('mbo_year')
-    if year is None:
-        year = request.args.get('mbo_year')
-    try:
-        year = int(year)
-    except (TypeError, ValueError):
-        return None
-    if year < 2000 or year > 2100:
-        return None
-    return year
-
-
-def _table_has_column(cursor, table, column):
-    """
-    Kiểm tra bảng trong DB hiện tại có cột hay không.
-    Lưu ý: dùng đúng tên bảng bạn đang sử dụng trong file này (PersonalMBO).
-    """
-    cursor.execute(
-        """
-        SELECT 1
-        FROM information_schema.COLUMNS
-        WHERE TABLE_SCHEMA = DATABASE()
-          AND TABLE_NAME = %s
-          AND COLUMN_NAME = %s
-        LIMIT 1
-        """,
-        (table, column),
-    )
-    return cursor.fetchone() is not None
-
-
-def _has_receiver_goal_id(cursor):
-    cursor.execute("SHOW COLUMNS FROM mbo_allocations LIKE 'receiver_goal_id'")
-    return cursor.fetchone() is not None
+    return require_mbo_year()
 
 
 def _fetch_sender_goal(cursor, goal_id, sender_code, mbo_year):
     """
     Lấy record nguồn từ PersonalMBO theo id + employee_code (+mbo_year nếu có cột).
     """
-    has_year = _table_has_column(cursor, "PersonalMBO", "mbo_year")
+    has_year = has_column("PersonalMBO", "mbo_year")
     sql = f"""
         SELECT id, employee_code{', mbo_year' if has_year else ''},
                ten_muc_tieu, mo_ta, don_vi_do_luong,
@@ -71,54 +40,11 @@ def _fetch_sender_goal(cursor, goal_id, sender_code, mbo_year):
     return cursor.fetchone()
 
 
-def _guess_receiver_goal_id(cursor, sender_goal_row, receiver_code, mbo_year, expected_muc_tieu):
-    """
-    Dò id record đã copy cho người nhận khi mbo_allocations không có receiver_goal_id.
-    So khớp fingerprint của goal nguồn + allocation_value (muc_tieu bên người nhận).
-    - Nếu bảng có cột mbo_year => thêm điều kiện lọc năm
-    - Nếu bảng có cột phan_loai => ép phan_loai = 'nhan' (đánh dấu mục tiêu nhận)
-    """
-    has_year = _table_has_column(cursor, "PersonalMBO", "mbo_year")
-    has_phan_loai = _table_has_column(cursor, "PersonalMBO", "phan_loai")
-
-    year_cond = "AND mbo_year = %s" if has_year else ""
-    phanloai_cond = "AND phan_loai = 'nhan'" if has_phan_loai else ""
-
-    sql = f"""
-        SELECT id FROM PersonalMBO
-        WHERE employee_code = %s
-          {year_cond}
-          AND ten_muc_tieu = %s AND mo_ta = %s
-          AND don_vi_do_luong = %s
-          AND IFNULL(gia_tri_ban_dau,'') = IFNULL(%s,'')
-          AND IFNULL(han_hoan_thanh,'') = IFNULL(%s,'')
-          AND muc_tieu = %s
-          {phanloai_cond}
-        ORDER BY id DESC
-        LIMIT 1
-    """
-
-    params = [receiver_code]
-    if has_year:
-        params.append(mbo_year)
-    params += [
-        sender_goal_row.get("ten_muc_tieu"),
-        sender_goal_row.get("mo_ta"),
-        sender_goal_row.get("don_vi_do_luong"),
-        sender_goal_row.get("gia_tri_ban_dau"),
-        sender_goal_row.get("han_hoan_thanh"),
-        str(expected_muc_tieu),
-    ]
-
-    cursor.execute(sql, params)
-    row = cursor.fetchone()
-    return row["id"] if row else None
-
-
 # ======================
 # POST /employees/muctieu
 # ======================
 @employees_bpp.route('/muctieu', methods=['POST'])
+@require_phase("create", "early_review")
 def create_muctieu():
     data = request.json or {}
     mbo_year = _require_mbo_year()
@@ -169,6 +95,7 @@ def create_muctieu():
 # POST /employees/muctieu/by-employee
 # ======================
 @employees_bpp.route('/muctieu/by-employee', methods=['POST'])
+@read_only
 def get_muctieu_by_employee_post():
     data = request.json or {}
     employee_code = data.get('employee_code')
@@ -240,6 +167,7 @@ def get_muctieu_by_employee_post():
 # DELETE /employees/muctieu/<id>
 # ======================
 @employees_bpp.route('/muctieu/<int:muctieu_id>', methods=['DELETE'])
+@require_phase("create", "early_review")
 def delete_muctieu(muctieu_id):
     mbo_year = _require_mbo_year()
     if mbo_year is None:
@@ -258,6 +186,7 @@ def delete_muctieu(muctieu_id):
 
         cursor.execute("DELETE FROM PersonalMBO WHERE id = %s AND mbo_year = %s", (muctieu_id, mbo_year))
         db.commit()
+        bump_allocation_version()  # mục tiêu bị xoá có thể là goal nhận phân bổ
         return jsonify({"message": "Xoá mục tiêu thành công", "mbo_year": mbo_year}), 200
 
     except Exception as e:
@@ -281,6 +210,7 @@ def delete_muctieu(muctieu_id):
 # PUT /employees/muctieu/<id>  (kèm propagate sang mục tiêu đã nhận phân bổ)
 # ======================
 @employees_bpp.route('/muctieu/<int:muctieu_id>', methods=['PUT'])
+@require_phase("create", "early_review", "self_assessment", "final_review")
 def update_muctieu(muctieu_id):
     data = request.json or {}
     mbo_year = _require_mbo_year()
@@ -311,7 +241,7 @@ def update_muctieu(muctieu_id):
         db = get_connection()
         cursor = db.cursor(dictionary=True)
 
-        # 0) Lấy mục tiêu hiện tại (bản gốc) để có fingerprint trước khi sửa
+        # 0) Lấy mục tiêu hiện tại (bản gốc)
         cursor.execute("SELECT * FROM PersonalMBO WHERE id = %s AND mbo_year = %s", (muctieu_id, mbo_year))
         current = cursor.fetchone()
         if not current:
@@ -348,77 +278,33 @@ def update_muctieu(muctieu_id):
         # Nếu không có gì để propagate -> commit & trả về
         if not propagate_updates:
             db.commit()
+            bump_allocation_version()
             return jsonify({"message": "Cập nhật mục tiêu thành công", "mbo_year": mbo_year, "propagated": 0}), 200
 
-        # 4) Lấy danh sách phân bổ của mục tiêu này
+        # 4) Đồng bộ sang các mục tiêu đã copy của người nhận: 1 câu UPDATE ... JOIN mbo_allocations
+        #    (receiver_goal_id của phân bổ cũ được điền bởi MBO/receiver_goal_backfill.py)
+        if not has_column("mbo_allocations", "receiver_goal_id"):
+            db.commit()
+            bump_allocation_version()
+            return jsonify({"message": "Cập nhật mục tiêu thành công (không có phân bổ để đồng bộ)", "mbo_year": mbo_year, "propagated": 0}), 200
+
+        set_parts = [f"r.{k} = %s" for k in propagate_updates.keys()]
+        set_parts.append("r.updated_at = NOW()")
         cursor.execute(
-            """
-            SELECT a.id, a.receiver_code, a.allocation_value, a.receiver_goal_id
-            FROM mbo_allocations a
+            f"""
+            UPDATE PersonalMBO r
+            JOIN mbo_allocations a ON a.receiver_goal_id = r.id
+            SET {', '.join(set_parts)}
             WHERE a.goal_id = %s
               AND a.sender_code = %s
               AND a.mbo_year = %s
             """,
-            (muctieu_id, sender_code, mbo_year),
+            list(propagate_updates.values()) + [muctieu_id, sender_code, mbo_year],
         )
-        allocations = cursor.fetchall() or []
-
-        if not allocations:
-            db.commit()
-            return jsonify({"message": "Cập nhật mục tiêu thành công (không có phân bổ để đồng bộ)", "mbo_year": mbo_year, "propagated": 0}), 200
-
-        # 5) Dò schema và chuẩn bị fingerprint trước khi sửa (từ current)
-        has_receiver_goal = _has_receiver_goal_id(cursor)
-        sender_goal_before = {
-            "ten_muc_tieu": current.get("ten_muc_tieu"),
-            "mo_ta": current.get("mo_ta"),
-            "don_vi_do_luong": current.get("don_vi_do_luong"),
-            "gia_tri_ban_dau": current.get("gia_tri_ban_dau"),
-            "han_hoan_thanh": current.get("han_hoan_thanh"),
-        }
-
-        propagated_count = 0
-        for alloc in allocations:
-            receiver_goal_id = None
-
-            if has_receiver_goal and alloc.get("receiver_goal_id"):
-                receiver_goal_id = alloc["receiver_goal_id"]
-            else:
-                # Fallback: dò id bên PersonalMBO của người nhận dựa fingerprint + allocation_value (chính là muc_tieu)
-                receiver_goal_id = _guess_receiver_goal_id(
-                    cursor,
-                    sender_goal_before,
-                    alloc["receiver_code"],
-                    mbo_year,
-                    expected_muc_tieu=alloc["allocation_value"],
-                )
-                # Nếu tìm thấy và bảng có cột receiver_goal_id -> lưu bù để lần sau nhanh
-                if receiver_goal_id and has_receiver_goal:
-                    cursor.execute(
-                        "UPDATE mbo_allocations SET receiver_goal_id = %s WHERE id = %s",
-                        (receiver_goal_id, alloc["id"]),
-                    )
-
-            if not receiver_goal_id:
-                # Không tìm thấy record đã copy để cập nhật -> bỏ qua
-                continue
-
-            # Build câu UPDATE cho mục tiêu của người nhận: chỉ chạm các field propagate + updated_at
-            set_parts = [f"{k} = %s" for k in propagate_updates.keys()]
-            vals = list(propagate_updates.values())
-            set_parts.append("updated_at = NOW()")
-
-            upd_sql = f"""
-                UPDATE PersonalMBO
-                SET {', '.join(set_parts)}
-                WHERE id = %s
-            """
-            vals.append(receiver_goal_id)
-
-            cursor.execute(upd_sql, vals)
-            propagated_count += 1
+        propagated_count = cursor.rowcount or 0
 
         db.commit()
+        bump_allocation_version()
         return jsonify({
             "message": "Cập nhật mục tiêu thành công và đã đồng bộ mục tiêu đã nhận phân bổ",
             "mbo_year": mbo_year,
@@ -442,6 +328,7 @@ def update_muctieu(muctieu_id):
 # POST /employees/muctieu/by-department
 # ======================
 @employees_bpp.route('/muctieu/by-department', methods=['POST'])
+@read_only
 def get_muctieu_by_department():
     data = request.json or {}
     org_unit_id = data.get('organization_unit_id') or data.get('department_id')
@@ -460,7 +347,7 @@ def get_muctieu_by_department():
     db = None
     cursor = None
     try:
-        db = get_connection()
+        db = get_connection(READ)
         cursor = db.cursor(dictionary=True)
 
         # ✅ Bỏ đệ quy — chỉ lấy đúng cấp phòng ban này
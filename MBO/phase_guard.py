@@ -0,0 +1,147 @@
+# phase_guard.py
+# Chặn các thao tác ghi MBO nằm ngoài giai đoạn (phase) đang mở của năm, TRƯỚC khi chạm DB.
+# Timeline lấy từ cache của timelineMBO (không query mbo_timelines mỗi request).
+#
+#   @submit_bp.route("/mbo/submit", methods=["POST"])
+#   @require_phase("create")
+#   def submit_mbo(): ...
+#
+# Quy ước:
+#   - Phase mở khi status = 'active' và hôm nay nằm trong [start_date, end_date] (bỏ trống = không giới hạn).
+#   - Năm chưa cấu hình timeline (không có phase nào active/có ngày) => cho qua (fail-open).
+#   - MBO_PHASE_GUARD=off => tắt hoàn toàn.
+#   - Năm được kiểm tra lấy bằng resolve_mbo_year() — cùng hàm các route dùng để chọn năm ghi, nên guard và
+#     route luôn thấy cùng 1 năm. Năm sai định dạng / các nguồn mâu thuẫn => 400 (không tự dùng current_year).
+import os
+import threading
+from collections import Counter
+from datetime import date
+from functools import wraps
+
+from flask import Blueprint, request, jsonify
+
+from MBO.timelineMBO import VALID_PHASES, get_timeline, get_current_year
+
+phase_guard_bp = Blueprint("phase_guard", __name__)
+
+_lock = threading.Lock()
+_rejections = Counter()  # endpoint -> số lần bị chặn
+
+
+def _guard_enabled():
+    return os.getenv("MBO_PHASE_GUARD", "on").strip().lower() not in ("off", "0", "false", "no")
+
+
+class MboYearError(ValueError):
+    """mbo_year sai định dạng / ngoài 2000..2100 / các nguồn trong request khác nhau."""
+
+
+def resolve_mbo_year(view_kwargs=None):
+    """
+    mbo_year của request từ URL, ?mbo_year=, body JSON "mbo_year", header X-MBO-Year.
+    Trả None nếu không nguồn nào có; raise MboYearError nếu sai định dạng hoặc các nguồn không khớp nhau.
+    """
+    candidates = [
+        (view_kwargs or {}).get("mbo_year"),
+        request.args.get("mbo_year"),
+        (request.get_json(silent=True) or {}).get("mbo_year") if request.is_json else None,
+        request.headers.get("X-MBO-Year"),
+    ]
+    years = set()
+    for value in candidates:
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        try:
+            year = int(value)
+        except (TypeError, ValueError):
+            raise MboYearError(f"mbo_year không hợp lệ: {value!r}")
+        if not 2000 <= year <= 2100:
+            raise MboYearError(f"mbo_year ngoài khoảng 2000..2100: {year}")
+        years.add(year)
+    if len(years) > 1:
+        raise MboYearError(f"mbo_year trong request không khớp nhau: {sorted(years)}")
+    return years.pop() if years else None
+
+
+def require_mbo_year():
+    """Cho route: năm hợp lệ hoặc None (thiếu / sai / mâu thuẫn) — cùng quy tắc với guard."""
+    try:
+        return resolve_mbo_year(request.view_args)
+    except MboYearError:
+        return None
+
+
+def _as_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def open_phases(mbo_year, today=None):
+    """
+    (configured, [phase đang mở]) của năm.
+    configured=False khi năm chưa có phase nào active hoặc có ngày.
+    """
+    today = today or date.today()
+    rows = get_timeline(mbo_year)
+    configured = any(
+        r.get("status") == "active" or r.get("start_date") or r.get("end_date") for r in rows
+    )
+    opened = []
+    for r in rows:
+        if r.get("status") != "active":
+            continue
+        start, end = _as_date(r.get("start_date")), _as_date(r.get("end_date"))
+        if (start is None or start <= today) and (end is None or today <= end):
+            opened.append(r["phase"])
+    return configured, opened
+
+
+def require_phase(*phases):
+    """Decorator cho route ghi: chỉ cho phép khi 1 trong các phase được mở."""
+    unknown = [p for p in phases if p not in VALID_PHASES]
+    if unknown:
+        raise ValueError(f"phase không hợp lệ: {unknown}")
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _guard_enabled():
+                return view(*args, **kwargs)
+
+            try:
+                mbo_year = resolve_mbo_year(kwargs)
+            except MboYearError as e:
+                return jsonify({"error": str(e)}), 400
+            if mbo_year is None:
+                mbo_year = get_current_year()  # route không gửi năm => ghi vào năm hiện hành
+            configured, opened = open_phases(mbo_year)
+            if not configured or any(p in opened for p in phases):
+                return view(*args, **kwargs)
+
+            with _lock:
+                _rejections[request.endpoint] += 1
+            return jsonify({
+                "error": "Ngoài thời gian cho phép của giai đoạn MBO",
+                "mbo_year": mbo_year,
+                "allowed_phases": list(phases),
+                "open_phases": opened,
+            }), 403
+        return wrapper
+    return decorator
+
+
+def rejection_stats():
+    with _lock:
+        return dict(_rejections)
+
+
+# GET /mbo/phase-guard/stats — số request ghi bị chặn theo endpoint (từ lúc process khởi động)
+@phase_guard_bp.route("/mbo/phase-guard/stats", methods=["GET"])
+def get_phase_guard_stats():
+    stats = rejection_stats()
+    return jsonify({
+        "enabled": _guard_enabled(),
+        "rejected_total": sum(stats.values()),
+        "rejected_by_endpoint": stats,
+    })
@@ -0,0 +1,116 @@
+# receiver_goal_backfill.py
+# Job chạy 1 lần: điền mbo_allocations.receiver_goal_id cho các phân bổ cũ (tạo trước khi có cột này).
+# Dò theo fingerprint của goal nguồn + allocation_value (= muc_tieu của bản copy) bằng 1 query JOIN,
+# sau đó ghi lại theo lô. Các API phân bổ / sửa mục tiêu chỉ dùng receiver_goal_id, không dò nữa.
+#
+# API: POST /allocations/backfill-receiver-goals
+# CLI: python -m MBO.receiver_goal_backfill   (chạy ở thư mục gốc)
+import json
+import sys
+
+from database import get_connection
+from schema_registry import has_column, refresh as refresh_schema_registry
+from MBO.allocation_graph import bump_allocation_version
+
+_BATCH_SIZE = 1000
+
+
+def _ensure_receiver_goal_column(cursor):
+    if has_column("mbo_allocations", "receiver_goal_id"):
+        return False
+    cursor.execute("""
+        ALTER TABLE mbo_allocations
+            ADD COLUMN receiver_goal_id INT NULL,
+            ADD KEY idx_alloc_receiver_goal (receiver_goal_id)
+    """)
+    refresh_schema_registry()
+    return True
+
+
+def backfill_receiver_goal_ids(conn=None):
+    """
+    Điền receiver_goal_id còn thiếu. Mỗi goal của người nhận chỉ gán cho 1 phân bổ
+    (ưu tiên id mới nhất, giống fallback cũ). Trả về thống kê.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        column_added = _ensure_receiver_goal_column(cursor)
+
+        has_year = has_column("personalmbo", "mbo_year")
+        has_phan_loai = has_column("personalmbo", "phan_loai")
+        year_cond = "AND r.mbo_year = a.mbo_year" if has_year else ""
+        sender_year_cond = "AND s.mbo_year = a.mbo_year" if has_year else ""
+        phanloai_cond = "AND r.phan_loai = 'nhan'" if has_phan_loai else ""
+
+        # Tất cả cặp (phân bổ thiếu id, goal ứng viên của người nhận) trong 1 query
+        cursor.execute(f"""
+            SELECT a.id, r.id
+            FROM mbo_allocations a
+            JOIN personalmbo s
+              ON s.id = a.goal_id
+             AND s.employee_code = a.sender_code
+             {sender_year_cond}
+            JOIN personalmbo r
+              ON r.employee_code = a.receiver_code
+             {year_cond}
+             AND r.ten_muc_tieu = s.ten_muc_tieu
+             AND r.mo_ta = s.mo_ta
+             AND r.don_vi_do_luong = s.don_vi_do_luong
+             AND IFNULL(r.gia_tri_ban_dau, '') = IFNULL(s.gia_tri_ban_dau, '')
+             AND IFNULL(r.han_hoan_thanh, '') = IFNULL(s.han_hoan_thanh, '')
+             AND r.muc_tieu = a.allocation_value
+             {phanloai_cond}
+            WHERE a.receiver_goal_id IS NULL
+              AND r.id NOT IN (
+                  SELECT receiver_goal_id FROM (
+                      SELECT receiver_goal_id FROM mbo_allocations WHERE receiver_goal_id IS NOT NULL
+                  ) used
+              )
+            ORDER BY a.id, r.id DESC
+        """)
+        pairs = cursor.fetchall()
+
+        assigned, taken = {}, set()
+        for alloc_id, goal_id in pairs:
+            if alloc_id in assigned or goal_id in taken:
+                continue
+            assigned[alloc_id] = goal_id
+            taken.add(goal_id)
+
+        items = list(assigned.items())
+        for i in range(0, len(items), _BATCH_SIZE):
+            chunk = items[i:i + _BATCH_SIZE]
+            case_sql = " ".join(["WHEN %s THEN %s"] * len(chunk))
+            id_placeholders = ", ".join(["%s"] * len(chunk))
+            params = [v for pair in chunk for v in pair] + [alloc_id for alloc_id, _ in chunk]
+            cursor.execute(f"""
+                UPDATE mbo_allocations
+                SET receiver_goal_id = CASE id {case_sql} END
+                WHERE id IN ({id_placeholders})
+            """, params)
+
+        cursor.execute("SELECT COUNT(*) FROM mbo_allocations WHERE receiver_goal_id IS NULL")
+        remaining = cursor.fetchone()[0]
+
+        conn.commit()
+        bump_allocation_version()
+        return {
+            "column_added": column_added,
+            "resolved": len(assigned),
+            "unresolved": int(remaining),
+        }
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+
+
+if __name__ == "__main__":
+    print(json.dumps(backfill_receiver_goal_ids(), ensure_ascii=False))
+    sys.exit(0)
@@ -0,0 +1,116 @@
+# reviewer_picker.py
+# Quy tắc chọn reviewer/approver theo chuỗi đơn vị [leaf, ..., root], dùng chung cho
+# /mbo/submit, submit-final và /mbo/team-status (tính cho cả nhóm nhân viên).
+#   - /mbo/team-status (chỉ đọc, nhiều nhân viên): chuỗi từ snapshot cây tổ chức (unit_chain).
+#   - submit / submit-final (ghi reviewer/approver vào mbo_sessions): chuỗi đọc trực tiếp từ bảng closure
+#     (calc_reviewer_approver) => không phụ thuộc snapshot cũ của worker.
+from database import DB_SCHEMA
+from org_closure import CLOSURE_TABLE
+from org_tree import get_org_snapshot
+
+# Rule position hợp lệ cho Reviewer (>= Trưởng phòng)
+REVIEWER_OK_POSITIONS = {
+    "tổng giám đốc",
+    "phó tổng giám đốc",
+    "giám đốc",
+    "phó giám đốc",
+    "trưởng phòng cấp cao",
+    "phó phòng cấp cao",
+    "trưởng phòng",
+    "phó phòng",
+}
+
+# Approver phải là Ban giám đốc trở lên
+APPROVER_OK_POSITIONS = {
+    "tổng giám đốc",
+    "phó tổng giám đốc",
+    "giám đốc",
+    "phó giám đốc",
+}
+
+
+def unit_chain(leaf_unit_id):
+    """[leaf, ..., root] lấy từ snapshot cây tổ chức (không query DB, có chống vòng lặp)."""
+    if not leaf_unit_id:
+        return []
+    snap = get_org_snapshot()
+    return [snap.units[uid] for uid in snap.ancestor_ids(leaf_unit_id)]
+
+
+def fetch_positions(conn, employee_ids):
+    """{employee_id: position} cho nhiều nhân viên trong 1 query."""
+    ids = sorted({eid for eid in employee_ids if eid})
+    if not ids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(ids))
+    with conn.cursor(dictionary=True, buffered=True) as cur:
+        cur.execute(
+            f"SELECT id, position FROM `{DB_SCHEMA}`.employees2026_base WHERE id IN ({placeholders})",
+            ids,
+        )
+        return {row["id"]: row["position"] for row in cur.fetchall()}
+
+
+def pick_reviewer_approver(employee_id, path, positions):
+    """
+    - Reviewer: manager gần nhất (khác NV) có position >= Trưởng phòng; không có => chính NV.
+    - Approver: BGD gần nhất phía trên reviewer (reviewer = NV thì tìm từ cấp trên leaf);
+                không có => dùng reviewer để không gãy flow.
+    positions: {employee_id: position}
+    """
+    def pos_norm(mid):
+        return (positions.get(mid) or "").strip().lower()
+
+    reviewer_id = employee_id
+    reviewer_idx = None
+    for idx, u in enumerate(path):
+        mid = u.get("employee_id")
+        if not mid or mid == employee_id:
+            continue
+        if pos_norm(mid) in REVIEWER_OK_POSITIONS:
+            reviewer_idx, reviewer_id = idx, mid
+            break
+
+    above = path[reviewer_idx + 1:] if reviewer_idx is not None else path[1:]
+    approver_id = reviewer_id
+    for u in above:
+        mid = u.get("employee_id")
+        if not mid or mid == employee_id:
+            continue
+        if pos_norm(mid) in APPROVER_OK_POSITIONS:
+            approver_id = mid
+            break
+
+    return reviewer_id, approver_id
+
+
+def unit_chain_with_positions(conn, leaf_unit_id):
+    """
+    ([leaf, ..., root], {employee_id: position}) đọc thẳng từ DB trong 1 query
+    (closure JOIN organization_units JOIN employees2026_base), không qua snapshot.
+    """
+    if not leaf_unit_id:
+        return [], {}
+    with conn.cursor(dictionary=True, buffered=True) as cur:
+        cur.execute(
+            f"""
+            SELECT ou.id, ou.parent_id, ou.employee_id, e.position
+            FROM {CLOSURE_TABLE} c
+            JOIN organization_units ou ON ou.id = c.ancestor_id
+            LEFT JOIN `{DB_SCHEMA}`.employees2026_base e ON e.id = ou.employee_id
+            WHERE c.descendant_id = %s
+            ORDER BY c.depth
+            """,
+            (leaf_unit_id,),
+        )
+        rows = cur.fetchall()
+    positions = {row["employee_id"]: row["position"] for row in rows if row["employee_id"]}
+    return rows, positions
+
+
+def calc_reviewer_approver(conn, employee_id, leaf_unit_id):
+    """reviewer/approver của 1 nhân viên để ghi vào mbo_sessions: chuỗi đơn vị + position trong 1 query."""
+    path, positions = unit_chain_with_positions(conn, leaf_unit_id)
+    if not path:
+        return employee_id, employee_id
+    return pick_reviewer_approver(employee_id, path, positions)
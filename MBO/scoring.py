@@ -0,0 +1,394 @@
+# scoring.py
+# Engine tính điểm cuối năm MBO bằng pandas/numpy (vectorized):
+#   nạp toàn bộ mục tiêu / năng lực / thái độ của năm thành các cột -> tính điểm từng dòng theo mảng
+#   -> groupby theo nhân viên -> chọn điểm theo status -> trọng số theo nhóm chức danh -> ghi mbo_sessions theo lô.
+#
+# Công thức (giữ nguyên như SQL cũ của /employees/by-department):
+#   - Điểm công việc / năng lực = SUM(ROUND(ey_score * ti_trong / 100, 2)), thái độ = ROUND(AVG(score), 2)
+#   - status 'reviewed_final' dùng điểm reviewed, 'approved_final' dùng điểm approved, trạng thái khác = 0
+#   - Trưởng/Phó nhóm, Team lead, TL: 0.10 thái độ + 0.45 công việc + 0.45 năng lực
+#     Nhân viên:                      0.20 thái độ + 0.40 công việc + 0.40 năng lực
+#     Cấp khác:                       0.50 công việc + 0.50 năng lực
+#   - Làm tròn 2 chữ số kiểu half-up (giống ROUND của MySQL với DECIMAL)
+#
+# API: POST /mbo/scores/recompute   {mbo_year, organization_unit_id?, overwrite?, dry_run?}
+# CLI: python -m MBO.scoring <mbo_year> [--unit-id N] [--overwrite] [--dry-run]
+import argparse
+import json
+import re
+import sys
+from datetime import date
+from decimal import Decimal
+
+from flask import Blueprint, request, jsonify
+from mysql.connector import Error
+
+from database import get_connection, DB_SCHEMA
+from org_tree import get_org_snapshot
+from data_versions import bump_data_version
+
+scoring_bp = Blueprint("scoring", __name__)
+
+FINAL_STATUSES = ("reviewed_final", "approved_final")
+UPSERT_BATCH_SIZE = 500
+
+# Nhóm chức danh -> trọng số (thái độ, công việc, năng lực)
+CATEGORY_LEAD = "lead"
+CATEGORY_STAFF = "staff"
+CATEGORY_OTHER = "other"
+WEIGHTS = {
+    CATEGORY_LEAD: (0.10, 0.45, 0.45),
+    CATEGORY_STAFF: (0.20, 0.40, 0.40),
+    CATEGORY_OTHER: (0.00, 0.50, 0.50),
+}
+_CATEGORY_ORDER = (CATEGORY_LEAD, CATEGORY_STAFF, CATEGORY_OTHER)
+
+_LEAD_RE = re.compile(r"trưởng\s*nhóm|truong\s*nhom|phó\s*nhóm|pho\s*nhom|team\s*lead")
+_STAFF_RE = re.compile(r"nhân\s*viên|nhan\s*vien|staff|employee")
+
+class UnitNotFoundError(LookupError):
+    """organization_unit_id không có trong cây tổ chức."""
+
+
+_COMPONENT_COLUMNS = [
+    "job_score_reviewed", "job_score_approved",
+    "competency_score_reviewed", "competency_score_approved",
+    "attitude_score_year",
+]
+
+
+def position_category(position):
+    """Nhóm chức danh của 1 position (lead / staff / other)."""
+    p = (position or "").lower()
+    if _LEAD_RE.search(p) or " tl " in f" {p} ":
+        return CATEGORY_LEAD
+    if _STAFF_RE.search(p):
+        return CATEGORY_STAFF
+    return CATEGORY_OTHER
+
+
+def _round_half_up(values, decimals=2):
+    """Làm tròn half-up (0.125 -> 0.13) trên cả mảng; epsilon bù sai số biểu diễn float."""
+    import numpy as np
+
+    factor = 10 ** decimals
+    return np.sign(values) * np.floor(np.abs(values) * factor + 0.5 + 1e-9) / factor
+
+
+def _code_key(series):
+    """employee_code chuẩn hoá để join (so sánh kiểu utf8mb4_unicode_ci: không phân biệt hoa thường)."""
+    return series.astype(str).str.strip().str.lower()
+
+
+def _numeric(frame, column):
+    import pandas as pd
+
+    return pd.to_numeric(frame[column], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+
+
+# ======================
+# Nạp dữ liệu theo cột
+# ======================
+def _fetch_frame(cursor, sql, params, columns):
+    import pandas as pd
+
+    cursor.execute(sql, params)
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+
+def load_component_scores(cursor, mbo_year, employee_codes=None):
+    """
+    Điểm thành phần của năm, index = employee_code đã chuẩn hoá.
+    employee_codes=None => cả năm; ngược lại chỉ nạp các mã được truyền vào.
+    3 query (personalmbo, competencymbo, attitudembo), không phụ thuộc số nhân viên.
+    """
+    import pandas as pd
+
+    code_filter, params = "", [mbo_year]
+    if employee_codes is not None:
+        codes = sorted({str(c) for c in employee_codes if c})
+        if not codes:
+            return pd.DataFrame(columns=_COMPONENT_COLUMNS, dtype=float)
+        code_filter = f"AND employee_code IN ({', '.join(['%s'] * len(codes))})"
+        params += codes
+
+    score_cols = ["employee_code", "reviewed_ey_score", "reviewer_ti_trong", "approved_ey_score", "approver_ti_trong"]
+    goals = _fetch_frame(cursor, f"""
+        SELECT {', '.join(score_cols)}
+        FROM `{DB_SCHEMA}`.personalmbo
+        WHERE mbo_year = %s {code_filter}
+    """, params, score_cols)
+    comps = _fetch_frame(cursor, f"""
+        SELECT {', '.join(score_cols)}
+        FROM `{DB_SCHEMA}`.competencymbo
+        WHERE mbo_year = %s {code_filter}
+    """, params, score_cols)
+    attitude = _fetch_frame(cursor, f"""
+        SELECT employee_code, score
+        FROM `{DB_SCHEMA}`.attitudembo
+        WHERE mbo_year = %s {code_filter}
+    """, params, ["employee_code", "score"])
+
+    def weighted(frame, prefix):
+        if frame.empty:
+            return pd.DataFrame(columns=[f"{prefix}_reviewed", f"{prefix}_approved"], dtype=float)
+        out = pd.DataFrame({
+            "code": _code_key(frame["employee_code"]),
+            f"{prefix}_reviewed": _round_half_up(
+                _numeric(frame, "reviewed_ey_score") * _numeric(frame, "reviewer_ti_trong") / 100),
+            f"{prefix}_approved": _round_half_up(
+                _numeric(frame, "approved_ey_score") * _numeric(frame, "approver_ti_trong") / 100),
+        })
+        return out.groupby("code").sum()
+
+    att = pd.DataFrame(columns=["attitude_score_year"], dtype=float)
+    if not attitude.empty:
+        att = (
+            pd.DataFrame({
+                "code": _code_key(attitude["employee_code"]),
+                "score": pd.to_numeric(attitude["score"], errors="coerce"),
+            })
+            .groupby("code")["score"].mean()  # AVG bỏ qua NULL
+            .to_frame("attitude_score_year")
+        )
+        att["attitude_score_year"] = _round_half_up(att["attitude_score_year"].fillna(0.0).to_numpy())
+
+    components = weighted(goals, "job_score").join(weighted(comps, "competency_score"), how="outer").join(att, how="outer")
+    return components.reindex(columns=_COMPONENT_COLUMNS).fillna(0.0)
+
+
+# ======================
+# Tính điểm (vectorized)
+# ======================
+def compute_final_scores(people, components):
+    """
+    people: DataFrame có employee_code, position, status, ms_score_final.
+    Trả về DataFrame cùng index với people, gồm: position_category, job_score, competency_score,
+    attitude_score, computed_final, score_final (số float, 0 với trạng thái chưa final).
+    """
+    import numpy as np
+    import pandas as pd
+
+    comp = components.reindex(_code_key(people["employee_code"])).fillna(0.0)
+
+    # Nhóm chức danh: regex chạy 1 lần cho mỗi position khác nhau, không phải mỗi dòng
+    positions = people["position"].fillna("").astype(str)
+    categories = positions.map({p: position_category(p) for p in positions.unique()})
+    weight_matrix = np.array([WEIGHTS[c] for c in _CATEGORY_ORDER], dtype=float)
+    weights = weight_matrix[categories.map({c: i for i, c in enumerate(_CATEGORY_ORDER)}).to_numpy(dtype=int)]
+
+    status = people["status"].fillna("draft").astype(str).to_numpy()
+    is_reviewed = status == "reviewed_final"
+    is_approved = status == "approved_final"
+    is_final = is_reviewed | is_approved
+
+    job = np.where(is_reviewed, comp["job_score_reviewed"].to_numpy(), comp["job_score_approved"].to_numpy())
+    competency = np.where(
+        is_reviewed, comp["competency_score_reviewed"].to_numpy(), comp["competency_score_approved"].to_numpy()
+    )
+    attitude = comp["attitude_score_year"].to_numpy()
+
+    computed = _round_half_up(weights[:, 0] * attitude + weights[:, 1] * job + weights[:, 2] * competency)
+    computed = np.where(is_final, computed, 0.0)
+
+    ms_score = pd.to_numeric(people["ms_score_final"], errors="coerce").to_numpy(dtype=float)
+    score_final = np.where(~np.isnan(ms_score), _round_half_up(np.nan_to_num(ms_score)), computed)
+
+    return pd.DataFrame({
+        "position_category": categories.to_numpy(),
+        "job_score": np.where(is_final, job, 0.0),
+        "competency_score": np.where(is_final, competency, 0.0),
+        "attitude_score": np.where(is_final, attitude, 0.0),
+        "computed_final": computed,
+        "score_final": score_final,
+    }, index=people.index)
+
+
+def _to_decimal(value):
+    return Decimal(f"{value:.2f}")
+
+
+def apply_scores_to_rows(cursor, mbo_year, rows):
+    """
+    Gắn job_score / competency_score / attitude_score / computed_final / score_final vào từng dict
+    (dùng cho các API trả về danh sách nhân viên). rows cần employee_code, position, status, ms_score_final.
+    """
+    import pandas as pd
+
+    if not rows:
+        return rows
+    people = pd.DataFrame.from_records(
+        [{k: r.get(k) for k in ("employee_code", "position", "status", "ms_score_final")} for r in rows]
+    )
+    components = load_component_scores(cursor, mbo_year, people["employee_code"].tolist())
+    scores = compute_final_scores(people, components)
+
+    columns = ["job_score", "competency_score", "attitude_score", "computed_final", "score_final"]
+    for row, values in zip(rows, scores[columns].itertuples(index=False)):
+        for col, value in zip(columns, values):
+            row[col] = _to_decimal(value)
+    return rows
+
+
+# ======================
+# Ghi mbo_sessions theo lô
+# ======================
+def _load_people(cursor, mbo_year, unit_ids=None):
+    """Nhân viên + session mới nhất của năm (1 query)."""
+    import pandas as pd
+
+    cols = ["employee_id", "employee_code", "position", "status", "ms_score_final"]
+    unit_filter, params = "", [mbo_year]
+    if unit_ids is not None:
+        if not unit_ids:
+            return pd.DataFrame(columns=cols)  # tránh "IN ()" (lỗi cú pháp SQL)
+        unit_filter = f"WHERE e.organization_unit_id IN ({', '.join(['%s'] * len(unit_ids))})"
+        params += list(unit_ids)
+    cursor.execute(f"""
+        SELECT e.id, e.employee_code, e.position, COALESCE(ms.status, 'draft'), ms.score_final
+        FROM `{DB_SCHEMA}`.employees2026 e
+        LEFT JOIN (
+            SELECT s.employee_id, s.status, s.score_final
+            FROM `{DB_SCHEMA}`.mbo_sessions s
+            JOIN (
+                SELECT employee_id, MAX(id) AS id
+                FROM `{DB_SCHEMA}`.mbo_sessions
+                WHERE mbo_year = %s
+                GROUP BY employee_id
+            ) latest ON latest.id = s.id
+        ) ms ON ms.employee_id = e.id
+        {unit_filter}
+        ORDER BY e.id
+    """, params)
+    return pd.DataFrame.from_records(cursor.fetchall(), columns=cols)
+
+
+def _upsert_scores(cursor, mbo_year, items):
+    """items: [(employee_id, score_final)] -> INSERT ... ON DUPLICATE KEY UPDATE theo lô."""
+    for i in range(0, len(items), UPSERT_BATCH_SIZE):
+        chunk = items[i:i + UPSERT_BATCH_SIZE]
+        values_sql = ", ".join(["(%s, %s, %s)"] * len(chunk))
+        params = [v for emp_id, score in chunk for v in (emp_id, mbo_year, score)]
+        cursor.execute(f"""
+            INSERT INTO `{DB_SCHEMA}`.mbo_sessions (employee_id, mbo_year, score_final)
+            VALUES {values_sql}
+            ON DUPLICATE KEY UPDATE score_final = VALUES(score_final)
+        """, params)
+
+
+def recompute_year(mbo_year, unit_id=None, overwrite=False, dry_run=False, conn=None):
+    """
+    Tính lại score_final cho mọi nhân viên đã final (reviewed_final / approved_final) của năm
+    (hoặc chỉ trong đơn vị unit_id + đơn vị con) và ghi vào mbo_sessions.
+    overwrite=False: giữ nguyên score_final đã có (điểm chỉnh tay qua PUT /mbo/score-final).
+    unit_id không có trong cây tổ chức => UnitNotFoundError.
+    """
+    import numpy as np
+
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        unit_ids = None
+        if unit_id is not None:
+            unit_ids = sorted(get_org_snapshot().descendant_ids(unit_id))
+            if not unit_ids:
+                raise UnitNotFoundError(f"Không tìm thấy organization_unit_id={unit_id}")
+
+        people = _load_people(cursor, mbo_year, unit_ids)
+        if people.empty:
+            return {"mbo_year": mbo_year, "employees": 0, "final": 0, "written": 0, "dry_run": dry_run}
+
+        codes = None if unit_ids is None else people["employee_code"].tolist()
+        components = load_component_scores(cursor, mbo_year, codes)
+
+        # overwrite => bỏ qua score_final cũ khi tính
+        if overwrite:
+            people = people.assign(ms_score_final=None)
+        scores = compute_final_scores(people, components)
+
+        status = people["status"].fillna("draft").astype(str).to_numpy()
+        is_final = np.isin(status, FINAL_STATUSES)
+        if overwrite:
+            mask = is_final
+        else:
+            mask = is_final & people["ms_score_final"].isna().to_numpy()
+
+        items = [
+            (int(emp_id), _to_decimal(score))
+            for emp_id, score in zip(people.loc[mask, "employee_id"], scores.loc[mask, "computed_final"])
+        ]
+
+        if not dry_run and items:
+            _upsert_scores(cursor, mbo_year, items)
+            conn.commit()
+            bump_data_version("mbo")  # CLI / job nền không qua after_request
+
+        return {
+            "mbo_year": mbo_year,
+            "employees": int(len(people)),
+            "final": int(is_final.sum()),
+            "written": 0 if dry_run else len(items),
+            "to_write": len(items),
+            "by_category": {k: int(v) for k, v in scores.loc[is_final, "position_category"].value_counts().items()},
+            "dry_run": dry_run,
+        }
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+
+
+# POST /mbo/scores/recompute
+@scoring_bp.route("/mbo/scores/recompute", methods=["POST"])
+def recompute_scores():
+    data = request.get_json(silent=True) or {}
+    try:
+        mbo_year = int(data.get("mbo_year") or date.today().year)
+        unit_id = data.get("organization_unit_id")
+        unit_id = int(unit_id) if unit_id is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "mbo_year / organization_unit_id không hợp lệ"}), 400
+
+    if unit_id is not None and unit_id not in get_org_snapshot().units:
+        return jsonify({"error": f"Không tìm thấy organization_unit_id={unit_id}"}), 404
+
+    try:
+        result = recompute_year(
+            mbo_year,
+            unit_id=unit_id,
+            overwrite=bool(data.get("overwrite")),
+            dry_run=bool(data.get("dry_run")),
+        )
+        return jsonify(result)
+    except UnitNotFoundError as e:
+        return jsonify({"error": str(e)}), 404
+    except Error as e:
+        return jsonify({"error": f"Lỗi cơ sở dữ liệu: {str(e)}"}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tính lại score_final MBO cho cả năm")
+    parser.add_argument("mbo_year", type=int)
+    parser.add_argument("--unit-id", type=int, default=None)
+    parser.add_argument("--overwrite", action="store_true")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+
+    try:
+        result = recompute_year(args.mbo_year, unit_id=args.unit_id, overwrite=args.overwrite, dry_run=args.dry_run)
+    except UnitNotFoundError as e:
+        print(str(e), file=sys.stderr)
+        return 2
+    print(json.dumps(result, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,11 @@
 from flask import Blueprint, jsonify, request
 from mysql.connector import Error
 from database import get_connection
+from org_closure import CLOSURE_TABLE
+from schema_registry import table_columns
 from datetime import datetime
+from org_tree import get_org_snapshot
+from MBO.reviewer_picker import unit_chain, fetch_positions, pick_reviewer_approver
 
 status_bp = Blueprint("status_bp", __name__)
 
@@ -58,24 +62,16 @@ def can_submit_mbo(employee_id: int):
                 "mbo_year": year
             })
 
-        # 2) Tìm quản lý gần nhất KHÁC chính nhân viên (leo lên theo parent_id)
-        #    MySQL 8+ cần WITH RECURSIVE
+        # 2) Tìm quản lý gần nhất KHÁC chính nhân viên (tổ tiên gần nhất theo bảng closure)
         cur.execute(
-            """
-            WITH RECURSIVE chain AS (
-                SELECT id, parent_id, employee_id, 0 AS depth
-                FROM organization_units
-                WHERE id = %s
-                UNION ALL
-                SELECT ou.id, ou.parent_id, ou.employee_id, chain.depth + 1
-                FROM organization_units ou
-                JOIN chain ON ou.id = chain.parent_id
-            )
-            SELECT employee_id
-            FROM chain
-            WHERE employee_id IS NOT NULL
-              AND employee_id <> %s
-            ORDER BY depth
+            f"""
+            SELECT ou.employee_id
+            FROM {CLOSURE_TABLE} c
+            JOIN organization_units ou ON ou.id = c.ancestor_id
+            WHERE c.descendant_id = %s
+              AND ou.employee_id IS NOT NULL
+              AND ou.employee_id <> %s
+            ORDER BY c.depth
             LIMIT 1
             """,
             (org_unit_id, employee_id)
@@ -177,21 +173,9 @@ def force_draft(employee_id: int):
                           "reviewer_ti_trong", "approver_ti_trong",
                           "reviewer_rating", "approver_rating"]
 
-    def check_table_cols(cur, schema_table, required_cols):
-        schema, table = schema_table.split(".", 1) if "." in schema_table else (None, schema_table)
-        params = [table]
-        sql = """
-            SELECT COLUMN_NAME
-            FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_NAME = %s
-        """
-        if schema:
-            sql += " AND TABLE_SCHEMA = %s"
-            params.append(schema)
-        cur.execute(sql, tuple(params))
-        have = {row["COLUMN_NAME"].lower() for row in cur.fetchall()}
-        missing = [c for c in required_cols if c.lower() not in have]
-        return missing
+    def check_table_cols(schema_table, required_cols):
+        have = table_columns(schema_table)
+        return [c for c in required_cols if c.lower() not in have]
 
     conn = None
     cur = None
@@ -251,8 +235,8 @@ def force_draft(employee_id: int):
         prev_status = (sess.get("status") or "").strip().lower()
 
         # 3) validate schema
-        miss_comp = check_table_cols(cur, TABLE_COMP, REQUIRED_COMP_COLS)
-        miss_pers = check_table_cols(cur, TABLE_PERS, REQUIRED_PERS_COLS)
+        miss_comp = check_table_cols(TABLE_COMP, REQUIRED_COMP_COLS)
+        miss_pers = check_table_cols(TABLE_PERS, REQUIRED_PERS_COLS)
         if miss_comp or miss_pers:
             return jsonify({
                 "ok": False, "employee_id": employee_id, "employee_code": employee_code,
@@ -327,3 +311,175 @@ def force_draft(employee_id: int):
             if conn: conn.close()
         except:
             pass
+
+
+# ====================== BULK: TRẠNG THÁI CẢ NHÓM ======================
+_TEAM_STATUS_MAX = 2000
+
+
+def _team_can_submit(employee_id, org_unit_id, manager_id, manager_sess, year):
+    """Cùng quy tắc với /mbo/can-submit, trả về (can_submit, reason, manager_status)."""
+    if org_unit_id is None:
+        return True, "Nhân viên không thuộc phòng ban nào (organization_unit_id=NULL) — cho phép gửi.", None
+    if manager_id is None:
+        return True, "Không tìm thấy quản lý cấp trên (nhân viên là cấp cao nhất hoặc chưa gán quản lý) — cho phép gửi.", None
+    if not manager_sess:
+        return False, f"Quản lý (employee_id={manager_id}) chưa có MBO session cho năm {year} — chưa được phép gửi.", None
+    manager_status = (manager_sess.get("status") or "").strip().lower()
+    if manager_status == "draft":
+        return False, f"Quản lý (employee_id={manager_id}) đang ở trạng thái 'draft' năm {year} — chưa được phép gửi.", manager_status
+    return True, f"Quản lý (employee_id={manager_id}) đã gửi MBO (status='{manager_status}') cho năm {year} — cho phép gửi.", manager_status
+
+
+@status_bp.post("/mbo/team-status")
+def team_status():
+    """
+    Trạng thái MBO của nhiều nhân viên trong 1 request (dashboard của quản lý).
+    Số query cố định (nhân viên, position quản lý, mbo_sessions); cây đơn vị lấy từ snapshot.
+
+    Body JSON:
+    {
+      "employee_ids": [1, 2, 3],          // hoặc
+      "organization_unit_id": 10,         // toàn bộ nhân viên thuộc đơn vị + đơn vị con
+      "mbo_year": 2025,                   // mặc định: năm hiện tại (chấp nhận "year")
+      "current_user_id": 5                // optional: thêm can_review / can_approve
+    }
+    """
+    data = request.get_json(silent=True) or {}
+    year = data.get("mbo_year") or data.get("year") or datetime.now().year
+    current_user_id = data.get("current_user_id")
+    employee_ids = data.get("employee_ids")
+    org_unit_id = data.get("organization_unit_id")
+
+    try:
+        year = int(year)
+        if employee_ids is not None:
+            if not isinstance(employee_ids, list):
+                return jsonify({"error": "employee_ids phải là danh sách"}), 400
+            employee_ids = sorted({int(e) for e in employee_ids})
+        elif org_unit_id is not None:
+            org_unit_id = int(org_unit_id)
+        else:
+            return jsonify({"error": "Cần employee_ids hoặc organization_unit_id"}), 400
+        if current_user_id is not None:
+            current_user_id = int(current_user_id)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Tham số không hợp lệ"}), 400
+
+    if employee_ids is not None and len(employee_ids) > _TEAM_STATUS_MAX:
+        return jsonify({"error": f"Tối đa {_TEAM_STATUS_MAX} nhân viên mỗi request"}), 400
+
+    snap = get_org_snapshot()
+    if org_unit_id is not None and org_unit_id not in snap.units:
+        return jsonify({"error": f"Không tìm thấy organization_unit_id={org_unit_id}"}), 404
+
+    conn = None
+    cur = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor(dictionary=True)
+
+        # 1) Nhân viên
+        if employee_ids is not None:
+            if not employee_ids:
+                return jsonify({"mbo_year": year, "count": 0, "items": []})
+            placeholders = ", ".join(["%s"] * len(employee_ids))
+            cur.execute(
+                f"SELECT id, full_name, organization_unit_id FROM employees2026 WHERE id IN ({placeholders})",
+                employee_ids,
+            )
+        else:
+            unit_ids = sorted(snap.descendant_ids(org_unit_id))
+            placeholders = ", ".join(["%s"] * len(unit_ids))
+            cur.execute(
+                f"SELECT id, full_name, organization_unit_id FROM employees2026 "
+                f"WHERE organization_unit_id IN ({placeholders}) ORDER BY id",
+                unit_ids,
+            )
+        employees = cur.fetchall()
+        if len(employees) > _TEAM_STATUS_MAX:
+            return jsonify({"error": f"Tối đa {_TEAM_STATUS_MAX} nhân viên mỗi request"}), 400
+
+        # 2) Chuỗi đơn vị (snapshot, không query) + position của mọi quản lý trên chuỗi (1 query)
+        chains = {}
+        manager_ids = set()
+        for emp in employees:
+            unit_id = emp["organization_unit_id"]
+            if unit_id not in chains:
+                chains[unit_id] = unit_chain(unit_id) if unit_id is not None else []
+                manager_ids.update(u.get("employee_id") for u in chains[unit_id] if u.get("employee_id"))
+        positions = fetch_positions(conn, manager_ids)
+
+        # 3) mbo_sessions của nhân viên + quản lý (bản ghi mới nhất mỗi người)
+        session_ids = sorted({e["id"] for e in employees} | manager_ids)
+        sessions = {}
+        if session_ids:
+            placeholders = ", ".join(["%s"] * len(session_ids))
+            cur.execute(
+                f"""
+                SELECT id, employee_id, status, reviewer_id, approver_id
+                FROM mbo_sessions
+                WHERE mbo_year = %s AND employee_id IN ({placeholders})
+                ORDER BY id
+                """,
+                [year, *session_ids],
+            )
+            for row in cur.fetchall():
+                sessions[row["employee_id"]] = row  # id tăng dần => giữ bản mới nhất
+
+        items = []
+        for emp in employees:
+            emp_id = emp["id"]
+            unit_id = emp["organization_unit_id"]
+            path = chains.get(unit_id) or []
+
+            manager_id = next(
+                (u["employee_id"] for u in path if u.get("employee_id") and u["employee_id"] != emp_id),
+                None,
+            )
+            can_submit, reason, manager_status = _team_can_submit(
+                emp_id, unit_id, manager_id, sessions.get(manager_id), year
+            )
+
+            if path:
+                calc_reviewer, calc_approver = pick_reviewer_approver(emp_id, path, positions)
+            else:
+                calc_reviewer, calc_approver = emp_id, emp_id
+
+            sess = sessions.get(emp_id) or {}
+            reviewer_id = sess.get("reviewer_id") or calc_reviewer
+            approver_id = sess.get("approver_id") or calc_approver
+            session_status = (sess.get("status") or "draft").strip().lower()
+
+            item = {
+                "employee_id": emp_id,
+                "full_name": emp.get("full_name"),
+                "organization_unit_id": unit_id,
+                "session_id": sess.get("id"),
+                "session_status": session_status,
+                "reviewer_id": reviewer_id,
+                "approver_id": approver_id,
+                "calculated_reviewer_id": calc_reviewer,
+                "calculated_approver_id": calc_approver,
+                "manager_id": manager_id,
+                "manager_status": manager_status,
+                "can_submit": can_submit,
+                "reason": reason,
+            }
+            if current_user_id is not None:
+                item["can_review"] = current_user_id == reviewer_id and session_status == "submitted"
+                item["can_approve"] = current_user_id == approver_id and session_status == "reviewed"
+            items.append(item)
+
+        return jsonify({"mbo_year": year, "count": len(items), "items": items})
+
+    except Error as e:
+        return jsonify({"error": f"Lỗi cơ sở dữ liệu: {str(e)}"}), 500
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    finally:
+        try:
+            if cur: cur.close()
+            if conn: conn.close()
+        except:
+            pass
@@ -1,10 +1,22 @@
 # submit.py
+from functools import wraps
+
 from flask import Blueprint, request, jsonify
 from database import get_connection
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from MBO.phase_guard import require_mbo_year, require_phase
+from MBO.reviewer_picker import calc_reviewer_approver
 
 submit_bp = Blueprint("submit", __name__)
 
+
+def _jwt_required(view):
+    """jwt_required() nhưng chỉ import flask_jwt_extended khi route được gọi (không tính vào thời gian khởi động)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask_jwt_extended import jwt_required
+        return jwt_required()(view)(*args, **kwargs)
+    return wrapper
+
 LEVEL_ORDER = [
     "group_name",
     "section",
@@ -17,30 +29,16 @@ LEVEL_ORDER = [
 
 # -------------------------------
 # Helper: require mbo_year từ request (2000..2100)
-# Ưu tiên: ?mbo_year= | body.json["mbo_year"] | Header: X-MBO-Year
+# ?mbo_year= | body.json["mbo_year"] | Header: X-MBO-Year — các nguồn phải khớp nhau
+# (dùng chung resolver với require_phase => guard kiểm tra đúng năm sẽ ghi)
 # -------------------------------
 def _require_mbo_year_from_request():
-    try:
-        # 1) Query string
-        val = request.args.get("mbo_year")
-        if val is None:
-            # 2) JSON body
-            data = request.get_json(silent=True) or {}
-            val = data.get("mbo_year")
-        if val is None:
-            # 3) Header
-            val = request.headers.get("X-MBO-Year")
-
-        year = int(val)
-        if 2000 <= year <= 2100:
-            return year
-        return None
-    except Exception:
-        return None
+    return require_mbo_year()
 
 
 # -------------------------------
 @submit_bp.route("/mbo/submit", methods=["POST"])
+@require_phase("create")
 def submit_mbo():
     data = request.json or {}
     employee_id = data.get("employee_id")
@@ -63,145 +61,9 @@ def submit_mbo():
         employee_code = emp["employee_code"]
         leaf_unit_id = emp.get("organization_unit_id")
 
-        # ===== Helpers: truy đơn vị và leo lên cha =====
-        def get_unit_by_id(uid):
-            if not uid:
-                return None
-            with conn.cursor(dictionary=True, buffered=True) as cur:
-                cur.execute(
-                    """
-                    SELECT id, name, type, parent_id, employee_id
-                    FROM organization_units
-                    WHERE id = %s
-                """,
-                    (uid,),
-                )
-                return cur.fetchone()
-
-        def climb_chain_from(start_unit_id, max_depth=64):
-            """Trả về list [leaf, ..., root]. Có chống vòng lặp."""
-            chain, seen, u = [], set(), get_unit_by_id(start_unit_id)
-            while u and u["id"] not in seen and len(chain) < max_depth:
-                chain.append(u)
-                seen.add(u["id"])
-                if not u.get("parent_id"):
-                    break
-                u = get_unit_by_id(u["parent_id"])
-            return chain  # chain[0] = leaf
-
-        # ===== Rule position hợp lệ cho Reviewer (>= Trưởng phòng) =====
-        REVIEWER_OK_POSITIONS = {
-            "tổng giám đốc",
-            "phó tổng giám đốc",
-            "giám đốc",
-            "phó giám đốc",
-            "trưởng phòng cấp cao",
-            "phó phòng cấp cao",
-            "trưởng phòng",
-            "phó phòng",
-        }
-
-        # ✅ NEW: Approver phải là Ban giám đốc trở lên
-        APPROVER_OK_POSITIONS = {
-            "tổng giám đốc",
-            "phó tổng giám đốc",
-            "giám đốc",
-            "phó giám đốc",
-        }
-
-        def get_employee_position(eid):
-            if not eid:
-                return None
-            with conn.cursor(dictionary=True, buffered=True) as cur:
-                cur.execute(
-                    """
-                    SELECT position
-                    FROM nsh.employees2026_base
-                    WHERE id = %s
-                    LIMIT 1
-                """,
-                    (eid,),
-                )
-                row = cur.fetchone()
-            return row["position"] if row else None
-
-        # ===== Tìm reviewer/approver theo rule mới (bỏ LEVEL_ORDER) =====
-        reviewer_id = employee_id
-        approver_id = employee_id
-        reviewer_unit = None
-
-        if leaf_unit_id:
-            path = climb_chain_from(leaf_unit_id)  # từ đơn vị NV -> đỉnh
-
-            # --- Reviewer:
-            # Chỉ chọn manager khác NV và position phải từ Trưởng phòng trở lên.
-            if path:
-                for u in path:  # từ đơn vị hiện tại lên dần
-                    mid = u.get("employee_id")
-                    if not mid:
-                        continue
-                    if mid == employee_id:
-                        continue
-
-                    pos = get_employee_position(mid)
-                    pos_norm = (pos or "").strip().lower()
-
-                    if pos_norm in REVIEWER_OK_POSITIONS:
-                        reviewer_unit = u
-                        break
-            reviewer_id = reviewer_unit["employee_id"] if reviewer_unit else employee_id
-
-            # --- ✅ Approver (BAN GIÁM ĐỐC TRỞ LÊN):
-            approver_unit = None
-
-            if reviewer_unit:
-                # Tìm vị trí reviewer trong path [leaf,...,root]
-                try:
-                    idx = next(
-                        i for i, u in enumerate(path) if u["id"] == reviewer_unit["id"]
-                    )
-                except StopIteration:
-                    idx = -1
-
-                # Leo lên các cấp phía trên reviewer để tìm manager thuộc BGD
-                if idx >= 0:
-                    for u in path[idx + 1 :]:
-                        mid = u.get("employee_id")
-                        if not mid:
-                            continue
-                        if mid == employee_id:
-                            continue
-
-                        pos = get_employee_position(mid)
-                        pos_norm = (pos or "").strip().lower()
-
-                        if pos_norm in APPROVER_OK_POSITIONS:
-                            approver_unit = u
-                            approver_id = mid
-                            break
-
-                # Fallback: nếu không tìm được BGD -> dùng reviewer để không gãy flow
-                if not approver_unit:
-                    approver_id = reviewer_id
-
-            else:
-                # reviewer = self -> vẫn cố tìm approver BGD từ các cấp trên leaf
-                if path:
-                    for u in path[1:]:
-                        mid = u.get("employee_id")
-                        if not mid or mid == employee_id:
-                            continue
-                        pos = get_employee_position(mid)
-                        pos_norm = (pos or "").strip().lower()
-                        if pos_norm in APPROVER_OK_POSITIONS:
-                            approver_unit = u
-                            approver_id = mid
-                            break
-
-                if not approver_unit:
-                    approver_id = reviewer_id
-
-        # Nếu không có organization_unit_id: giữ mặc định self/self
+        # ===== Reviewer/Approver: chuỗi đơn vị + position đọc thẳng từ bảng closure (1 query) =====
+        # Không có organization_unit_id: giữ mặc định self/self
+        reviewer_id, approver_id = calc_reviewer_approver(conn, employee_id, leaf_unit_id)
 
         # 6) Upsert vào bảng mbo_sessions
         with conn.cursor() as c:
@@ -405,8 +267,9 @@ def get_mbo_status(employee_id):
 # CHECK PERMISSIONS
 # -------------------------------
 @submit_bp.route("/mbo/permissions/<int:employee_id>", methods=["GET"])
-@jwt_required()
+@_jwt_required
 def check_mbo_permissions(employee_id):
+    from flask_jwt_extended import get_jwt_identity
     current_user_id = get_jwt_identity()
     mbo_year = _require_mbo_year_from_request()
     if mbo_year is None:
@@ -440,6 +303,7 @@ def check_mbo_permissions(employee_id):
 # REVIEW
 # -------------------------------
 @submit_bp.route("/mbo/review", methods=["POST"])
+@require_phase("create", "early_review")
 def review_mbo():
     data = request.json or {}
     employee_id = data.get("employee_id")
@@ -479,6 +343,7 @@ def review_mbo():
 
 
 @submit_bp.route("/mbo/approve", methods=["POST"])
+@require_phase("create", "early_review")
 def approve_mbo():
     data = request.json or {}
     employee_id = data.get("employee_id")
@@ -532,117 +397,7 @@ def _calc_reviewer_approver_final_by_unit_tree(conn, employee_id: int, leaf_unit
     - Approver: BẮT BUỘC thuộc nhóm Ban giám đốc trở lên (GĐ/PGĐ/PGTGĐ/TGĐ),
                tìm bằng cách leo lên từ reviewer_unit (ưu tiên gần nhất).
     """
-    # Rule position hợp lệ cho Reviewer (>= Trưởng phòng)
-    REVIEWER_OK_POSITIONS = {
-        "tổng giám đốc",
-        "phó tổng giám đốc",
-        "giám đốc",
-        "phó giám đốc",
-        "trưởng phòng cấp cao",
-        "phó phòng cấp cao",
-        "trưởng phòng",
-        "phó phòng",
-    }
-
-    # ✅ NEW: Approver phải là Ban giám đốc trở lên
-    APPROVER_OK_POSITIONS = {
-        "tổng giám đốc",
-        "phó tổng giám đốc",
-        "giám đốc",
-        "phó giám đốc",
-    }
-
-    def get_employee_position(eid):
-        if not eid:
-            return None
-        with conn.cursor(dictionary=True, buffered=True) as cur:
-            cur.execute(
-                """
-                SELECT position
-                FROM nsh.employees2026_base
-                WHERE id = %s
-                LIMIT 1
-                """,
-                (eid,),
-            )
-            row = cur.fetchone()
-        return row["position"] if row else None
-
-    def get_unit_by_id(uid):
-        if not uid:
-            return None
-        with conn.cursor(dictionary=True, buffered=True) as cur:
-            cur.execute(
-                """
-                SELECT id, name, type, parent_id, employee_id
-                FROM organization_units
-                WHERE id = %s
-                LIMIT 1
-                """,
-                (uid,),
-            )
-            return cur.fetchone()
-
-    def climb_chain_from(start_unit_id, max_depth=64):
-        chain, seen = [], set()
-        u = get_unit_by_id(start_unit_id)
-        while u and u["id"] not in seen and len(chain) < max_depth:
-            chain.append(u)  # leaf -> root
-            seen.add(u["id"])
-            pid = u.get("parent_id")
-            if not pid:
-                break
-            u = get_unit_by_id(pid)
-        return chain
-
-    reviewer_id = employee_id
-    approver_id = employee_id
-    reviewer_unit = None
-
-    if not leaf_unit_id:
-        return reviewer_id, approver_id
-
-    path = climb_chain_from(leaf_unit_id)
-
-    # reviewer: manager khác NV và position hợp lệ
-    for u in path:
-        mid = u.get("employee_id")
-        if not mid or mid == employee_id:
-            continue
-        pos_norm = (get_employee_position(mid) or "").strip().lower()
-        if pos_norm in REVIEWER_OK_POSITIONS:
-            reviewer_unit = u
-            reviewer_id = mid
-            break
-
-    # ✅ approver: leo lên từ reviewer_unit để tìm BGD gần nhất
-    if reviewer_unit:
-        idx = next((i for i, u in enumerate(path) if u["id"] == reviewer_unit["id"]), -1)
-        found = None
-        if idx >= 0:
-            for uu in path[idx + 1 :]:
-                mid = uu.get("employee_id")
-                if not mid or mid == employee_id:
-                    continue
-                pos_norm = (get_employee_position(mid) or "").strip().lower()
-                if pos_norm in APPROVER_OK_POSITIONS:
-                    found = mid
-                    break
-        approver_id = found if found else reviewer_id
-    else:
-        # reviewer = self -> tìm approver BGD từ các cấp trên leaf
-        found = None
-        for u in path[1:]:
-            mid = u.get("employee_id")
-            if not mid or mid == employee_id:
-                continue
-            pos_norm = (get_employee_position(mid) or "").strip().lower()
-            if pos_norm in APPROVER_OK_POSITIONS:
-                found = mid
-                break
-        approver_id = found if found else reviewer_id
-
-    return reviewer_id, approver_id
+    return calc_reviewer_approver(conn, employee_id, leaf_unit_id)
 
 
 # -------------------------------
@@ -744,6 +499,7 @@ def _auto_copy_reviewer_to_approver(conn, employee_code: str, mbo_year: int):
 
 
 @submit_bp.route("/mbo/submit-final", methods=["POST"])
+@require_phase("self_assessment")
 def submit_mbo_final():
     """
     Gửi tự đánh giá cuối năm:
@@ -838,6 +594,7 @@ def submit_mbo_final():
 
 
 @submit_bp.route("/mbo/reviewed_final", methods=["POST"])
+@require_phase("final_review")
 def reviewed_final_mbo():
     data = request.json or {}
     employee_id = data.get("employee_id")
@@ -864,6 +621,7 @@ def reviewed_final_mbo():
 
 
 @submit_bp.route("/mbo/approved_final", methods=["POST"])
+@require_phase("final_review")
 def approved_final_mbo():
     data = request.json or {}
     employee_id = data.get("employee_id")
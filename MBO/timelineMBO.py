@@ -1,6 +1,13 @@
-from flask import Blueprint, request, jsonify
+import os
+import threading
+import time
+
+from flask import Blueprint, request, jsonify, current_app
 from database import get_connection
+from data_versions import TIMELINE, get_data_version
 from datetime import datetime
+from http_cache import make_etag, is_not_modified, not_modified_response, json_response
+from schema_registry import has_table, has_column, refresh as refresh_schema_registry
 
 mbo_timeline_bpp = Blueprint("mbo_timeline_bpp", __name__)
 
@@ -36,7 +43,12 @@ def ensure_table():
     - mbo_timelines
     - mbo_years (lưu trạng thái theo từng năm)
     Đồng thời migrate bỏ cột enabled nếu còn trong mbo_timelines.
+    Schema đã đúng (tra registry, không chạy DDL) thì bỏ qua.
     """
+    if (has_table("mbo_timelines") and has_table("mbo_years")
+            and not has_column("mbo_timelines", "enabled")):
+        return False
+
     db = get_connection()
     cur = db.cursor()
     # timelines
@@ -57,10 +69,8 @@ def ensure_table():
         """
     )
     # migrate bỏ enabled nếu còn
-    try:
+    if has_column("mbo_timelines", "enabled"):
         cur.execute("ALTER TABLE mbo_timelines DROP COLUMN enabled")
-    except Exception:
-        pass
 
     # years (status theo từng năm)
     cur.execute(
@@ -80,75 +90,129 @@ def ensure_table():
     db.commit()
     cur.close()
     db.close()
+    refresh_schema_registry()
+    return True
 
 def _ensure_year_has_5_rows(db, year: int):
     """
-    Đảm bảo đủ 5 phase cho 1 năm. Khi chèn mới -> status='inactive' để nhất quán.
+    Đảm bảo đủ 5 phase cho 1 năm (1 câu lệnh, dựa trên uq_year_phase).
+    Khi chèn mới -> status='inactive' để nhất quán. Commit do caller thực hiện.
+    Trả số phase vừa chèn.
     """
     cur = db.cursor()
-    for ph in VALID_PHASES.keys():
+    try:
         cur.execute(
-            "SELECT 1 FROM mbo_timelines WHERE mbo_year=%s AND phase=%s LIMIT 1",
-            (year, ph),
+            f"""
+            INSERT INTO mbo_timelines (mbo_year, phase, status)
+            VALUES {', '.join(["(%s, %s, 'inactive')"] * len(VALID_PHASES))}
+            ON DUPLICATE KEY UPDATE mbo_year = mbo_year
+            """,
+            [v for ph in VALID_PHASES for v in (year, ph)],
         )
-        if not cur.fetchone():
-            cur.execute(
-                "INSERT INTO mbo_timelines (mbo_year, phase, status) VALUES (%s,%s,'inactive')",
-                (year, ph),
-            )
-    db.commit()
-    cur.close()
+        return cur.rowcount
+    finally:
+        cur.close()
 
 def ensure_year_row(cur, db, year: int, default_status="inactive"):
     # tạo row nếu chưa có
-    cur.execute("SELECT COUNT(*) FROM mbo_timeline WHERE year = %s", (year,))
-    (cnt,) = cur.fetchone()
-    if cnt == 0:
-        cur.execute(
-            "INSERT INTO mbo_timeline (year, status) VALUES (%s, %s)",
-            (year, default_status),
-        )
+    cur.execute(
+        """
+        INSERT INTO mbo_years (year, status) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE year = year
+        """,
+        (year, default_status),
+    )
 
 def set_year_status(cur, db, year: int, status: str):
     # KHÔNG set updated_at nữa
     cur.execute(
-        "UPDATE mbo_timeline SET status=%s WHERE year=%s",
+        "UPDATE mbo_years SET status=%s WHERE year=%s",
         (status, year),
     )
 
 
-def get_year_status(cur, db, year: int) -> str:
-    """
-    Lấy status của một năm; nếu chưa có row thì tạo mặc định inactive rồi trả về.
-    """
-    ensure_year_row(cur, db, year, default_status="inactive")
-    cur.execute("SELECT status FROM mbo_years WHERE year=%s", (year,))
-    r = cur.fetchone()
-    return r[0] if r else "inactive"
+# -------------------------
+# CACHE (timeline / current_year / status năm)
+# -------------------------
+# Entry gắn version nhóm "mbo_timeline" (data_versions): request ghi của blueprint này / job nền bump version
+# => mọi worker nạp lại sau tối đa DATA_VERSION_TTL giây; TTL chỉ là giới hạn trên phòng khi sửa DB bằng tay.
+MBO_TIMELINE_TTL = int(os.getenv("MBO_TIMELINE_TTL", "60"))
 
-# --------------------------------
-# 1) GET timeline by year (KHÔNG ĐỔI)
-# --------------------------------
-@mbo_timeline_bpp.route("/mbo/timeline/<int:mbo_year>", methods=["GET"])
-def get_timeline_by_year(mbo_year: int):
+_cache_lock = threading.Lock()
+_cache = {}  # key -> (loaded_at, version, value)
+
+
+def _cached(key, loader):
+    version = get_data_version(TIMELINE)
+    hit = _cache.get(key)
+    if hit and hit[1] == version and time.monotonic() - hit[0] < MBO_TIMELINE_TTL:
+        return hit[2]
+    value = loader()
+    with _cache_lock:
+        _cache[key] = (time.monotonic(), version, value)
+    return value
+
+
+def invalidate_timeline_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _query(sql, params=(), one=False):
     db = get_connection()
     cur = db.cursor(dictionary=True)
     try:
-        cur.execute(
-            """
-            SELECT id, mbo_year, phase, start_date, end_date, status
-            FROM mbo_timelines
-            WHERE mbo_year = %s
-            ORDER BY FIELD(phase,'create','early_review','self_assessment','final_review','official_result')
-            """,
-            (mbo_year,),
-        )
-        rows = cur.fetchall()
-        return jsonify({"year": mbo_year, "items": rows})
+        cur.execute(sql, params)
+        return cur.fetchone() if one else cur.fetchall()
     finally:
         cur.close()
         db.close()
 
+
+def get_timeline(mbo_year: int):
+    """Các phase của năm (đã sắp theo thứ tự VALID_PHASES)."""
+    return _cached(("timeline", mbo_year), lambda: _query(
+        """
+        SELECT id, mbo_year, phase, start_date, end_date, status
+        FROM mbo_timelines
+        WHERE mbo_year = %s
+        ORDER BY FIELD(phase,'create','early_review','self_assessment','final_review','official_result')
+        """,
+        (mbo_year,),
+    ))
+
+
+def get_current_year() -> int:
+    """mbo_settings.current_year; chưa cấu hình thì dùng năm hiện tại (không ghi DB)."""
+    def load():
+        row = _query("SELECT current_year FROM mbo_settings WHERE id = 1", one=True)
+        return int(row["current_year"]) if row else datetime.now().year
+    return _cached(("current_year",), load)
+
+
+def get_year_status(year: int) -> str:
+    """Status của năm trong mbo_years; chưa có row => 'inactive' (không ghi DB)."""
+    def load():
+        row = _query("SELECT status FROM mbo_years WHERE year = %s", (year,), one=True)
+        return row["status"] if row else "inactive"
+    return _cached(("year_status", year), load)
+
+
+def _cached_json_response(body):
+    """Serialize giống jsonify + gắn ETag theo nội dung; trả 304 nếu client đã có."""
+    body_json = current_app.json.dumps(body)
+    etag = "mbo-" + make_etag(body_json)
+    if is_not_modified(etag):
+        return not_modified_response(etag)
+    return json_response(body_json, etag=etag)
+
+# --------------------------------
+# 1) GET timeline by year (KHÔNG ĐỔI)
+# --------------------------------
+@mbo_timeline_bpp.route("/mbo/timeline/<int:mbo_year>", methods=["GET"])
+def get_timeline_by_year(mbo_year: int):
+    return _cached_json_response({"year": mbo_year, "items": get_timeline(mbo_year)})
+
 # --------------------------------
 # 2) PUT upsert timeline for a year (KHÔNG ĐỔI)
 # --------------------------------
@@ -183,25 +247,22 @@ def upsert_timeline_for_year(mbo_year: int):
     try:
         _ensure_year_has_5_rows(db, mbo_year)
 
-        sql_sel = "SELECT id FROM mbo_timelines WHERE mbo_year=%s AND phase=%s"
-        sql_ins = """
+        # 1 câu upsert cho tất cả phase gửi lên
+        cur.execute(
+            f"""
             INSERT INTO mbo_timelines (mbo_year, phase, start_date, end_date, status)
-            VALUES (%s,%s,%s,%s,%s)
-        """
-        sql_upd = """
-            UPDATE mbo_timelines
-               SET start_date=%s, end_date=%s, status=%s, updated_at=CURRENT_TIMESTAMP
-             WHERE mbo_year=%s AND phase=%s
-        """
-
-        for phase, s, e, st in normalized:
-            cur.execute(sql_sel, (mbo_year, phase))
-            if not cur.fetchone():
-                cur.execute(sql_ins, (mbo_year, phase, s, e, st))
-            else:
-                cur.execute(sql_upd, (s, e, st, mbo_year, phase))
+            VALUES {', '.join(["(%s,%s,%s,%s,%s)"] * len(normalized))}
+            ON DUPLICATE KEY UPDATE
+                start_date = VALUES(start_date),
+                end_date   = VALUES(end_date),
+                status     = VALUES(status),
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            [v for phase, s, e, st in normalized for v in (mbo_year, phase, s, e, st)],
+        )
 
         db.commit()
+        invalidate_timeline_cache()
         return jsonify({"ok": True})
     finally:
         cur.close()
@@ -235,6 +296,7 @@ def reset_year(mbo_year: int):
         set_year_status(cur, db, mbo_year, "inactive")
 
         db.commit()
+        invalidate_timeline_cache()
         return jsonify({"ok": True})
     finally:
         cur.close()
@@ -250,49 +312,17 @@ def reset_year(mbo_year: int):
 #   - Nếu không truyền year => dùng current_year.
 @mbo_timeline_bpp.route("/mbo/settings", methods=["GET"])
 def get_settings():
-    db = get_connection()
-    cur = db.cursor(dictionary=True)
-    try:
-        cur.execute("SELECT current_year FROM mbo_settings WHERE id = 1")
-        row = cur.fetchone()
+    # Chỉ đọc (từ cache): chưa có mbo_settings / mbo_years thì trả mặc định, không INSERT trên GET
+    current_year = get_current_year()
 
-        if not row:
-            year_now = datetime.now().year
-            cur2 = db.cursor()
-            try:
-                cur2.execute(
-                    """
-                    INSERT INTO mbo_settings (id, current_year)
-                    VALUES (1, %s)
-                    ON DUPLICATE KEY UPDATE current_year = VALUES(current_year)
-                    """,
-                    (year_now,),
-                )
-                db.commit()
-                current_year = year_now
-            finally:
-                cur2.close()
-        else:
-            current_year = int(row["current_year"])
-
-        # year cần lấy status: ưu tiên query param ?year=, mặc định = current_year
-        year_param = request.args.get("year", type=int) or current_year
+    # year cần lấy status: ưu tiên query param ?year=, mặc định = current_year
+    year_param = request.args.get("year", type=int) or current_year
 
-        # Lấy status từ mbo_years (nếu chưa có thì tạo inactive)
-        cur3 = db.cursor()
-        try:
-            status = get_year_status(cur3, db, year_param)
-        finally:
-            cur3.close()
-
-        return jsonify({
-            "current_year": current_year,
-            "year": year_param,
-            "status": status
-        })
-    finally:
-        cur.close()
-        db.close()
+    return _cached_json_response({
+        "current_year": current_year,
+        "year": year_param,
+        "status": get_year_status(year_param),
+    })
 
 # PUT /mbo/settings — giữ nguyên tên. Chỉ cập nhật current_year, không lưu status.
 @mbo_timeline_bpp.route("/mbo/settings", methods=["PUT"])
@@ -317,6 +347,7 @@ def update_settings():
         ensure_year_row(cur, db, year, default_status="inactive")
 
         db.commit()
+        invalidate_timeline_cache()
         return jsonify({"ok": True, "current_year": year})
     finally:
         cur.close()
@@ -364,6 +395,7 @@ def update_status_active():
             )
 
         db.commit()
+        invalidate_timeline_cache()
         return jsonify({
             "message": f"Đã cập nhật status của năm {year} thành '{status}'",
             "year": year,
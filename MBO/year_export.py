@@ -0,0 +1,368 @@
+# year_export.py
+# Xuất báo cáo MBO cuối năm (nhân viên + điểm cuối, mục tiêu, năng lực, thái độ) của 1 cây đơn vị
+# ra XLSX hoặc CSV (zip) dưới dạng job chạy nền:
+#   - đọc bằng cursor không buffer (server-side, fetchmany theo lô) -> bộ nhớ không phụ thuộc số dòng
+#   - XLSX: openpyxl write_only; CSV: mỗi sheet 1 file .csv trong zip, ghi thẳng vào entry của zip
+#   - trạng thái job lưu ra file JSON cạnh file kết quả => worker nào cũng trả lời được polling
+#
+# API:
+#   POST /mbo/export                     {mbo_year, organization_unit_id, format: "xlsx"|"csv"} -> 202 + job
+#   GET  /mbo/export/<job_id>            trạng thái job (queued/running/done/failed, số dòng từng sheet)
+#   GET  /mbo/export/<job_id>/download   tải file khi job done
+import csv
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import date, datetime
+
+from flask import Blueprint, request, jsonify, send_file
+
+from database import get_connection, DB_SCHEMA, READ
+from org_closure import CLOSURE_TABLE
+from org_tree import get_org_snapshot
+from MBO.scoring import apply_scores_to_rows
+
+year_export_bp = Blueprint("year_export", __name__)
+
+EXPORT_DIR = os.getenv("MBO_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "mbo_exports"))
+EXPORT_FETCH_SIZE = int(os.getenv("MBO_EXPORT_FETCH_SIZE", "500"))
+EXPORT_MAX_CONCURRENT = int(os.getenv("MBO_EXPORT_MAX_CONCURRENT", "2"))
+EXPORT_RETENTION_HOURS = int(os.getenv("MBO_EXPORT_RETENTION_HOURS", "24"))
+
+FORMATS = {
+    "xlsx": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": ("zip", "application/zip"),
+}
+
+_JOB_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+_status_lock = threading.Lock()
+
+# Cột sheet nhân viên (theo thứ tự xuất)
+EMPLOYEE_COLUMNS = [
+    "id", "employee_code", "full_name", "position", "organization_unit_id", "department_name",
+    "status", "reviewer_id", "approver_id", "attitude_status",
+    "job_score", "competency_score", "attitude_score", "computed_final", "score_final",
+]
+
+
+# ======================
+# Trạng thái job (file JSON)
+# ======================
+def _job_path(job_id, ext):
+    return os.path.join(EXPORT_DIR, f"{job_id}.{ext}")
+
+
+def _read_status(job_id):
+    if not _JOB_ID_RE.match(job_id or ""):
+        return None
+    try:
+        with open(_job_path(job_id, "json"), "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_status(job_id, **changes):
+    """Cập nhật file trạng thái (ghi file tạm rồi rename để polling không đọc nửa chừng)."""
+    with _status_lock:
+        status = _read_status(job_id) or {}
+        status.update(changes)
+        tmp = _job_path(job_id, "json.tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(status, fh, ensure_ascii=False, default=str)
+        os.replace(tmp, _job_path(job_id, "json"))
+        return status
+
+
+def _cleanup_old_jobs():
+    """Xoá file job cũ hơn EXPORT_RETENTION_HOURS."""
+    cutoff = time.time() - EXPORT_RETENTION_HOURS * 3600
+    try:
+        names = os.listdir(EXPORT_DIR)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+# ======================
+# Nguồn dữ liệu (stream theo lô)
+# ======================
+def _stream(conn, sql, params):
+    """Yield (columns, [rows]) theo lô bằng cursor không buffer."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(sql, params)
+        columns = list(cursor.column_names)
+        while True:
+            rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+            if not rows:
+                break
+            yield columns, rows
+    finally:
+        cursor.close()
+
+
+def _employee_batches(conn, score_conn, unit_id, mbo_year):
+    sql = f"""
+        SELECT
+            e.id, e.employee_code, e.full_name, e.position, e.organization_unit_id,
+            ou.name AS department_name,
+            COALESCE(ms.status, 'draft')         AS status,
+            ms.reviewer_id,
+            ms.approver_id,
+            ms.score_final                       AS ms_score_final,
+            COALESCE(ms.attitude_status, 'none') AS attitude_status
+        FROM {CLOSURE_TABLE} c
+        JOIN `{DB_SCHEMA}`.employees2026 e ON e.organization_unit_id = c.descendant_id
+        LEFT JOIN organization_units ou ON ou.id = e.organization_unit_id
+        LEFT JOIN `{DB_SCHEMA}`.mbo_sessions ms ON ms.employee_id = e.id AND ms.mbo_year = %s
+        WHERE c.ancestor_id = %s
+        ORDER BY e.id
+    """
+    score_cursor = score_conn.cursor(dictionary=True)
+    try:
+        for _, rows in _stream(conn, sql, (mbo_year, unit_id)):
+            # điểm cuối tính theo lô bằng engine MBO.scoring (connection riêng vì cursor chính đang stream)
+            apply_scores_to_rows(score_cursor, mbo_year, rows)
+            yield EMPLOYEE_COLUMNS, rows
+    finally:
+        score_cursor.close()
+
+
+def _detail_batches(conn, table, unit_id, mbo_year):
+    """Mọi dòng của bảng chi tiết (personalmbo/competencymbo/attitudembo) thuộc cây đơn vị."""
+    sql = f"""
+        SELECT e.full_name, e.organization_unit_id, t.*
+        FROM {CLOSURE_TABLE} c
+        JOIN `{DB_SCHEMA}`.employees2026 e ON e.organization_unit_id = c.descendant_id
+        JOIN `{DB_SCHEMA}`.{table} t ON t.employee_code = e.employee_code AND t.mbo_year = %s
+        WHERE c.ancestor_id = %s
+        ORDER BY e.id, t.id
+    """
+    yield from _stream(conn, sql, (mbo_year, unit_id))
+
+
+def _sheets(conn, score_conn, unit_id, mbo_year):
+    yield "nhan_vien", _employee_batches(conn, score_conn, unit_id, mbo_year)
+    yield "muc_tieu", _detail_batches(conn, "personalmbo", unit_id, mbo_year)
+    yield "nang_luc", _detail_batches(conn, "competencymbo", unit_id, mbo_year)
+    yield "thai_do", _detail_batches(conn, "attitudembo", unit_id, mbo_year)
+
+
+# ======================
+# Writer (bộ nhớ cố định)
+# ======================
+def _plain(value):
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", errors="replace")
+    return value
+
+
+class _XlsxWriter:
+    def __init__(self, path):
+        from openpyxl import Workbook
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+        self.path = path
+        self.wb = Workbook(write_only=True)
+        self._illegal = ILLEGAL_CHARACTERS_RE
+        self.ws = None
+
+    def start_sheet(self, name, columns):
+        self.ws = self.wb.create_sheet(title=name)
+        self.ws.append(columns)
+
+    def write_rows(self, columns, rows):
+        for row in rows:
+            values = []
+            for col in columns:
+                v = _plain(row.get(col))
+                if isinstance(v, str):
+                    v = self._illegal.sub("", v)
+                values.append(v)
+            self.ws.append(values)
+
+    def close(self):
+        self.wb.save(self.path)
+
+
+class _CsvZipWriter:
+    def __init__(self, path):
+        self.zf = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._entry = None
+        self._text = None
+        self._csv = None
+
+    def _end_sheet(self):
+        if self._text is not None:
+            self._text.close()  # đóng luôn entry trong zip
+            self._text = self._entry = self._csv = None
+
+    def start_sheet(self, name, columns):
+        self._end_sheet()
+        self._entry = self.zf.open(f"{name}.csv", "w", force_zip64=True)
+        # utf-8-sig để Excel mở đúng tiếng Việt
+        self._text = io.TextIOWrapper(self._entry, encoding="utf-8-sig", newline="")
+        self._csv = csv.writer(self._text)
+        self._csv.writerow(columns)
+
+    def write_rows(self, columns, rows):
+        self._csv.writerows([_plain(row.get(col)) for col in columns] for row in rows)
+
+    def close(self):
+        self._end_sheet()
+        self.zf.close()
+
+
+# ======================
+# Job
+# ======================
+def run_export(job_id, mbo_year, unit_id, fmt):
+    ext, _ = FORMATS[fmt]
+    out_path = _job_path(job_id, ext)
+    tmp_path = out_path + ".part"
+
+    with _slots:
+        _write_status(job_id, state="running", started_at=datetime.now().isoformat(timespec="seconds"))
+        conn = score_conn = None
+        counts = {}
+        try:
+            conn = get_connection(READ)
+            score_conn = get_connection(READ)
+            writer = _XlsxWriter(tmp_path) if fmt == "xlsx" else _CsvZipWriter(tmp_path)
+            try:
+                for sheet, batches in _sheets(conn, score_conn, unit_id, mbo_year):
+                    counts[sheet] = 0
+                    started = False
+                    for columns, rows in batches:
+                        if not started:
+                            writer.start_sheet(sheet, columns)
+                            started = True
+                        writer.write_rows(columns, rows)
+                        counts[sheet] += len(rows)
+                        _write_status(job_id, rows=counts)
+                    if not started:
+                        writer.start_sheet(sheet, EMPLOYEE_COLUMNS if sheet == "nhan_vien" else [])
+            finally:
+                writer.close()
+
+            os.replace(tmp_path, out_path)
+            _write_status(
+                job_id,
+                state="done",
+                rows=counts,
+                size_bytes=os.path.getsize(out_path),
+                finished_at=datetime.now().isoformat(timespec="seconds"),
+            )
+        except Exception as e:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            _write_status(
+                job_id,
+                state="failed",
+                rows=counts,
+                error=str(e),
+                finished_at=datetime.now().isoformat(timespec="seconds"),
+            )
+        finally:
+            for c in (conn, score_conn):
+                try:
+                    if c: c.close()
+                except Exception:
+                    pass
+
+
+def start_export(mbo_year, unit_id, fmt="xlsx"):
+    """Tạo job + chạy thread nền; trả về trạng thái ban đầu."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _cleanup_old_jobs()
+
+    job_id = uuid.uuid4().hex
+    status = _write_status(
+        job_id,
+        job_id=job_id,
+        state="queued",
+        mbo_year=mbo_year,
+        organization_unit_id=unit_id,
+        format=fmt,
+        rows={},
+        created_at=datetime.now().isoformat(timespec="seconds"),
+    )
+    threading.Thread(
+        target=run_export, args=(job_id, mbo_year, unit_id, fmt), name=f"mbo-export-{job_id}", daemon=True
+    ).start()
+    return status
+
+
+def _with_links(status):
+    job_id = status["job_id"]
+    status = dict(status)
+    status["status_url"] = f"/mbo/export/{job_id}"
+    status["download_url"] = f"/mbo/export/{job_id}/download" if status.get("state") == "done" else None
+    return status
+
+
+# POST /mbo/export
+@year_export_bp.route("/mbo/export", methods=["POST"])
+def create_export():
+    data = request.get_json(silent=True) or {}
+    fmt = str(data.get("format") or "xlsx").strip().lower()
+    if fmt not in FORMATS:
+        return jsonify({"error": "format phải là 'xlsx' hoặc 'csv'"}), 400
+
+    try:
+        mbo_year = int(data.get("mbo_year") or date.today().year)
+        unit_id = int(data.get("organization_unit_id"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "Thiếu hoặc sai mbo_year / organization_unit_id"}), 400
+
+    if unit_id not in get_org_snapshot().units:
+        return jsonify({"error": f"Không tìm thấy organization_unit_id={unit_id}"}), 404
+
+    try:
+        status = start_export(mbo_year, unit_id, fmt)
+    except OSError as e:
+        return jsonify({"error": f"Không tạo được job export: {e}"}), 500
+    return jsonify(_with_links(status)), 202
+
+
+# GET /mbo/export/<job_id>
+@year_export_bp.route("/mbo/export/<job_id>", methods=["GET"])
+def get_export_status(job_id):
+    status = _read_status(job_id)
+    if not status:
+        return jsonify({"error": "Không tìm thấy job export"}), 404
+    return jsonify(_with_links(status))
+
+
+# GET /mbo/export/<job_id>/download
+@year_export_bp.route("/mbo/export/<job_id>/download", methods=["GET"])
+def download_export(job_id):
+    status = _read_status(job_id)
+    if not status:
+        return jsonify({"error": "Không tìm thấy job export"}), 404
+    if status.get("state") != "done":
+        return jsonify({"error": "Job export chưa hoàn tất", "state": status.get("state")}), 409
+
+    ext, mimetype = FORMATS[status["format"]]
+    path = _job_path(job_id, ext)
+    if not os.path.isfile(path):
+        return jsonify({"error": "File export đã bị xoá (quá hạn lưu)"}), 410
+
+    download_name = f"mbo_{status['mbo_year']}_unit{status['organization_unit_id']}.{ext}"
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name)
@@ -0,0 +1,114 @@
+# benchmarks/bench_allocations.py
+# So sánh tạo phân bổ kiểu cũ (từng dòng) và theo lô (_create_allocations) trên DB thật.
+# Mọi thay đổi đều ROLLBACK sau mỗi lần chạy -> không để lại dữ liệu.
+#
+#   python benchmarks/bench_allocations.py --goal-id 123 --sender-code E001 --year 2025 --receivers 200
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_connection  # noqa: E402
+from MBO.allocationsMBO import (  # noqa: E402
+    _create_allocations,
+    _fetch_sender_goal,
+    _insert_receiver_goal,
+    _reset_mbo_to_draft_by_codes,
+)
+from schema_registry import has_column  # noqa: E402
+
+
+class CountingCursor:
+    """Đếm số câu lệnh gửi xuống DB."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.statements = 0
+
+    def execute(self, *args, **kwargs):
+        self.statements += 1
+        return self._cursor.execute(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def _legacy_create(cursor, items):
+    """Luồng cũ: mỗi item 1 lần SELECT nguồn + 1 INSERT personalmbo + 1 INSERT mbo_allocations."""
+    has_receiver_goal = has_column("mbo_allocations", "receiver_goal_id")
+    impacted = set()
+    for item in items:
+        src = _fetch_sender_goal(cursor, item["goal_id"], item["sender_code"], item["mbo_year"])
+        rg_id = _insert_receiver_goal(cursor, item["receiver_code"], item["mbo_year"], src, item["allocation_value"])
+        if has_receiver_goal:
+            cursor.execute(
+                "INSERT INTO mbo_allocations (goal_id, sender_code, receiver_code, mbo_year, allocation_value, receiver_goal_id, created_at) "
+                "VALUES (%s, %s, %s, %s, %s, %s, NOW())",
+                (item["goal_id"], item["sender_code"], item["receiver_code"], item["mbo_year"], item["allocation_value"], rg_id),
+            )
+        else:
+            cursor.execute(
+                "INSERT INTO mbo_allocations (goal_id, sender_code, receiver_code, mbo_year, allocation_value, created_at) "
+                "VALUES (%s, %s, %s, %s, %s, NOW())",
+                (item["goal_id"], item["sender_code"], item["receiver_code"], item["mbo_year"], item["allocation_value"]),
+            )
+        impacted.add(item["receiver_code"])
+    _reset_mbo_to_draft_by_codes(cursor, list(impacted), items[0]["mbo_year"])
+
+
+def _run(fn, items, repeat):
+    timings, statements = [], 0
+    for _ in range(repeat):
+        conn = get_connection()
+        cursor = CountingCursor(conn.cursor(dictionary=True))
+        try:
+            t0 = time.perf_counter()
+            fn(cursor, items)
+            timings.append(time.perf_counter() - t0)
+            statements = cursor.statements
+        finally:
+            conn.rollback()
+            cursor.close()
+            conn.close()
+    return {
+        "median_s": round(statistics.median(timings), 4),
+        "rows_per_s": round(len(items) / statistics.median(timings), 1),
+        "statements": statements,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark tạo phân bổ MBO")
+    parser.add_argument("--goal-id", type=int, required=True, help="id mục tiêu nguồn trong personalmbo")
+    parser.add_argument("--sender-code", required=True)
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--receivers", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    items = [
+        {
+            "goal_id": args.goal_id,
+            "sender_code": args.sender_code,
+            "receiver_code": f"BENCH{i:05d}",
+            "allocation_value": str(i % 100),
+            "mbo_year": args.year,
+        }
+        for i in range(args.receivers)
+    ]
+
+    report = {
+        "receivers": args.receivers,
+        "legacy": _run(_legacy_create, items, args.repeat),
+        "batched": _run(_create_allocations, items, args.repeat),
+    }
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
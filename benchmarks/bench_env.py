@@ -0,0 +1,95 @@
+# benchmarks/bench_env.py
+# Cấu hình DB cục bộ cho benchmark (dùng chung cho seed.py và run_load.py).
+#
+#   - Mặc định kết nối 127.0.0.1:3307, schema "nsh" (ELearning viết cứng tiền tố nsh.).
+#   - --docker: tự chạy 1 container MariaDB (lower_case_table_names=1 vì code dùng cả PersonalMBO
+#     lẫn personalmbo, giống server Windows của production).
+#   - Từ chối chạy nếu host trùng DB production (10.73.131.2) để không bao giờ seed/ghi nhầm.
+import os
+import subprocess
+import time
+
+PRODUCTION_HOSTS = {"10.73.131.2"}
+
+DEFAULTS = {
+    "DB_HOST": "127.0.0.1",
+    "DB_PORT": "3307",
+    "DB_USER": "root",
+    "DB_PASS": "bench",
+    "DB_SCHEMA": "nsh",
+}
+
+DOCKER_CONTAINER = "mbo-bench-db"
+DOCKER_IMAGE = os.getenv("BENCH_DB_IMAGE", "mariadb:11")
+
+
+def add_db_arguments(parser):
+    parser.add_argument("--db-host", default=os.getenv("BENCH_DB_HOST", DEFAULTS["DB_HOST"]))
+    parser.add_argument("--db-port", default=os.getenv("BENCH_DB_PORT", DEFAULTS["DB_PORT"]))
+    parser.add_argument("--db-user", default=os.getenv("BENCH_DB_USER", DEFAULTS["DB_USER"]))
+    parser.add_argument("--db-pass", default=os.getenv("BENCH_DB_PASS", DEFAULTS["DB_PASS"]))
+    parser.add_argument("--docker", action="store_true", help="Tự chạy container MariaDB cục bộ")
+
+
+def configure(args):
+    """
+    Ghi biến môi trường DB_* TRƯỚC khi import database / main.
+    Trả về dict cấu hình để ghi kèm kết quả.
+    """
+    if args.db_host in PRODUCTION_HOSTS:
+        raise SystemExit(f"Từ chối chạy benchmark trên DB production ({args.db_host})")
+
+    os.environ.update({
+        "DB_HOST": args.db_host,
+        "DB_PORT": str(args.db_port),
+        "DB_USER": args.db_user,
+        "DB_PASS": args.db_pass,
+        "DB_SCHEMA": DEFAULTS["DB_SCHEMA"],
+    })
+    if args.docker:
+        start_docker(args)
+    return {"host": args.db_host, "port": int(args.db_port), "schema": DEFAULTS["DB_SCHEMA"]}
+
+
+def connect(database=None):
+    import mysql.connector
+
+    return mysql.connector.connect(
+        host=os.environ["DB_HOST"],
+        port=int(os.environ.get("DB_PORT", "3306")),
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASS"],
+        database=database,
+        use_pure=True,
+    )
+
+
+def start_docker(args, timeout=90):
+    running = subprocess.run(
+        ["docker", "ps", "-q", "-f", f"name={DOCKER_CONTAINER}"], capture_output=True, text=True
+    ).stdout.strip()
+    if not running:
+        subprocess.run(["docker", "rm", "-f", DOCKER_CONTAINER], capture_output=True)
+        subprocess.run([
+            "docker", "run", "-d", "--name", DOCKER_CONTAINER,
+            "-p", f"{args.db_port}:3306",
+            "-e", f"MARIADB_ROOT_PASSWORD={args.db_pass}",
+            DOCKER_IMAGE,
+            "--lower-case-table-names=1",
+            "--character-set-server=utf8mb4",
+            "--collation-server=utf8mb4_unicode_ci",
+        ], check=True)
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connect().close()
+            return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1)
+
+
+def stop_docker():
+    subprocess.run(["docker", "rm", "-f", DOCKER_CONTAINER], capture_output=True)
@@ -0,0 +1,146 @@
+# benchmarks/bench_startup.py
+# Đo thời gian khởi động app (cold start) trong tiến trình Python mới, không cần DB:
+#   - import main, create_app() (nạp toàn bộ blueprint)
+#   - top module nạp chậm nhất (python -X importtime, thời gian cộng dồn)
+#   - các module nặng KHÔNG được nạp lúc khởi động (pandas, numpy, openpyxl, flask_jwt_extended, ...)
+#
+#   python benchmarks/bench_startup.py --runs 7 --label baseline
+#   python benchmarks/bench_startup.py --runs 7 --compare benchmarks/results/startup-baseline-....json
+#
+# Exit code 1 khi: có module nặng bị nạp lúc khởi động, vượt --budget-ms, hoặc chậm hơn lần so sánh
+# quá --max-regression % — dùng làm bước chặn hồi quy trước khi deploy.
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Chỉ được nạp khi route cần tới (import trong hàm)
+HEAVY_MODULES = ["pandas", "numpy", "openpyxl", "flask_jwt_extended", "redis", "brotli", "cProfile", "waitress"]
+
+_CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+app = main.create_app()
+t2 = time.perf_counter()
+print("@@STARTUP@@" + json.dumps({
+    "import_main_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "total_ms": (t2 - t0) * 1000,
+    "blueprints": len(app.blueprints),
+    "routes": len(list(app.url_map.iter_rules())),
+    "modules": len(sys.modules),
+    "heavy_loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_once(env):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD % (HEAVY_MODULES,)],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    marker = [line for line in proc.stdout.splitlines() if line.startswith("@@STARTUP@@")]
+    if proc.returncode != 0 or not marker:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit(f"Khởi động app lỗi (exit {proc.returncode})")
+    result = json.loads(marker[0][len("@@STARTUP@@"):])
+
+    # Chỉ lấy module cấp cao nhất (không thụt lề) để thời gian cộng dồn không bị tính trùng
+    top_level = {}
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if m and len(m.group(3)) <= 1:
+            top_level[m.group(4)] = int(m.group(2)) / 1000
+    result["imports_ms"] = top_level
+    return result
+
+
+def summarize(runs, top):
+    def median(key):
+        return round(statistics.median(r[key] for r in runs), 1)
+
+    imports = {}
+    for r in runs:
+        for name, ms in r["imports_ms"].items():
+            imports.setdefault(name, []).append(ms)
+    slowest = sorted(((round(statistics.median(v), 1), k) for k, v in imports.items()), reverse=True)[:top]
+    return {
+        "runs": len(runs),
+        "import_main_ms": median("import_main_ms"),
+        "create_app_ms": median("create_app_ms"),
+        "total_ms": median("total_ms"),
+        "total_ms_min": round(min(r["total_ms"] for r in runs), 1),
+        "blueprints": runs[0]["blueprints"],
+        "routes": runs[0]["routes"],
+        "modules": runs[0]["modules"],
+        "heavy_loaded": sorted({m for r in runs for m in r["heavy_loaded"]}),
+        "slowest_imports_ms": [{"module": k, "ms": v} for v, k in slowest],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đo thời gian khởi động app (import + create_app)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Số module chậm nhất in ra")
+    parser.add_argument("--blueprints", default=None, help="Giới hạn APP_BLUEPRINTS khi đo (mặc định: tất cả)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Ngưỡng tuyệt đối cho total_ms (median)")
+    parser.add_argument("--compare", default=None, help="File JSON lần đo trước")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="% chậm hơn lần so sánh tối đa")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    if args.blueprints:
+        env["APP_BLUEPRINTS"] = args.blueprints
+
+    run_once(env)  # lần đầu ghi .pyc, không tính
+    runs = [run_once(env) for _ in range(args.runs)]
+    summary = summarize(runs, args.top)
+    result = {
+        "label": args.label,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "blueprints_filter": args.blueprints,
+        **summary,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"startup-{args.label}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, ensure_ascii=False, indent=2)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    print(f"Đã ghi kết quả: {output}")
+
+    failures = []
+    if summary["heavy_loaded"]:
+        failures.append(f"Module nặng bị nạp lúc khởi động: {', '.join(summary['heavy_loaded'])}")
+    if args.budget_ms is not None and summary["total_ms"] > args.budget_ms:
+        failures.append(f"total_ms {summary['total_ms']} > budget {args.budget_ms}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as fh:
+            previous = json.load(fh)
+        before, after = previous["total_ms"], summary["total_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"total_ms: {before} -> {after} ({change:+.1f}%)")
+        if change > args.max_regression:
+            failures.append(f"Chậm hơn {change:.1f}% so với {args.compare} (ngưỡng {args.max_regression}%)")
+
+    for msg in failures:
+        print("FAIL:", msg)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# benchmarks/run_load.py
+# Chạy tải lên Flask app (in-process, test_client) với DB benchmark cục bộ đã seed bằng seed.py.
+# Mỗi endpoint đo: p50/p95/p99 latency, throughput, số câu SQL / dòng / thời gian DB mỗi request
+# (lấy từ request_metrics). Kết quả ghi JSON vào benchmarks/results/ để so sánh giữa các lần chạy.
+#
+#   python benchmarks/seed.py --docker --reset
+#   python benchmarks/run_load.py --requests 2000 --concurrency 8 --label baseline
+#   python benchmarks/run_load.py --requests 2000 --concurrency 8 --compare benchmarks/results/baseline-....json
+#
+# Lưu ý: /mbo/submit ghi dữ liệu (chuyển session sang 'submitted'); seed lại (--reset) trước khi so sánh.
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import bench_env  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_MIX = "by_department=3,submit=1,courses=5"
+
+
+# ======================
+# Kịch bản request
+# ======================
+class Scenario:
+    """Sinh request ngẫu nhiên (cố định theo seed) từ dữ liệu đã seed."""
+
+    def __init__(self, conn, mbo_year, rng):
+        cur = conn.cursor()
+        cur.execute("SELECT id FROM organization_units WHERE parent_id IS NOT NULL")
+        self.units = [r[0] for r in cur.fetchall()]
+        cur.execute("SELECT id FROM employees2026_base")
+        self.employees = [r[0] for r in cur.fetchall()]
+        cur.close()
+        if not self.units or not self.employees:
+            raise SystemExit("DB benchmark chưa có dữ liệu — chạy benchmarks/seed.py trước")
+        self.mbo_year = mbo_year
+        self.rng = rng
+
+    def by_department(self):
+        return "GET", f"/employees/by-department/{self.rng.choice(self.units)}?mbo_year={self.mbo_year}", None
+
+    def submit(self):
+        return "POST", "/mbo/submit", {"employee_id": self.rng.choice(self.employees), "mbo_year": self.mbo_year}
+
+    def courses(self):
+        return "GET", f"/eln/courses/by-employee?employee_id={self.rng.choice(self.employees)}", None
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if not hasattr(Scenario, name):
+            raise SystemExit(f"Kịch bản không tồn tại: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ======================
+# Thống kê
+# ======================
+def percentile(sorted_values, p):
+    """Nearest-rank percentile trên list đã sort."""
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(samples, wall_seconds):
+    latencies = sorted(s["ms"] for s in samples)
+    statements = sorted(s["statements"] for s in samples)
+    statuses = {}
+    for s in samples:
+        statuses[str(s["status"])] = statuses.get(str(s["status"]), 0) + 1
+    n = len(samples)
+    return {
+        "requests": n,
+        "errors": sum(1 for s in samples if s["status"] >= 500),
+        "status_codes": statuses,
+        "throughput_rps": round(n / wall_seconds, 2) if wall_seconds else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": round(sum(latencies) / n, 3) if n else None,
+            "max": latencies[-1] if latencies else None,
+        },
+        "queries_per_request": {
+            "mean": round(sum(statements) / n, 2) if n else None,
+            "p95": percentile(statements, 95),
+        },
+        "rows_per_request_mean": round(sum(s["rows"] for s in samples) / n, 1) if n else None,
+        "db_ms_mean": round(sum(s["db_ms"] for s in samples) / n, 3) if n else None,
+    }
+
+
+# ======================
+# Chạy tải
+# ======================
+def _install_stats_header(app):
+    """Đưa số SQL / dòng / thời gian DB của request vào header để client đọc lại."""
+    from request_metrics import current_stats
+
+    @app.after_request
+    def _bench_stats(response):
+        stats = current_stats()
+        if stats is not None:
+            response.headers["X-Bench-Statements"] = str(stats.statements)
+            response.headers["X-Bench-Rows"] = str(stats.rows)
+            response.headers["X-Bench-Db-Ms"] = f"{stats.db_time * 1000:.3f}"
+        return response
+
+
+def run(app, plan, concurrency):
+    samples = []
+    lock = threading.Lock()
+    cursor = iter(plan)
+
+    def worker():
+        client = app.test_client()
+        while True:
+            with lock:
+                item = next(cursor, None)
+            if item is None:
+                return
+            name, method, url, body = item
+            started = time.perf_counter()
+            resp = client.open(url, method=method, json=body)
+            elapsed = (time.perf_counter() - started) * 1000
+            sample = {
+                "name": name,
+                "status": resp.status_code,
+                "ms": round(elapsed, 3),
+                "statements": int(resp.headers.get("X-Bench-Statements", 0)),
+                "rows": int(resp.headers.get("X-Bench-Rows", 0)),
+                "db_ms": float(resp.headers.get("X-Bench-Db-Ms", 0)),
+            }
+            with lock:
+                samples.append(sample)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - started
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current, previous_path):
+    with open(previous_path, encoding="utf-8") as fh:
+        previous = json.load(fh)
+    rows = []
+    for name, cur in current["endpoints"].items():
+        prev = previous.get("endpoints", {}).get(name)
+        if not prev:
+            continue
+        for metric in ("p50", "p95", "p99"):
+            a, b = prev["latency_ms"][metric], cur["latency_ms"][metric]
+            if a and b is not None:
+                rows.append(f"{name:15s} {metric}: {a:9.2f} -> {b:9.2f} ms ({(b - a) / a * 100:+.1f}%)")
+        a, b = prev["queries_per_request"]["mean"], cur["queries_per_request"]["mean"]
+        rows.append(f"{name:15s} queries/req: {a} -> {b}")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test Flask app trên DB benchmark cục bộ")
+    bench_env.add_db_arguments(parser)
+    parser.add_argument("--requests", type=int, default=1000, help="Tổng số request đo (không tính warmup)")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Tỉ trọng kịch bản, mặc định {DEFAULT_MIX}")
+    parser.add_argument("--mbo-year", type=int, default=date.today().year)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", default=None, help="File JSON kết quả (mặc định benchmarks/results/<label>-<time>.json)")
+    parser.add_argument("--compare", default=None, help="File JSON của lần chạy trước để so sánh")
+    args = parser.parse_args(argv)
+
+    db = bench_env.configure(args)
+    os.environ.setdefault("SLOW_REQUEST_MS", "1000000")  # không log request chậm trong lúc đo
+
+    # import sau khi đặt DB_* để database.py trỏ vào DB benchmark
+    from bootstrap import bootstrap
+    from main import create_app
+    bootstrap()
+    app = create_app()
+    _install_stats_header(app)
+
+    rng = random.Random(args.seed)
+    conn = bench_env.connect(db["schema"])
+    try:
+        scenario = Scenario(conn, args.mbo_year, rng)
+    finally:
+        conn.close()
+
+    mix = parse_mix(args.mix)
+    names, weights = list(mix), list(mix.values())
+
+    def make_plan(n):
+        plan = []
+        for name in rng.choices(names, weights=weights, k=n):
+            method, url, body = getattr(scenario, name)()
+            plan.append((name, method, url, body))
+        return plan
+
+    run(app, make_plan(args.warmup), args.concurrency)
+    samples, wall = run(app, make_plan(args.requests), args.concurrency)
+
+    result = {
+        "label": args.label,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_revision": _git_revision(),
+        "db": db,
+        "config": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "mix": mix,
+            "mbo_year": args.mbo_year,
+            "seed": args.seed,
+        },
+        "wall_seconds": round(wall, 3),
+        "overall": summarize(samples, wall),
+        "endpoints": {name: summarize([s for s in samples if s["name"] == name], wall) for name in names},
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{args.label}-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, ensure_ascii=False, indent=2)
+
+    print(json.dumps(result["endpoints"], ensure_ascii=False, indent=2))
+    print(f"Đã ghi kết quả: {output}")
+    if args.compare:
+        print("\n".join(compare(result, args.compare)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+-- benchmarks/schema.sql
+-- Schema tối thiểu cho DB benchmark cục bộ (chỉ các bảng/cột mà các endpoint được đo sử dụng).
+-- Không dùng cho production. Các bảng do app tự tạo khi khởi động (mbo_timelines, mbo_years,
+-- organization_unit_closure, ...) không khai báo ở đây.
+
+CREATE TABLE IF NOT EXISTS organization_units (
+    id              INT AUTO_INCREMENT PRIMARY KEY,
+    name            VARCHAR(255) NOT NULL,
+    type            VARCHAR(50)  NOT NULL,
+    parent_id       INT NULL,
+    code            VARCHAR(50)  NULL,
+    employee_id     INT NULL,
+    employee_count  INT NOT NULL DEFAULT 0,
+    KEY idx_ou_parent (parent_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS employees2026_base (
+    id                   INT AUTO_INCREMENT PRIMARY KEY,
+    employee_code        VARCHAR(50)  NOT NULL,
+    full_name            VARCHAR(255) NOT NULL,
+    gender               VARCHAR(10)  NULL,
+    entry_date           DATE NULL,
+    birth_date           DATE NULL,
+    phone                VARCHAR(30)  NULL,
+    position             VARCHAR(255) NULL,
+    vi_tri               VARCHAR(255) NULL,
+    cap_bac              VARCHAR(50)  NULL,
+    corporation          VARCHAR(255) NULL,
+    company              VARCHAR(255) NULL,
+    factory              VARCHAR(255) NULL,
+    division             VARCHAR(255) NULL,
+    sub_division         VARCHAR(255) NULL,
+    section              VARCHAR(255) NULL,
+    group_name           VARCHAR(255) NULL,
+    note                 TEXT NULL,
+    organization_unit_id INT NULL,
+    employment_status    VARCHAR(20) NOT NULL DEFAULT 'active',
+    status_note          VARCHAR(255) NULL,
+    UNIQUE KEY uq_emp_code (employee_code),
+    KEY idx_emp_unit (organization_unit_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE OR REPLACE VIEW employees2026 AS
+    SELECT * FROM employees2026_base WHERE employment_status = 'active';
+
+CREATE TABLE IF NOT EXISTS mbo_sessions (
+    id               INT AUTO_INCREMENT PRIMARY KEY,
+    employee_id      INT NOT NULL,
+    mbo_year         INT NOT NULL,
+    status           VARCHAR(30) NOT NULL DEFAULT 'draft',
+    reviewer_id      INT NULL,
+    approver_id      INT NULL,
+    score_final      DECIMAL(6,2) NULL,
+    attitude_status  VARCHAR(30) NULL,
+    UNIQUE KEY uq_session (employee_id, mbo_year)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS personalmbo (
+    id                  INT AUTO_INCREMENT PRIMARY KEY,
+    employee_code       VARCHAR(50) NOT NULL,
+    mbo_year            INT NOT NULL,
+    ten_muc_tieu        VARCHAR(500) NULL,
+    mo_ta               TEXT NULL,
+    don_vi_do_luong     VARCHAR(100) NULL,
+    ti_trong            DECIMAL(6,2) NULL,
+    gia_tri_ban_dau     VARCHAR(100) NULL,
+    muc_tieu            VARCHAR(100) NULL,
+    han_hoan_thanh      VARCHAR(50) NULL,
+    xep_loai            VARCHAR(20) NULL,
+    cap_do_theo_doi     VARCHAR(50) NULL,
+    phan_loai           VARCHAR(20) NULL,
+    phan_bo             VARCHAR(20) NULL,
+    reviewer_ti_trong   DECIMAL(6,2) NULL,
+    approver_ti_trong   DECIMAL(6,2) NULL,
+    reviewer_rating     VARCHAR(20) NULL,
+    approver_rating     VARCHAR(20) NULL,
+    self_ey_content     TEXT NULL,
+    self_ey_result      TEXT NULL,
+    self_ey_rating      VARCHAR(20) NULL,
+    approved_ey_content TEXT NULL,
+    approved_ey_result  TEXT NULL,
+    approved_ey_rating  VARCHAR(20) NULL,
+    approved_ey_score   DECIMAL(6,2) NULL,
+    reviewed_ey_content TEXT NULL,
+    reviewed_ey_result  TEXT NULL,
+    reviewed_ey_rating  VARCHAR(20) NULL,
+    reviewed_ey_score   DECIMAL(6,2) NULL,
+    created_at          DATETIME NULL,
+    updated_at          DATETIME NULL,
+    KEY idx_pmbo_emp_year (employee_code, mbo_year)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS competencymbo (
+    id                  INT AUTO_INCREMENT PRIMARY KEY,
+    employee_code       VARCHAR(50) NOT NULL,
+    mbo_year            INT NOT NULL,
+    goal_title          VARCHAR(500) NULL,
+    goal_content        TEXT NULL,
+    ti_trong            DECIMAL(6,2) NULL,
+    reviewer_ti_trong   DECIMAL(6,2) NULL,
+    approver_ti_trong   DECIMAL(6,2) NULL,
+    self_ey_rating      VARCHAR(20) NULL,
+    reviewed_ey_score   DECIMAL(6,2) NULL,
+    approved_ey_score   DECIMAL(6,2) NULL,
+    created_at          DATETIME NULL,
+    KEY idx_cmbo_emp_year (employee_code, mbo_year)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS attitudembo (
+    id             INT AUTO_INCREMENT PRIMARY KEY,
+    employee_code  VARCHAR(50) NOT NULL,
+    mbo_year       INT NOT NULL,
+    goal_title     VARCHAR(500) NULL,
+    score          DECIMAL(6,2) NULL,
+    KEY idx_ambo_emp_year (employee_code, mbo_year)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS mbo_allocations (
+    id                INT AUTO_INCREMENT PRIMARY KEY,
+    goal_id           INT NOT NULL,
+    sender_code       VARCHAR(50) NOT NULL,
+    receiver_code     VARCHAR(50) NOT NULL,
+    mbo_year          INT NOT NULL,
+    allocation_value  VARCHAR(100) NULL,
+    receiver_goal_id  INT NULL,
+    created_at        DATETIME NULL,
+    KEY idx_alloc_goal (goal_id),
+    KEY idx_alloc_receiver_goal (receiver_goal_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS eln (
+    id                       INT AUTO_INCREMENT PRIMARY KEY,
+    title                    VARCHAR(500) NOT NULL,
+    positions                TEXT NULL,
+    training_time            VARCHAR(100) NULL,
+    note                     TEXT NULL,
+    video_path               VARCHAR(500) NULL,
+    cover_path               VARCHAR(500) NULL,
+    created_at               DATETIME NULL,
+    updated_at               DATETIME NULL,
+    tong_nhan_vien_hoc       INT NOT NULL DEFAULT 0,
+    so_nhan_vien_hoan_thanh  INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS eln_employee_courses (
+    id                 INT AUTO_INCREMENT PRIMARY KEY,
+    employee_id        INT NOT NULL,
+    course_id          INT NOT NULL,
+    gan_nhat           DATE NULL,
+    ngay               DATE NULL,
+    ket_qua            VARCHAR(50) NULL,
+    hien_trang         VARCHAR(50) NULL,
+    thoi_gian_yeu_cau  DATE NULL,
+    status             VARCHAR(30) NULL,
+    training_type      VARCHAR(30) NULL,
+    status_watch       VARCHAR(30) NULL,
+    KEY idx_eec_emp (employee_id),
+    KEY idx_eec_course (course_id),
+    KEY idx_eec_deadline (thoi_gian_yeu_cau, employee_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS mbo_notifications (
+    id           INT AUTO_INCREMENT PRIMARY KEY,
+    employee_id  INT NOT NULL,
+    content      TEXT NOT NULL,
+    status       VARCHAR(10) NOT NULL DEFAULT 'unread',
+    created_at   DATETIME NOT NULL,
+    KEY idx_mnoti_emp (employee_id, status)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS eln_notifications LIKE mbo_notifications;
+CREATE TABLE IF NOT EXISTS personnel_notifications LIKE mbo_notifications;
@@ -0,0 +1,242 @@
+# benchmarks/seed.py
+# Tạo DB benchmark cục bộ + sinh dữ liệu tổ chức giả lập (cố định theo --seed để các lần chạy so sánh được).
+#
+#   python benchmarks/seed.py --docker --reset --units 300 --depth 6 --employees 5000
+#
+# Sinh: cây đơn vị (quản lý mỗi đơn vị có chức danh theo cấp), nhân viên, mbo_sessions (trạng thái trộn),
+# mục tiêu cá nhân / năng lực / thái độ có điểm, khoá học ELN + gán học, thông báo.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import bench_env  # noqa: E402
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "schema.sql")
+BATCH_SIZE = 1000
+
+UNIT_TYPES = ["corporation", "company", "factory", "division", "sub_division", "section", "group"]
+MANAGER_POSITIONS = [
+    "Tổng giám đốc", "Giám đốc", "Phó giám đốc", "Trưởng phòng", "Phó phòng", "Trưởng nhóm", "Phó nhóm",
+]
+STAFF_POSITIONS = ["Nhân viên", "Nhân viên kỹ thuật", "Nhân viên kinh doanh", "Staff"]
+SESSION_STATUSES = ["draft", "submitted", "reviewed", "approved", "reviewed_final", "approved_final"]
+RATINGS = ["A", "B", "C", "D"]
+
+
+def _batches(rows):
+    for i in range(0, len(rows), BATCH_SIZE):
+        yield rows[i:i + BATCH_SIZE]
+
+
+def _insert(cursor, sql, rows):
+    for chunk in _batches(rows):
+        cursor.executemany(sql, chunk)
+
+
+def create_schema(conn, schema, reset):
+    cur = conn.cursor()
+    if reset:
+        cur.execute(f"DROP DATABASE IF EXISTS `{schema}`")
+    cur.execute(f"CREATE DATABASE IF NOT EXISTS `{schema}` CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+    cur.execute(f"USE `{schema}`")
+    with open(SCHEMA_FILE, encoding="utf-8") as fh:
+        statements = [s.strip() for s in fh.read().split(";")]
+    for stmt in statements:
+        lines = [ln for ln in stmt.splitlines() if not ln.strip().startswith("--")]
+        if "".join(lines).strip():
+            cur.execute("\n".join(lines))
+    conn.commit()
+    cur.close()
+
+
+def build_units(rng, n_units, depth):
+    """[(id, name, type, parent_id, level)] — cây ngẫu nhiên, mỗi cấp rộng dần."""
+    units = [(1, "Tập đoàn", UNIT_TYPES[0], None, 0)]
+    by_level = {0: [1]}
+    for uid in range(2, n_units + 1):
+        # chọn cấp cha ưu tiên các cấp nông để cây không quá mảnh
+        max_parent_level = min(depth - 2, max(by_level))
+        parent_level = min(int(rng.triangular(0, max_parent_level + 1, max_parent_level * 0.6)), max_parent_level)
+        parent = rng.choice(by_level[parent_level])
+        level = parent_level + 1
+        utype = UNIT_TYPES[min(level, len(UNIT_TYPES) - 1)]
+        units.append((uid, f"{utype.title()} {uid}", utype, parent, level))
+        by_level.setdefault(level, []).append(uid)
+    return units
+
+
+def seed(conn, args):
+    rng = random.Random(args.seed)
+    cur = conn.cursor()
+    year = args.mbo_year
+    now = datetime.now()
+
+    units = build_units(rng, args.units, args.depth)
+    level_of = {u[0]: u[4] for u in units}
+
+    # ---- Nhân viên: mỗi đơn vị có 1 quản lý, còn lại rải ngẫu nhiên ----
+    employees = []  # (id, code, name, position, unit_id)
+    managers = {}
+    eid = 0
+    for uid, _, _, _, level in units:
+        eid += 1
+        managers[uid] = eid
+        employees.append((eid, f"E{eid:06d}", f"Quản lý {eid}", MANAGER_POSITIONS[min(level, len(MANAGER_POSITIONS) - 1)], uid))
+    unit_ids = [u[0] for u in units]
+    while eid < max(args.employees, len(units)):
+        eid += 1
+        employees.append((eid, f"E{eid:06d}", f"Nhân viên {eid}", rng.choice(STAFF_POSITIONS), rng.choice(unit_ids)))
+
+    _insert(cur, """
+        INSERT INTO organization_units (id, name, type, parent_id, code, employee_id)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, [(uid, name, utype, parent, f"U{uid:05d}", managers[uid]) for uid, name, utype, parent, _ in units])
+
+    _insert(cur, """
+        INSERT INTO employees2026_base
+            (id, employee_code, full_name, gender, entry_date, birth_date, position, vi_tri, organization_unit_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, [
+        (e_id, code, name, rng.choice(["Nam", "Nữ"]),
+         date(2015, 1, 1) + timedelta(days=rng.randint(0, 3000)),
+         date(1975, 1, 1) + timedelta(days=rng.randint(0, 9000)),
+         pos, pos, unit)
+        for e_id, code, name, pos, unit in employees
+    ])
+    cur.execute("""
+        UPDATE organization_units ou
+        JOIN (SELECT organization_unit_id, COUNT(*) AS cnt FROM employees2026_base GROUP BY organization_unit_id) x
+          ON x.organization_unit_id = ou.id
+        SET ou.employee_count = x.cnt
+    """)
+
+    # ---- MBO: session, mục tiêu, năng lực, thái độ ----
+    sessions, goals, comps, atts = [], [], [], []
+    for e_id, code, _, _, unit in employees:
+        status = rng.choice(SESSION_STATUSES)
+        sessions.append((e_id, year, status, managers.get(unit), managers.get(1), rng.choice(["none", "done"])))
+        weight = round(100 / args.goals_per_employee, 2)
+        for g in range(args.goals_per_employee):
+            goals.append((
+                code, year, f"Mục tiêu {g + 1} của {code}", "Mô tả", "%", weight, "0", str(rng.randint(50, 100)),
+                f"{year}-12-31", rng.choice(RATINGS), rng.choice(["canhan", "phongban", "congty"]),
+                weight, weight, rng.randint(50, 100), rng.randint(50, 100), now,
+            ))
+        for c in range(args.competencies_per_employee):
+            comps.append((code, year, f"Năng lực {c + 1}", "Nội dung", 20, 20, 20,
+                          rng.randint(50, 100), rng.randint(50, 100), now))
+        for a in range(4):
+            atts.append((code, year, f"Thái độ {a + 1}", rng.randint(60, 100)))
+
+    _insert(cur, """
+        INSERT INTO mbo_sessions (employee_id, mbo_year, status, reviewer_id, approver_id, attitude_status)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, sessions)
+    _insert(cur, """
+        INSERT INTO personalmbo
+            (employee_code, mbo_year, ten_muc_tieu, mo_ta, don_vi_do_luong, ti_trong, gia_tri_ban_dau, muc_tieu,
+             han_hoan_thanh, xep_loai, cap_do_theo_doi, reviewer_ti_trong, approver_ti_trong,
+             reviewed_ey_score, approved_ey_score, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, goals)
+    _insert(cur, """
+        INSERT INTO competencymbo
+            (employee_code, mbo_year, goal_title, goal_content, ti_trong, reviewer_ti_trong, approver_ti_trong,
+             reviewed_ey_score, approved_ey_score, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, comps)
+    _insert(cur, """
+        INSERT INTO attitudembo (employee_code, mbo_year, goal_title, score)
+        VALUES (%s, %s, %s, %s)
+    """, atts)
+
+    # ---- ELN: khoá học theo vị trí + gán học ----
+    all_positions = MANAGER_POSITIONS + STAFF_POSITIONS
+    courses = []
+    for cid in range(1, args.courses + 1):
+        positions = rng.sample(all_positions, rng.randint(1, 4))
+        courses.append((cid, f"Khoá học {cid}", json.dumps(positions, ensure_ascii=False), "2h", now, now))
+    _insert(cur, """
+        INSERT INTO eln (id, title, positions, training_time, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, courses)
+
+    enrolments = []
+    for e_id, *_ in employees:
+        for cid in rng.sample(range(1, args.courses + 1), min(args.courses, args.courses_per_employee)):
+            enrolments.append((
+                e_id, cid, date(year, 1, 1), date(year, 1, 1), rng.choice(["pass", "fail", None]), "active",
+                date(year, 12, 31), rng.choice(["pending", "done"]), "online", rng.choice(["watching", "done", None]),
+            ))
+    _insert(cur, """
+        INSERT INTO eln_employee_courses
+            (employee_id, course_id, gan_nhat, ngay, ket_qua, hien_trang, thoi_gian_yeu_cau, status, training_type, status_watch)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """, enrolments)
+
+    # ---- Thông báo ----
+    for table in ("mbo_notifications", "eln_notifications", "personnel_notifications"):
+        rows = []
+        for e_id, *_ in employees:
+            for _ in range(args.notifications_per_employee):
+                rows.append((e_id, f"Thông báo {table}", rng.choice(["read", "unread"]),
+                             now - timedelta(days=rng.randint(0, 120))))
+        _insert(cur, f"INSERT INTO {table} (employee_id, content, status, created_at) VALUES (%s, %s, %s, %s)", rows)
+
+    conn.commit()
+    cur.close()
+    return {
+        "units": len(units),
+        "depth": max(level_of.values()) + 1,
+        "employees": len(employees),
+        "goals": len(goals),
+        "competencies": len(comps),
+        "attitude": len(atts),
+        "courses": len(courses),
+        "enrolments": len(enrolments),
+        "notifications_per_table": len(employees) * args.notifications_per_employee,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tạo + seed DB benchmark cục bộ")
+    bench_env.add_db_arguments(parser)
+    parser.add_argument("--reset", action="store_true", help="Xoá schema cũ trước khi seed")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mbo-year", type=int, default=date.today().year)
+    parser.add_argument("--units", type=int, default=300)
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--employees", type=int, default=5000)
+    parser.add_argument("--goals-per-employee", type=int, default=5)
+    parser.add_argument("--competencies-per-employee", type=int, default=5)
+    parser.add_argument("--courses", type=int, default=60)
+    parser.add_argument("--courses-per-employee", type=int, default=5)
+    parser.add_argument("--notifications-per-employee", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    db = bench_env.configure(args)
+    started = time.perf_counter()
+    conn = bench_env.connect()
+    try:
+        create_schema(conn, db["schema"], args.reset)
+        summary = seed(conn, args)
+    finally:
+        conn.close()
+
+    # Bảng closure được app tự build khi rỗng; build luôn ở đây để lần đo đầu không tính thời gian này
+    from org_closure import ensure_closure_table
+    ensure_closure_table()
+
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+# bootstrap.py
+# Các bước khởi tạo chạy MỘT lần trước khi phục vụ request (không còn chạy lúc import module):
+#   - DDL: bảng timeline / mbo_years, bảng closure cây tổ chức, bảng data_versions, bảng scheduled_jobs,
+#     bảng eln_reminder_log + index hạn học
+#   - nạp schema registry (sau DDL để thấy các bảng vừa tạo)
+#   - thư mục media ELN trên file server (lỗi chỉ ghi log, upload sẽ tự tạo lại khi cần)
+#
+# Gọi từ: gunicorn.conf.py (on_starting, ở master trước khi fork worker), serve.py (waitress),
+# main.py (dev server), hoặc tay trước khi deploy:  python bootstrap.py
+import logging
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_done = False
+
+
+def is_bootstrapped():
+    return _done
+
+
+def bootstrap(force=False):
+    """Chạy các bước khởi tạo; gọi lại nhiều lần trong cùng tiến trình chỉ chạy 1 lần."""
+    global _done
+    with _lock:
+        if _done and not force:
+            return False
+
+        from MBO.timelineMBO import ensure_table
+        from org_closure import ensure_closure_table
+        from data_versions import ensure_data_versions_table
+        from scheduler import ensure_jobs_table, sync_jobs
+        from schema_registry import refresh as refresh_schema_registry
+        from ELearning.eln import ensure_media_dirs
+        from ELearning.eln_reminders import ensure_reminder_tables
+
+        ensure_table()
+        ensure_closure_table()
+        ensure_data_versions_table()
+        ensure_jobs_table()
+        ensure_reminder_tables()
+        sync_jobs()
+        refresh_schema_registry()  # nạp sau DDL để thấy các bảng vừa tạo
+
+        try:
+            ensure_media_dirs()
+        except OSError as e:
+            logger.warning("Không tạo được thư mục media ELN: %s", e)
+
+        _done = True
+        logger.info("Bootstrap xong")
+        return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    bootstrap()
+    sys.exit(0)
@@ -0,0 +1,102 @@
+# compression.py
+# Nén response JSON/text lớn theo Accept-Encoding của client (br nếu có cài brotli, không thì gzip).
+#
+# Cấu hình (biến môi trường):
+#   COMPRESS_ENABLED      1/0, mặc định 1
+#   COMPRESS_MIN_SIZE     byte, response nhỏ hơn thì không nén (mặc định 1024)
+#   COMPRESS_LEVEL        mức gzip 1-9 (mặc định 6)
+#   COMPRESS_BR_QUALITY   mức brotli 0-11 (mặc định 4 — đủ nhanh cho response động)
+#   COMPRESS_ALGORITHMS   thứ tự ưu tiên, mặc định "br,gzip"
+#
+# Đăng ký: init_compression(app) trong main.py.
+import gzip
+import logging
+import os
+
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_ENABLED = os.getenv("COMPRESS_ENABLED", "1") != "0"
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+COMPRESS_BR_QUALITY = int(os.getenv("COMPRESS_BR_QUALITY", "4"))
+COMPRESS_ALGORITHMS = [
+    a.strip() for a in os.getenv("COMPRESS_ALGORITHMS", "br,gzip").split(",") if a.strip()
+]
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/")
+_brotli = None  # module brotli, nạp ở lần nén đầu; False = chưa cài
+
+
+def _load_brotli():
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli  # tuỳ chọn
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli
+
+
+def _compress(data, algorithm):
+    if algorithm == "br":
+        return _load_brotli().compress(data, quality=COMPRESS_BR_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESS_LEVEL)
+
+
+def choose_encoding():
+    """Thuật toán đầu tiên (theo COMPRESS_ALGORITHMS) mà client chấp nhận và server hỗ trợ."""
+    accepted = request.accept_encodings
+    for algorithm in COMPRESS_ALGORITHMS:
+        if algorithm == "br" and not _load_brotli():
+            continue
+        if algorithm in ("br", "gzip") and accepted[algorithm]:
+            return algorithm
+    return None
+
+
+def _should_compress(response):
+    if response.status_code != 200 or response.direct_passthrough or response.is_streamed:
+        return False
+    if "Content-Encoding" in response.headers:
+        return False
+    mimetype = response.mimetype or ""
+    return mimetype.startswith(_COMPRESSIBLE_TYPES)
+
+
+def _compress_response(response):
+    # Vary luôn gắn cho response có thể nén, kể cả lần này không nén, để proxy không trả nhầm bản
+    if not _should_compress(response):
+        return response
+    response.vary.add("Accept-Encoding")
+
+    algorithm = choose_encoding()
+    if algorithm is None:
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    try:
+        compressed = _compress(data, algorithm)
+    except Exception:
+        logger.exception("Nén response %s thất bại", algorithm)
+        return response
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)  # tự cập nhật Content-Length
+    response.headers["Content-Encoding"] = algorithm
+    # Body đã khác byte so với bản gốc => ETag mạnh chuyển thành yếu (cùng nội dung, khác mã hoá)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    if COMPRESS_ENABLED:
+        app.after_request(_compress_response)
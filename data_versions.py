@@ -0,0 +1,225 @@
+# data_versions.py
+# Bộ đếm phiên bản dữ liệu theo nhóm (organization_units, employees, mbo, roles, projects, eln) lưu ở bảng
+# data_versions => mọi worker cùng thấy. Dùng để:
+#   - tạo ETag yếu cho các API đọc lớn: dữ liệu không đổi => trả 304 mà KHÔNG chạy query (@conditional_get)
+#   - báo cho cache trong bộ nhớ (vd. snapshot cây tổ chức) biết worker khác vừa ghi
+#
+# Tăng version:
+#   - tự động sau mỗi request ghi thành công (POST/PUT/PATCH/DELETE < 400) theo blueprint (BLUEPRINT_GROUPS);
+#     route POST chỉ đọc (tra cứu nhận body JSON) đánh dấu @read_only để không bump
+#   - chủ động bump_data_version(...) ở code ghi ngoài request (CLI, job nền)
+#   - nhóm đã bump trong request (bump_data_version / @invalidates) không bump lại ở after_request
+#
+# query_cache.py cũng lấy key theo các nhóm này (TABLE_GROUPS) => 1 nguồn version duy nhất cho mỗi dữ liệu.
+import hashlib
+import logging
+import os
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from mysql.connector import Error
+
+from database import get_connection
+from db_routing import served_from_replica
+from http_cache import is_not_modified, not_modified_response
+
+logger = logging.getLogger(__name__)
+
+DATA_VERSIONS_TABLE = "data_versions"
+# Thời gian dùng lại bảng version đã đọc (giây) — độ trễ tối đa để worker khác thấy thay đổi
+DATA_VERSION_TTL = float(os.getenv("DATA_VERSION_TTL", "2"))
+
+ORG_UNITS = "organization_units"
+EMPLOYEES = "employees"
+MBO = "mbo"
+ROLES = "roles"
+PROJECTS = "projects"
+ELN = "eln"
+ROLE_COMPETENCY = "role_competency_content"
+TIMELINE = "mbo_timeline"
+ALLOCATIONS = "mbo_allocations"
+
+# blueprint -> nhóm dữ liệu bị ảnh hưởng khi có request ghi thành công
+BLUEPRINT_GROUPS = {
+    "employees": (EMPLOYEES, MBO),
+    "employee_import": (EMPLOYEES,),
+    "department": (EMPLOYEES,),          # đổi tên bộ phận cập nhật employees2026; cây tự bump_org_version
+    "employees_bp": (MBO,),
+    "competency_bp": (MBO,),
+    "allocations": (MBO,),
+    "submit": (MBO,),
+    "status_bp": (MBO,),
+    "attitude": (MBO,),
+    "scoring": (MBO,),
+    "mbo_timeline_bpp": (TIMELINE,),
+    "roles": (ROLES,),
+    "permission": (ROLES,),
+    "project": (PROJECTS,),
+    "eln": (ELN,),
+    "eln_courses": (ELN,),
+    "eln_employee_bp": (ELN,),
+    "eln_request": (ELN,),
+    "eln_quiz": (ELN,),
+}
+
+# bảng (tag của query_cache) -> nhóm: cache kết quả và ETag của cùng dữ liệu dùng chung 1 bộ đếm,
+# bump nhóm (sau request ghi / bump_data_version / invalidate_tags) là cả 2 lớp cùng hết hiệu lực
+TABLE_GROUPS = {
+    "employees2026_base": EMPLOYEES,
+    "roles": ROLES,
+    "employee_roles": ROLES,
+    "dataprojects": PROJECTS,
+    "eln": ELN,
+    "role_competency_content": ROLE_COMPETENCY,
+}
+
+_WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+_lock = threading.Lock()
+_versions = {}
+_loaded_at = 0.0
+
+
+def ensure_data_versions_table():
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DATA_VERSIONS_TABLE} (
+                name       VARCHAR(64) NOT NULL PRIMARY KEY,
+                version    BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _refresh():
+    global _versions, _loaded_at
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT name, version FROM {DATA_VERSIONS_TABLE}")
+        _versions = {name: int(version) for name, version in cursor.fetchall()}
+        _loaded_at = time.monotonic()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_data_versions(*names):
+    """{name: version}; đọc lại bảng khi quá DATA_VERSION_TTL."""
+    if time.monotonic() - _loaded_at >= DATA_VERSION_TTL:
+        with _lock:
+            if time.monotonic() - _loaded_at >= DATA_VERSION_TTL:
+                _refresh()
+    versions = _versions
+    return {name: versions.get(name, 0) for name in names}
+
+
+def get_data_version(name):
+    return get_data_versions(name)[name]
+
+
+def groups_for_tables(*tables):
+    """Nhóm version của các bảng; bảng chưa thuộc nhóm nào dùng bộ đếm riêng "table:<bảng>"."""
+    return sorted({TABLE_GROUPS.get(t, "table:" + t) for t in tables})
+
+
+def bump_data_version(*names):
+    """
+    Tăng version của các nhóm (gọi SAU khi commit). Lỗi DB chỉ ghi log và tăng bản local,
+    để thao tác ghi đã thành công không bị trả lỗi vì bộ đếm.
+    """
+    global _versions
+    names = sorted(set(names))
+    if not names:
+        return {}
+    result = {}
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            for name in names:
+                cursor.execute(f"""
+                    INSERT INTO {DATA_VERSIONS_TABLE} (name, version) VALUES (%s, LAST_INSERT_ID(1))
+                    ON DUPLICATE KEY UPDATE version = LAST_INSERT_ID(version + 1)
+                """, (name,))
+                cursor.execute("SELECT LAST_INSERT_ID()")
+                result[name] = int(cursor.fetchone()[0])
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+    except Error as e:
+        logger.warning("Không ghi được data_versions %s: %s", names, e)
+        result = {name: _versions.get(name, 0) + 1 for name in names}
+
+    with _lock:
+        # thay cả dict (không sửa tại chỗ) để luồng đang đọc không thấy trạng thái dở dang;
+        # version local có thể cao hơn DB nếu ghi lỗi, lần đọc lại sau TTL sẽ lấy theo DB
+        _versions = {**_versions, **result}
+    if has_request_context():
+        g._bumped_groups = g.get("_bumped_groups", set()) | set(names)
+    return result
+
+
+# ======================
+# ETag yếu theo version
+# ======================
+def version_etag(names, extra=""):
+    versions = get_data_versions(*names)
+    raw = "|".join(f"{n}={versions[n]}" for n in sorted(versions)) + "|" + extra
+    return "dv-" + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def conditional_get(*names):
+    """
+    Decorator cho GET đọc lớn: ETag yếu = version các nhóm + URL (kể cả query string).
+    If-None-Match khớp => 304 ngay, không chạy view.
+    Body đọc từ replica (có thể trễ hơn version) thì không gắn ETag — lần sau client tải lại đầy đủ.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = version_etag(names, request.full_path)
+            if is_not_modified(etag, weak=True):
+                return not_modified_response(etag, weak=True)
+
+            resp = current_app.make_response(view(*args, **kwargs))
+            if resp.status_code == 200 and not resp.headers.get("ETag") and not served_from_replica():
+                resp.set_etag(etag, weak=True)
+                resp.headers["Cache-Control"] = "no-cache"
+            return resp
+        return wrapper
+    return decorator
+
+
+def read_only(view):
+    """Route POST chỉ đọc (hoặc không ghi dữ liệu của nhóm blueprint): after_request không bump version."""
+    view._data_versions_read_only = True
+    return view
+
+
+def _bump_after_write(response):
+    if request.method not in _WRITE_METHODS or response.status_code >= 400:
+        return response
+    groups = BLUEPRINT_GROUPS.get(request.blueprint or "")
+    if not groups:
+        return response
+    view = current_app.view_functions.get(request.endpoint)
+    if getattr(view, "_data_versions_read_only", False):
+        return response
+    pending = set(groups) - g.get("_bumped_groups", set())
+    if pending:
+        bump_data_version(*pending)
+    return response
+
+
+def init_data_versions(app):
+    app.after_request(_bump_after_write)
@@ -1,15 +1,112 @@
 import mysql.connector
 import os
+import threading
+
+from db_routing import READ, WRITE, choose_replicas, lag_ok, mark_failed, mark_ok, mark_replica_read
+from json_provider import RowConverter
+from request_metrics import instrument_connection
 
 # Đặt tên schema ở đây (sau này chỉ cần đổi 1 chỗ)
 DB_SCHEMA = os.getenv("DB_SCHEMA", "nsh")
 
-def get_connection():
-    return mysql.connector.connect(
-        host=os.getenv("DB_HOST", "10.73.131.2"),
+# Pool connection theo worker: chỉ bật sau init_pool() (gunicorn post_fork / serve.py).
+# 0 => mỗi get_connection() mở connection mới như trước (dev server, CLI, master process).
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "0"))
+
+_pool_lock = threading.Lock()
+_pool_size = 0
+_pool_pid = None
+_pools = {}  # (host, port) -> MySQLConnectionPool
+
+
+def _connect_args(host=None, port=None):
+    return dict(
+        host=host or os.getenv("DB_HOST", "10.73.131.2"),
+        port=port or int(os.getenv("DB_PORT", "3306")),
         user=os.getenv("DB_USER", "root"),
         password=os.getenv("DB_PASS", "root_password_cua_ban"),
         database=DB_SCHEMA,    # database mặc định khi connect
         auth_plugin='mysql_native_password',
         use_pure = True,
+        converter_class=RowConverter,  # cột binary/BLOB -> str ngay khi đọc
     )
+
+def init_pool(size=None):
+    """
+    Bật pool cho tiến trình hiện tại (gọi trong từng worker SAU khi fork, không gọi ở master).
+    Pool tạo lười theo từng host (primary / replica) ở lần dùng đầu.
+    """
+    global _pool_size, _pool_pid
+    from mysql.connector.pooling import CNX_POOL_MAXSIZE  # module pooling chỉ nạp khi bật pool
+    with _pool_lock:
+        _pools.clear()  # pool kế thừa từ tiến trình cha (nếu có) không được dùng chung socket
+        _pool_size = max(0, min(size if size is not None else DB_POOL_SIZE, CNX_POOL_MAXSIZE))
+        _pool_pid = os.getpid()
+
+def close_pool():
+    """Đóng các connection đang rảnh trong pool (graceful shutdown)."""
+    global _pool_size
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+        _pool_size = 0
+    for pool in pools:
+        try:
+            pool._remove_connections()
+        except Exception:
+            pass
+
+def _get_pool(host, port):
+    if not _pool_size or _pool_pid != os.getpid():
+        return None
+    key = (host, port)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(key)
+            if pool is None and _pool_size:
+                from mysql.connector.pooling import MySQLConnectionPool
+                pool = MySQLConnectionPool(
+                    pool_name=f"mbo_{os.getpid()}_{len(_pools)}",
+                    pool_size=_pool_size,
+                    pool_reset_session=True,
+                    **_connect_args(host, port),
+                )
+                _pools[key] = pool
+    return pool
+
+def _connect(host=None, port=None):
+    args = _connect_args(host, port)
+    pool = _get_pool(args["host"], args["port"])
+    if pool is not None:
+        try:
+            return pool.get_connection()  # close() trả connection về pool
+        except mysql.connector.errors.PoolError:
+            pass  # pool đang hết connection rảnh => mở connection riêng, không chờ
+    return mysql.connector.connect(**args)
+
+def _connect_for(intent):
+    # Đọc: thử lần lượt các replica còn khoẻ, lỗi hết thì về primary (xem db_routing.py)
+    for replica in choose_replicas(intent):
+        try:
+            conn = _connect(replica.host, replica.port)
+        except mysql.connector.Error as e:
+            mark_failed(replica, e)
+            continue
+        try:
+            if lag_ok(replica, conn):
+                mark_ok(replica)
+                mark_replica_read()
+                return conn
+        except mysql.connector.Error as e:
+            mark_failed(replica, e)
+        conn.close()
+    return _connect()
+
+def get_connection(intent=WRITE):
+    """
+    intent=READ: endpoint chỉ đọc (báo cáo, danh sách lớn) — được phép đọc từ replica.
+    Mặc định WRITE => primary.
+    Trong request: connection được bọc để đếm câu SQL / thời gian DB (xem request_metrics.py)
+    """
+    return instrument_connection(lambda: _connect_for(intent))
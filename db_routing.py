@@ -0,0 +1,185 @@
+# db_routing.py
+# Chọn host MySQL theo mục đích kết nối: ghi -> primary, đọc -> replica (nếu có cấu hình).
+#
+#   DB_REPLICA_HOSTS          "host1:3306,host2" — trống => mọi kết nối về primary (như cũ)
+#   DB_REPLICA_RETRY_SECONDS  replica kết nối lỗi / trễ quá mức bị loại trong N giây (mặc định 30)
+#   DB_REPLICA_MAX_LAG        giây trễ replication tối đa (0 = không kiểm tra), mặc định 0
+#   DB_REPLICA_CHECK_INTERVAL chu kỳ kiểm tra độ trễ mỗi replica (giây), mặc định 15
+#   DB_STICKY_SECONDS         read-your-writes: sau khi client ghi, đọc từ primary trong N giây (mặc định 5)
+#
+# Read-your-writes:
+#   - trong cùng request: đã mở connection ghi => các connection đọc sau đó cũng về primary
+#   - giữa các request: request ghi thành công trả header X-Read-Primary-Until (epoch giây); client gửi lại
+#     header đó ở các request sau => đọc từ primary tới hết hạn. FE gọi API khác origin và CORS không bật
+#     credentials (cookie không được lưu / gửi), nên dùng header: main.py expose header này qua CORS,
+#     FE lưu giá trị lớn nhất nhận được và gắn vào mọi request (như Authorization).
+#     Cookie mbo_read_primary_until vẫn được đặt cho client cùng origin (công cụ nội bộ, benchmark).
+#   - giá trị client gửi bị chặn ở now + DB_STICKY_SECONDS: không thể ép đọc primary lâu hơn 1 lần ghi
+#
+# ETag theo version (@conditional_get): version đọc từ primary, replica có thể trễ => response có dùng
+# connection replica thì KHÔNG gắn ETag version (served_from_replica()), tránh client nhận 304 trên dữ liệu cũ.
+#
+# Đăng ký: init_db_routing(app) trong main.py; database.get_connection(intent) dùng choose_replicas().
+import itertools
+import logging
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+
+logger = logging.getLogger(__name__)
+
+READ = "read"
+WRITE = "write"
+
+DB_REPLICA_HOSTS = os.getenv("DB_REPLICA_HOSTS", "")
+DB_REPLICA_RETRY_SECONDS = float(os.getenv("DB_REPLICA_RETRY_SECONDS", "30"))
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "0"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "15"))
+DB_STICKY_SECONDS = int(os.getenv("DB_STICKY_SECONDS", "5"))
+
+STICKY_COOKIE = "mbo_read_primary_until"
+STICKY_HEADER = "X-Read-Primary-Until"
+_WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+def _parse_hosts(text, default_port):
+    hosts = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        host, _, port = part.partition(":")
+        hosts.append((host, int(port or default_port)))
+    return hosts
+
+
+class Replica:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.down_until = 0.0
+        self.checked_at = 0.0
+        self.failures = 0
+
+    @property
+    def label(self):
+        return f"{self.host}:{self.port}"
+
+    def available(self, now):
+        return now >= self.down_until
+
+
+_lock = threading.Lock()
+_replicas = [Replica(h, p) for h, p in _parse_hosts(DB_REPLICA_HOSTS, os.getenv("DB_PORT", "3306"))]
+_round_robin = itertools.count()
+
+
+def replicas():
+    return list(_replicas)
+
+
+# ======================
+# Read-your-writes
+# ======================
+def _sticky_to_primary():
+    if not has_request_context():
+        return False
+    if g.get("_db_wrote"):
+        return True
+    now = time.time()
+    for value in (request.headers.get(STICKY_HEADER), request.cookies.get(STICKY_COOKIE)):
+        try:
+            until = float(value or 0)
+        except ValueError:
+            continue
+        if now < until <= now + DB_STICKY_SECONDS:
+            return True
+    return False
+
+
+def mark_replica_read():
+    """database._connect_for gọi khi trả connection replica trong request."""
+    if has_request_context():
+        g._db_replica_read = True
+
+
+def served_from_replica():
+    return has_request_context() and bool(g.get("_db_replica_read"))
+
+
+def choose_replicas(intent):
+    """
+    Danh sách replica để thử theo thứ tự (round-robin, bỏ replica đang bị loại).
+    Rỗng => dùng primary.
+    """
+    if intent != READ or not _replicas:
+        # connection mặc định (WRITE) trong request GET không đánh dấu — chỉ request ghi mới ép đọc primary
+        if intent == WRITE and has_request_context() and request.method in _WRITE_METHODS:
+            g._db_wrote = True
+        return []
+    if _sticky_to_primary():
+        return []
+    now = time.monotonic()
+    healthy = [r for r in _replicas if r.available(now)]
+    if not healthy:
+        return []
+    start = next(_round_robin) % len(healthy)
+    return healthy[start:] + healthy[:start]
+
+
+# ======================
+# Sức khoẻ replica
+# ======================
+def mark_failed(replica, reason):
+    with _lock:
+        replica.failures += 1
+        replica.down_until = time.monotonic() + DB_REPLICA_RETRY_SECONDS
+    logger.warning("Replica %s bị loại %ss: %s", replica.label, DB_REPLICA_RETRY_SECONDS, reason)
+
+
+def mark_ok(replica):
+    if replica.failures:
+        with _lock:
+            replica.failures = 0
+
+
+def lag_ok(replica, conn):
+    """
+    Kiểm tra độ trễ replication (tối đa 1 lần / DB_REPLICA_CHECK_INTERVAL mỗi replica).
+    Không đọc được trạng thái / replication dừng => coi như không đạt.
+    """
+    if DB_REPLICA_MAX_LAG <= 0:
+        return True
+    now = time.monotonic()
+    if now - replica.checked_at < DB_REPLICA_CHECK_INTERVAL:
+        return True
+    replica.checked_at = now
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SHOW SLAVE STATUS")
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    lag = row.get("Seconds_Behind_Master") if row else None
+    if lag is None or lag > DB_REPLICA_MAX_LAG:
+        mark_failed(replica, f"trễ replication {lag}s")
+        return False
+    return True
+
+
+def _set_sticky_cookie(response):
+    if request.method in _WRITE_METHODS and response.status_code < 400 and g.get("_db_wrote") and _replicas:
+        until = str(int(time.time()) + DB_STICKY_SECONDS)
+        response.headers[STICKY_HEADER] = until
+        response.set_cookie(
+            STICKY_COOKIE, until,
+            max_age=DB_STICKY_SECONDS, httponly=True, samesite="Lax",
+        )
+    return response
+
+
+def init_db_routing(app):
+    app.after_request(_set_sticky_cookie)
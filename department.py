@@ -1,63 +1,44 @@
+import logging
+
 from flask import Blueprint, jsonify, request
 from database import get_connection
+from http_cache import is_not_modified, not_modified_response, json_response
+from org_tree import get_org_snapshot, bump_org_version
+from org_closure import ClosureCycleError, closure_insert, closure_move, closure_delete, rebuild_closure
+from query_cache import invalidates
 
 department_bp = Blueprint('department', __name__, url_prefix='/department')
+logger = logging.getLogger(__name__)
 
 # ====================================
 # GET /tree - Trả về cây tổ chức
 # ====================================
 @department_bp.route('/tree', methods=['GET'])
 def get_department_tree():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    """
+    Cây tổ chức lấy từ cache (org_tree), hỗ trợ ETag/304.
+    Query (optional):
+      - root:  id bộ phận gốc của cây con cần lấy
+      - depth: số cấp con tối đa dưới gốc (0 = chỉ node gốc)
+    """
+    root_id = request.args.get('root', type=int)
+    depth = request.args.get('depth', type=int)
+
+    snap = get_org_snapshot()
+
+    if root_id is None and depth is None:
+        if is_not_modified(snap.etag):
+            return not_modified_response(snap.etag)
+        return json_response(snap.tree_json, etag=snap.etag)
 
-    cursor.execute("""
-        SELECT id, name, type, parent_id, code, employee_count, created_at, updated_at, employee_id
-        FROM organization_units
-    """)
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-
-    # Build cây từ parent_id
-    node_map = {row["id"]: {**row, "_children": []} for row in rows}
-    roots = []
-
-    for node in node_map.values():
-        parent_id = node["parent_id"]
-        if parent_id and parent_id in node_map:
-            node_map[parent_id]["_children"].append(node)
-        else:
-            roots.append(node)
-
-    def build_tree(nodes, prefix=""):
-        result = []
-        import re
-
-        def extract_code_number(code):
-            if not code:
-                return float('inf')  # Đẩy những mã trống xuống cuối
-            match = re.search(r'(\d+)$', code)
-            return int(match.group(1)) if match else float('inf')
-
-        for idx, node in enumerate(sorted(nodes, key=lambda x: extract_code_number(x["code"]))):
-            children = build_tree(node["_children"], f"{prefix}{idx}-")
-            result.append({
-                "key": f"{prefix}{idx}",
-                "data": {
-                    "id": node["id"],
-                    "name": node["name"],
-                    "type": node["type"],
-                    "code": node["code"],
-                    "parent_id": node["parent_id"],
-                    "employee_count": node["employee_count"] or 0,
-                    "employee_id": node["employee_id"],  # ✅ Thêm dòng này
-                },
-                "children": children if children else None
-            })
-        return result
-
-    return jsonify(build_tree(roots))
+    etag = f"{snap.etag}-r{root_id}-d{depth}"
+    if is_not_modified(etag):
+        return not_modified_response(etag)
+
+    nodes = snap.subtree(root_id, depth)
+    if nodes is None:
+        return jsonify({"error": "Không tìm thấy bộ phận"}), 404
+    return json_response(nodes, etag=etag)
 
 
 
@@ -84,8 +65,11 @@ def add_department():
             INSERT INTO organization_units (name, type, parent_id, code, employee_id)
             VALUES (%s, %s, %s, %s, %s)
         """, (name.strip(), type.strip(), parent_id, code, employee_id))
+        new_id = cursor.lastrowid
+        closure_insert(cursor, new_id, parent_id)
         conn.commit()
-        return jsonify({"message": "Đã thêm bộ phận", "id": cursor.lastrowid}), 201
+        bump_org_version()
+        return jsonify({"message": "Đã thêm bộ phận", "id": new_id}), 201
     except Exception as e:
         conn.rollback()
         return jsonify({"error": str(e)}), 500
@@ -93,6 +77,7 @@ def add_department():
         cursor.close()
         conn.close()
 @department_bp.route('/update', methods=['PATCH'])
+@invalidates("employees2026_base")  # đổi tên bộ phận cập nhật cột tên trong employees2026
 def update_department():
     data = request.json
     unit_id = data.get("id")
@@ -118,8 +103,6 @@ def update_department():
         old_name = current["name"]
         old_type = current["type"]
 
-        print("Dữ liệu gửi lên:", data)
-
         # Lọc và build câu lệnh UPDATE
         for field in allowed_fields:
             if field in data and data[field] not in [None, ""]:
@@ -132,15 +115,21 @@ def update_department():
 
         values.append(unit_id)
 
+        # Đổi cha => cập nhật bảng closure trước (chặn vòng lặp)
+        new_parent_id = data.get("parent_id")
+        if new_parent_id not in [None, ""] and int(new_parent_id) != current["parent_id"]:
+            closure_cursor = conn.cursor(buffered=True)
+            try:
+                closure_move(closure_cursor, unit_id, int(new_parent_id))
+            finally:
+                closure_cursor.close()
+
         update_sql = f"""
             UPDATE organization_units
             SET {', '.join(updates)}
             WHERE id = %s
         """
 
-        print("Câu lệnh UPDATE:", update_sql)
-        print("Giá trị:", values)
-
         cursor2 = conn.cursor()
         cursor2.execute(update_sql, values)
 
@@ -172,12 +161,15 @@ def update_department():
                 update_emps.close()
 
         conn.commit()
+        bump_org_version()
         return jsonify({"message": "Cập nhật thành công"})
 
+    except ClosureCycleError as e:
+        conn.rollback()
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         conn.rollback()
-        import traceback
-        print("Lỗi cập nhật:", traceback.format_exc())
+        logger.exception("Lỗi cập nhật bộ phận id=%s", unit_id)
         return jsonify({"error": str(e)}), 500
 
     finally:
@@ -199,8 +191,10 @@ def delete_department():
     cursor = conn.cursor()
 
     try:
+        closure_delete(cursor, unit_id)
         cursor.execute("DELETE FROM organization_units WHERE id = %s", (unit_id,))
         conn.commit()
+        bump_org_version()
         return jsonify({"message": "Đã xoá bộ phận"})
     except Exception as e:
         conn.rollback()
@@ -208,3 +202,15 @@ def delete_department():
     finally:
         cursor.close()
         conn.close()
+
+
+# ====================================
+# POST /closure/rebuild - Build lại bảng closure
+# ====================================
+@department_bp.route('/closure/rebuild', methods=['POST'])
+def rebuild_department_closure():
+    try:
+        result = rebuild_closure()
+        return jsonify({"message": "Đã build lại bảng closure", **result})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,430 @@
+# employee_import.py
+# Import nhân viên hàng loạt từ Excel/CSV:
+#   đọc file theo lô -> validate bằng pandas (vectorized) -> diff với employees2026_base theo employee_code
+#   -> insert/update/deactivate theo lô trong 1 transaction -> tính lại employee_count 1 lần.
+#
+# API: POST /employees/import   (multipart: file, dry_run=1, deactivate_missing=1)
+# CLI: python employee_import.py <file.xlsx|file.csv> [--dry-run] [--deactivate-missing] [--chunk-size N]
+import argparse
+import json
+import os
+import sys
+
+from flask import Blueprint, request, jsonify
+from database import get_connection
+from employees import EMPLOYEE_TABLE, rebuild_employee_counts
+from org_tree import get_org_snapshot
+from data_versions import bump_data_version
+from query_cache import invalidate_tags
+
+employee_import_bp = Blueprint("employee_import", __name__, url_prefix="/employees/import")
+
+CHUNK_SIZE = int(os.getenv("EMPLOYEE_IMPORT_CHUNK", "500"))
+MAX_REPORTED_ERRORS = 200
+
+# Cột được phép import (trùng với các cột của /employees/add)
+IMPORT_COLUMNS = [
+    "employee_code", "full_name", "gender", "entry_date", "birth_date", "phone",
+    "position", "cap_bac",
+    "corporation", "company", "factory", "division", "sub_division", "section", "group_name",
+    "note", "organization_unit_id", "employment_status", "status_note",
+]
+REQUIRED_COLUMNS = ["employee_code", "full_name"]
+DATE_COLUMNS = ["entry_date", "birth_date"]
+VALID_STATUSES = ("active", "terminated")
+
+
+def _truthy(v):
+    return str(v or "").strip().lower() in ("1", "true", "yes", "on")
+
+
+# ======================
+# Đọc file theo lô
+# ======================
+def _iter_frames(stream, filename, chunksize):
+    """
+    Sinh ra các DataFrame (mỗi cái <= chunksize dòng) để không phải nạp cả file:
+    - .csv:        pandas.read_csv(chunksize=...)
+    - .xlsx/.xlsm: openpyxl read_only, gom dòng thành lô
+    - .xls:        định dạng cũ không đọc theo lô được -> read_excel một lần
+    """
+    import pandas as pd
+
+    ext = (filename or "").rsplit(".", 1)[-1].lower()
+    if ext == "csv":
+        for frame in pd.read_csv(stream, dtype=str, keep_default_na=False, chunksize=chunksize):
+            yield frame
+        return
+
+    if ext in ("xlsx", "xlsm"):
+        from openpyxl import load_workbook
+
+        wb = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            header = [str(h) if h is not None else "" for h in header]
+            batch = []
+            for row in rows:
+                if row is None or all(v is None for v in row):
+                    continue
+                batch.append(row)
+                if len(batch) >= chunksize:
+                    yield pd.DataFrame(batch, columns=header, dtype=object)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=header, dtype=object)
+        finally:
+            wb.close()
+        return
+
+    if ext == "xls":
+        frame = pd.read_excel(stream, dtype=object)
+        for i in range(0, len(frame), chunksize):
+            yield frame.iloc[i:i + chunksize]
+        return
+
+    raise ValueError(f"Định dạng file không hỗ trợ: .{ext} (chỉ nhận .csv, .xlsx, .xlsm, .xls)")
+
+
+# ======================
+# Validate (vectorized)
+# ======================
+def _normalize_frame(df):
+    """Chuẩn hoá tên cột + giá trị chuỗi; thiếu cột bắt buộc -> ValueError."""
+    import pandas as pd
+
+    df = df.rename(columns=lambda c: str(c).strip().lower().replace(" ", "_"))
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Thiếu cột bắt buộc: {', '.join(missing)}")
+
+    present = [c for c in IMPORT_COLUMNS if c in df.columns]
+    df = df[present].copy()
+
+    for col in present:
+        if col in DATE_COLUMNS or col == "organization_unit_id":
+            continue
+        s = df[col]
+        # Excel trả số cho mã/điện thoại: 123.0 -> "123"
+        num = pd.to_numeric(s, errors="coerce")
+        integral = num.notna() & (num % 1 == 0) & s.map(lambda v: isinstance(v, (int, float)))
+        s = s.astype("string").str.strip()
+        s[integral] = num[integral].astype("Int64").astype("string")
+        df[col] = s.replace("", pd.NA)
+    return df
+
+
+def _validate(df, valid_unit_ids, seen_codes, row_offset):
+    """
+    Kiểm tra cả lô bằng các phép toán cột. Trả về (df_hợp_lệ, danh_sách_lỗi).
+    Ô trống được hiểu là 'giữ nguyên giá trị cũ' khi cập nhật.
+    """
+    import pandas as pd
+
+    errors_mask = pd.Series(False, index=df.index)
+    errors = []
+
+    def flag(mask, message):
+        nonlocal errors_mask
+        mask = mask.fillna(False) & ~errors_mask
+        for idx in df.index[mask]:
+            errors.append({
+                "row": int(idx) + row_offset + 2,  # +1 header, +1 đánh số từ 1
+                "employee_code": None if pd.isna(df.at[idx, "employee_code"]) else str(df.at[idx, "employee_code"]),
+                "error": message,
+            })
+        errors_mask = errors_mask | mask
+
+    flag(df["employee_code"].isna(), "Thiếu employee_code")
+    flag(df["full_name"].isna(), "Thiếu full_name")
+
+    dup_in_chunk = df["employee_code"].duplicated(keep="first") & df["employee_code"].notna()
+    dup_prev = df["employee_code"].isin(list(seen_codes))
+    flag(dup_in_chunk | dup_prev, "employee_code bị trùng trong file")
+
+    for col in DATE_COLUMNS:
+        if col not in df.columns:
+            continue
+        raw = df[col]
+        parsed = pd.to_datetime(raw, errors="coerce", dayfirst=True)
+        flag(raw.notna() & (raw.astype("string").str.strip() != "") & parsed.isna(), f"{col} không đúng định dạng ngày")
+        df[col] = parsed.dt.date.where(parsed.notna(), None)
+
+    if "employment_status" in df.columns:
+        status = df["employment_status"].str.lower()
+        flag(status.notna() & ~status.isin(VALID_STATUSES), "employment_status phải là active hoặc terminated")
+        df["employment_status"] = status
+
+    if "organization_unit_id" in df.columns:
+        raw = df["organization_unit_id"]
+        num = pd.to_numeric(raw, errors="coerce")
+        unit = num.where(num % 1 == 0).astype("Int64")
+        has_raw = raw.notna() & (raw.astype("string").str.strip() != "")
+        flag(has_raw & (unit.isna() | ~unit.isin(valid_unit_ids)), "organization_unit_id không tồn tại")
+        df["organization_unit_id"] = unit
+
+    return df[~errors_mask], errors
+
+
+# ======================
+# Diff với DB
+# ======================
+def _normalize_value(v):
+    """Đưa giá trị DB/file về chuỗi để so sánh."""
+    if v is None:
+        return None
+    try:
+        import pandas as pd
+        if pd.isna(v):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(v, "isoformat"):
+        return v.isoformat()[:10]
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
+
+
+def _load_existing(cursor):
+    import pandas as pd
+
+    cols = ", ".join(f"`{c}`" for c in IMPORT_COLUMNS)
+    cursor.execute(f"SELECT id, {cols} FROM {EMPLOYEE_TABLE} WHERE employee_code IS NOT NULL")
+    existing = pd.DataFrame(cursor.fetchall(), columns=["id"] + IMPORT_COLUMNS)
+    existing["employee_code"] = existing["employee_code"].astype(str).str.strip()
+    return existing.drop_duplicates("employee_code", keep="last").set_index("employee_code")
+
+
+def _diff_chunk(df, existing):
+    """
+    Tách lô thành (rows_insert, rows_update) với rows_update = [(id, {col: value})].
+    Chỉ so sánh các cột có trong file và có giá trị.
+    """
+    import pandas as pd
+
+    is_new = ~df["employee_code"].isin(existing.index)
+    inserts = df[is_new]
+
+    updates = []
+    old = df[~is_new]
+    if not old.empty:
+        cur = existing.loc[old["employee_code"]]
+        cur.index = old.index
+        cols = [c for c in df.columns if c != "employee_code"]
+        changed_any = pd.Series(False, index=old.index)
+        changed_cols = {}
+        for col in cols:
+            new_v = old[col].map(_normalize_value)
+            old_v = cur[col].map(_normalize_value)
+            changed = new_v.notna() & (new_v != old_v)
+            changed_cols[col] = changed
+            changed_any |= changed
+        for idx in old.index[changed_any]:
+            values = {col: old.at[idx, col] for col in cols if changed_cols[col].at[idx]}
+            updates.append((int(cur.at[idx, "id"]), values))
+    return inserts, updates
+
+
+def _to_db(v):
+    try:
+        import pandas as pd
+        if pd.isna(v):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(v, "item"):  # numpy scalar / Int64
+        return v.item()
+    return v
+
+
+# ======================
+# Ghi DB theo lô
+# ======================
+def _apply_inserts(cursor, frame):
+    if frame.empty:
+        return 0
+    cols = list(frame.columns)
+    if "employment_status" not in cols:
+        cols.append("employment_status")
+    col_sql = ", ".join(f"`{c}`" for c in cols)
+    placeholders = ", ".join(["%s"] * len(cols))
+    rows = []
+    for rec in frame.to_dict("records"):
+        rec.setdefault("employment_status", None)
+        rec["employment_status"] = _to_db(rec["employment_status"]) or "active"
+        rows.append(tuple(_to_db(rec.get(c)) for c in cols))
+    cursor.executemany(f"INSERT INTO {EMPLOYEE_TABLE} ({col_sql}) VALUES ({placeholders})", rows)
+    return len(rows)
+
+
+def _apply_updates(cursor, updates):
+    # Gom theo tập cột để dùng executemany cho từng nhóm
+    groups = {}
+    for emp_id, values in updates:
+        key = tuple(sorted(values))
+        groups.setdefault(key, []).append(tuple(_to_db(values[c]) for c in key) + (emp_id,))
+    for cols, rows in groups.items():
+        set_sql = ", ".join(f"`{c}` = %s" for c in cols)
+        cursor.executemany(f"UPDATE {EMPLOYEE_TABLE} SET {set_sql} WHERE id = %s", rows)
+    return len(updates)
+
+
+def _apply_deactivations(cursor, ids, chunksize):
+    for i in range(0, len(ids), chunksize):
+        chunk = ids[i:i + chunksize]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cursor.execute(
+            f"UPDATE {EMPLOYEE_TABLE} SET employment_status = 'terminated' WHERE id IN ({placeholders})",
+            chunk,
+        )
+    return len(ids)
+
+
+def import_employees(stream, filename, dry_run=True, deactivate_missing=False, chunksize=CHUNK_SIZE):
+    """
+    Chạy toàn bộ pipeline import và trả về báo cáo (dict).
+    - dry_run=True: chỉ validate + diff, không ghi DB.
+    - deactivate_missing=True: nhân viên active có trong DB nhưng không có trong file -> terminated.
+      Dòng lỗi vẫn tính là "có trong file"; file có bất kỳ lỗi nào thì bỏ qua bước này (deactivate_skipped).
+    """
+    snap = get_org_snapshot()
+    valid_unit_ids = list(snap.units.keys())
+
+    report = {
+        "dry_run": bool(dry_run),
+        "rows_read": 0,
+        "valid_rows": 0,
+        "error_count": 0,
+        "errors": [],
+        "inserted": 0,
+        "updated": 0,
+        "deactivated": 0,
+        "deactivate_skipped": None,
+        "unchanged": 0,
+        "counts_rebuilt": False,
+    }
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        existing = _load_existing(cursor)
+        seen_codes = set()     # mã của dòng hợp lệ (bắt trùng giữa các lô)
+        present_codes = set()  # mọi mã xuất hiện trong file, kể cả dòng lỗi
+        row_offset = 0
+
+        for raw in _iter_frames(stream, filename, chunksize):
+            report["rows_read"] += len(raw)
+            df = _normalize_frame(raw.reset_index(drop=True))
+            present_codes.update(df["employee_code"].dropna().tolist())
+            df, errors = _validate(df, valid_unit_ids, seen_codes, row_offset)
+            row_offset += len(raw)
+
+            report["error_count"] += len(errors)
+            room = MAX_REPORTED_ERRORS - len(report["errors"])
+            if room > 0:
+                report["errors"].extend(errors[:room])
+
+            report["valid_rows"] += len(df)
+            seen_codes.update(df["employee_code"].tolist())
+
+            inserts, updates = _diff_chunk(df, existing)
+            report["unchanged"] += len(df) - len(inserts) - len(updates)
+            if dry_run:
+                report["inserted"] += len(inserts)
+                report["updated"] += len(updates)
+            else:
+                report["inserted"] += _apply_inserts(cursor, inserts)
+                report["updated"] += _apply_updates(cursor, updates)
+
+        if deactivate_missing and report["error_count"]:
+            report["deactivate_skipped"] = (
+                f"File có {report['error_count']} dòng lỗi - không chuyển terminated nhân viên vắng mặt"
+            )
+        elif deactivate_missing:
+            missing = existing[
+                ~existing.index.isin(present_codes)
+                & (existing["employment_status"].fillna("active") == "active")
+            ]
+            ids = [int(x) for x in missing["id"].tolist()]
+            if dry_run:
+                report["deactivated"] = len(ids)
+            else:
+                report["deactivated"] = _apply_deactivations(cursor, ids, chunksize)
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    # Tính lại employee_count 1 lần duy nhất ở cuối
+    if not dry_run and (report["inserted"] or report["updated"] or report["deactivated"]):
+        report["org_counts"] = rebuild_employee_counts()
+        report["counts_rebuilt"] = True
+        bump_data_version("employees")  # CLI không qua after_request
+        invalidate_tags("employees2026_base")
+
+    return report
+
+
+# ======================
+# API
+# ======================
+@employee_import_bp.route("", methods=["POST"])
+def import_employees_api():
+    """
+    multipart/form-data:
+      - file: .xlsx / .csv
+      - dry_run: 1|0 (mặc định 1 - chỉ báo cáo, không ghi)
+      - deactivate_missing: 1|0 (mặc định 0)
+    """
+    file = request.files.get("file")
+    if not file or not file.filename:
+        return jsonify({"error": "Thiếu file import"}), 400
+
+    dry_run = _truthy(request.form.get("dry_run", request.args.get("dry_run", "1")))
+    deactivate_missing = _truthy(request.form.get("deactivate_missing", request.args.get("deactivate_missing")))
+
+    try:
+        report = import_employees(file.stream, file.filename, dry_run=dry_run, deactivate_missing=deactivate_missing)
+        return jsonify(report), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# ======================
+# CLI
+# ======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import nhân viên từ Excel/CSV vào employees2026_base")
+    parser.add_argument("path", help="Đường dẫn file .xlsx / .csv")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ validate + báo cáo, không ghi DB")
+    parser.add_argument("--deactivate-missing", action="store_true",
+                        help="Chuyển terminated các nhân viên active không có trong file")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    with open(args.path, "rb") as fh:
+        report = import_employees(
+            fh, os.path.basename(args.path),
+            dry_run=args.dry_run,
+            deactivate_missing=args.deactivate_missing,
+            chunksize=args.chunk_size,
+        )
+    print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    return 1 if report["error_count"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
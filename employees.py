@@ -1,41 +1,124 @@
 from flask import Blueprint, jsonify, request
-from database import get_connection, DB_SCHEMA
-from datetime import date, datetime
+from database import get_connection, DB_SCHEMA, READ
+from collections import OrderedDict
+import threading
+from org_tree import get_org_snapshot, bump_org_version
+from org_closure import CLOSURE_TABLE
+from MBO.scoring import apply_scores_to_rows
+from data_versions import conditional_get, read_only
+from query_cache import invalidates
 
 employees_bp = Blueprint('employees', __name__, url_prefix='/employees')
 
 # ======= Hàm phụ trợ =======
-def get_parent_map():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, parent_id FROM organization_units")
-    rows = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return {row["id"]: row["parent_id"] for row in rows}
+def get_parent_map(unit_ids=()):
+    """
+    Map id -> parent_id lấy từ snapshot cây trong bộ nhớ (không mở connection mới).
+    Nếu có unit_id chưa có trong snapshot (vừa được thêm ở worker khác) thì nạp lại.
+    """
+    snap = get_org_snapshot()
+    if any(uid and uid not in snap.units for uid in unit_ids):
+        bump_org_version()
+        snap = get_org_snapshot()
+    return {uid: u["parent_id"] for uid, u in snap.units.items()}
 
 def get_all_parents(unit_id, parent_map):
     result = []
-    while unit_id:
+    seen = set()
+    while unit_id and unit_id not in seen:
+        seen.add(unit_id)
         result.append(unit_id)
         unit_id = parent_map.get(unit_id)
     return result
 
-def update_employee_count(unit_id, delta):
-    if not unit_id:
-        return
-    parent_map = get_parent_map()
-    conn = get_connection()
-    cursor = conn.cursor()
-    for uid in get_all_parents(unit_id, parent_map):
-        cursor.execute("""
+def _apply_unit_counts(cursor, values, relative):
+    """
+    Ghi employee_count cho nhiều unit bằng 1 câu UPDATE ... CASE (chia lô 1000 unit).
+    relative=True  => employee_count + delta
+    relative=False => gán giá trị tuyệt đối
+    """
+    items = list(values.items())
+    affected = 0
+    for i in range(0, len(items), 1000):
+        chunk = items[i:i + 1000]
+        cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+        placeholders = ",".join(["%s"] * len(chunk))
+        params = [v for pair in chunk for v in pair] + [uid for uid, _ in chunk]
+        target = "employee_count + CASE id {} ELSE 0 END" if relative else "CASE id {} ELSE employee_count END"
+        cursor.execute(f"""
             UPDATE organization_units
-            SET employee_count = employee_count + %s
-            WHERE id = %s
-        """, (delta, uid))
-    conn.commit()
-    cursor.close()
-    conn.close()
+            SET employee_count = {target.format(cases)}
+            WHERE id IN ({placeholders})
+        """, params)
+        affected += cursor.rowcount or 0
+    return affected
+
+def update_employee_count(cursor, *changes):
+    """
+    Cộng dồn thay đổi employee_count cho unit và toàn bộ tổ tiên.
+    - changes: các cặp (unit_id, delta)
+    - Chạy trên cursor của caller => cùng transaction với insert/update/delete nhân viên.
+    Delta được gộp theo từng unit rồi ghi bằng 1 câu UPDATE.
+    Caller gọi bump_org_version() sau khi commit.
+    """
+    changes = [(uid, d) for uid, d in changes if uid and d]
+    if not changes:
+        return 0
+    parent_map = get_parent_map([uid for uid, _ in changes])
+
+    deltas = {}
+    for unit_id, delta in changes:
+        for uid in get_all_parents(unit_id, parent_map):
+            deltas[uid] = deltas.get(uid, 0) + delta
+    deltas = {uid: d for uid, d in deltas.items() if d}
+    if not deltas:
+        return 0
+    return _apply_unit_counts(cursor, deltas, relative=True)
+
+def rebuild_employee_counts(conn=None):
+    """
+    Tính lại employee_count cho toàn bộ cây từ bảng nhân viên trong 1 lượt aggregate:
+    - 1 query GROUP BY organization_unit_id (chỉ nhân viên active)
+    - cộng dồn lên tổ tiên trong bộ nhớ
+    - ghi lại các unit bị lệch bằng UPDATE ... CASE
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT id, parent_id, employee_count FROM organization_units")
+        units = cursor.fetchall()
+        parent_map = {u["id"]: u["parent_id"] for u in units}
+
+        cursor.execute(f"""
+            SELECT organization_unit_id AS unit_id, COUNT(*) AS cnt
+            FROM {EMPLOYEE_TABLE}
+            WHERE organization_unit_id IS NOT NULL
+              AND COALESCE(employment_status, 'active') = 'active'
+            GROUP BY organization_unit_id
+        """)
+        totals = {u["id"]: 0 for u in units}
+        for row in cursor.fetchall():
+            for uid in get_all_parents(row["unit_id"], parent_map):
+                if uid in totals:
+                    totals[uid] += int(row["cnt"])
+
+        changed = {u["id"]: totals[u["id"]] for u in units if (u["employee_count"] or 0) != totals[u["id"]]}
+        if changed:
+            _apply_unit_counts(cursor, changed, relative=False)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+
+    if changed:
+        bump_org_version()
+    return {"units": len(units), "changed": len(changed)}
 
 # ======= API =======
 EMPLOYEE_TABLE = f"`{DB_SCHEMA}`.employees2026_base"  # bảng thật sau khi rename
@@ -60,46 +143,24 @@ def get_employees_list():
     """
 
     if org_id:
-        # Lấy tất cả phòng ban con (CTE)
-        cursor.execute("""
-            WITH RECURSIVE org_tree AS (
-                SELECT id, parent_id, name
-                FROM organization_units
-                WHERE id = %s
-                UNION ALL
-                SELECT ou.id, ou.parent_id, ou.name
-                FROM organization_units ou
-                INNER JOIN org_tree ot ON ou.parent_id = ot.id
-            )
-            SELECT id FROM org_tree
-        """, (org_id,))
-        descendant_ids = [r["id"] for r in cursor.fetchall()]
-
-        if not descendant_ids:
-            cursor.close()
-            conn.close()
-            return jsonify([])
-
-        format_strings = ",".join(["%s"] * len(descendant_ids))
-        query = base_select + f" WHERE e.organization_unit_id IN ({format_strings})"
-        cursor.execute(query, descendant_ids)
+        # Lấy nhân viên của phòng ban và toàn bộ phòng ban con (bảng closure)
+        query = base_select + f"""
+            JOIN {CLOSURE_TABLE} c ON c.descendant_id = e.organization_unit_id
+            WHERE c.ancestor_id = %s
+        """
+        cursor.execute(query, (org_id,))
     else:
         cursor.execute(base_select)
 
     rows = cursor.fetchall()
 
-    # Chuẩn hóa định dạng ngày
-    for row in rows:
-        for date_field in ['entry_date', 'birth_date']:
-            if isinstance(row.get(date_field), (date, datetime)):
-                row[date_field] = row[date_field].isoformat()
-
     cursor.close()
     conn.close()
     return jsonify(rows)
 
 # POST - Thêm nhân viên
 @employees_bp.route('/add', methods=['POST'])
+@invalidates("employees2026_base")
 def add_employee():
     data = request.json or {}
 
@@ -143,16 +204,20 @@ def add_employee():
         status_note
     ))
 
+    counted = False
     if data.get('organization_unit_id') and employment_status == 'active':
-        update_employee_count(data['organization_unit_id'], +1)
+        counted = bool(update_employee_count(cursor, (data['organization_unit_id'], +1)))
 
     conn.commit()
     cursor.close()
     conn.close()
+    if counted:
+        bump_org_version()
     return jsonify({"message": "Thêm nhân viên thành công"}), 201
 
 # PUT - Cập nhật nhân viên
 @employees_bp.route('/update/<int:id>', methods=['PUT'])
+@invalidates("employees2026_base")
 def update_employee(id):
     data = request.json or {}
 
@@ -216,26 +281,31 @@ def update_employee(id):
         WHERE id=%s
     """, (*update_values, id))
 
-    # Cập nhật employee_count
+    # Cập nhật employee_count (cùng transaction)
+    changes = []
     if old_unit_id != new_unit_id:
         if old_unit_id and old_status == 'active':
-            update_employee_count(old_unit_id, -1)
+            changes.append((old_unit_id, -1))
         if new_unit_id and new_status == 'active':
-            update_employee_count(new_unit_id, +1)
+            changes.append((new_unit_id, +1))
     else:
         if old_status != new_status and new_unit_id:
             if old_status == 'active' and new_status == 'terminated':
-                update_employee_count(new_unit_id, -1)
+                changes.append((new_unit_id, -1))
             elif old_status == 'terminated' and new_status == 'active':
-                update_employee_count(new_unit_id, +1)
+                changes.append((new_unit_id, +1))
+    counted = bool(update_employee_count(cursor, *changes))
 
     conn.commit()
     cursor.close()
     conn.close()
+    if counted:
+        bump_org_version()
     return jsonify({"message": "Cập nhật thành công"})
 
 # DELETE - Xoá nhân viên
 @employees_bp.route('/delete/<int:id>', methods=['DELETE'])
+@invalidates("employees2026_base")
 def delete_employee(id):
     conn = get_connection()
     cursor = conn.cursor()
@@ -255,15 +325,18 @@ def delete_employee(id):
 
         org_unit_id, employment_status = row[0], row[1]
 
-        if org_unit_id and (employment_status or 'active') == 'active':
-            update_employee_count(org_unit_id, -1)
-
         cursor.execute(f"""
             DELETE FROM `{DB_SCHEMA}`.employees2026_base
             WHERE id = %s
         """, (id,))
 
+        counted = False
+        if org_unit_id and (employment_status or 'active') == 'active':
+            counted = bool(update_employee_count(cursor, (org_unit_id, -1)))
+
         conn.commit()
+        if counted:
+            bump_org_version()
         return jsonify({"message": "Xoá thành công"})
     except Exception as e:
         conn.rollback()
@@ -273,238 +346,82 @@ def delete_employee(id):
         conn.close()
 
 
+# POST - Tính lại employee_count cho toàn bộ cây tổ chức
+@employees_bp.route('/recount-units', methods=['POST'])
+def recount_units():
+    try:
+        summary = rebuild_employee_counts()
+        return jsonify({"message": "Đã tính lại employee_count", **summary})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @employees_bp.route('/by-department/<int:unit_id>', methods=['GET'])
+@conditional_get("organization_units", "employees", "mbo")
 def get_employees_by_department(unit_id):
     from datetime import date
     mbo_year = request.args.get('mbo_year', type=int) or date.today().year
 
-    conn = get_connection()
+    conn = get_connection(READ)
     cursor = conn.cursor(dictionary=True)
     cursor.execute("SET NAMES utf8mb4 COLLATE utf8mb4_unicode_ci")
 
     query = f"""
-        WITH RECURSIVE descendants AS (
-            SELECT id FROM organization_units WHERE id = %s
-            UNION ALL
-            SELECT o.id
-            FROM organization_units o
-            JOIN descendants d ON o.parent_id = d.id
-        )
-        /* Lớp 1: tính sẵn các điểm REVIEWED/APPROVED + thái độ */
-        , base AS (
-            SELECT
-                e.id,
-                e.full_name,
-                e.employee_code,
-                e.position,
-                e.phone,
-                e.entry_date,
-                e.birth_date,
-                e.gender,
-                e.note,
-                e.corporation,
-                e.company,
-                e.factory,
-                e.division,
-                e.sub_division,
-                e.section,
-                e.group_name,
-                e.organization_unit_id,
-
-                COALESCE(ms.status, 'draft')       AS status,
-                ms.reviewer_id,
-                ms.approver_id,
-                ms.score_final                     AS ms_score_final,
-                COALESCE(ms.attitude_status,'none') AS attitude_status,
-
-                /* Điểm công việc (REVIEWED) */
-                (
-                  SELECT COALESCE(
-                    SUM(ROUND(
-                      (COALESCE(p.reviewed_ey_score, 0) * COALESCE(p.reviewer_ti_trong, 0)) / 100
-                    , 2)), 0
-                  )
-                  FROM `{DB_SCHEMA}`.personalmbo p
-                  WHERE p.employee_code COLLATE utf8mb4_unicode_ci = e.employee_code COLLATE utf8mb4_unicode_ci
-                    AND p.mbo_year = %s
-                ) AS job_score_reviewed,
-
-                /* Điểm công việc (APPROVED) */
-                (
-                  SELECT COALESCE(
-                    SUM(ROUND(
-                      (COALESCE(p.approved_ey_score, 0) * COALESCE(p.approver_ti_trong, 0)) / 100
-                    , 2)), 0
-                  )
-                  FROM `{DB_SCHEMA}`.personalmbo p
-                  WHERE p.employee_code COLLATE utf8mb4_unicode_ci = e.employee_code COLLATE utf8mb4_unicode_ci
-                    AND p.mbo_year = %s
-                ) AS job_score_approved,
-
-                /* Điểm năng lực (REVIEWED) */
-                (
-                  SELECT COALESCE(
-                    SUM(ROUND(
-                      (COALESCE(c.reviewed_ey_score, 0) * COALESCE(c.reviewer_ti_trong, 0)) / 100
-                    , 2)), 0
-                  )
-                  FROM `{DB_SCHEMA}`.competencymbo c
-                  WHERE c.employee_code COLLATE utf8mb4_unicode_ci = e.employee_code COLLATE utf8mb4_unicode_ci
-                    AND c.mbo_year = %s
-                ) AS competency_score_reviewed,
-
-                /* Điểm năng lực (APPROVED) */
-                (
-                  SELECT COALESCE(
-                    SUM(ROUND(
-                      (COALESCE(c.approved_ey_score, 0) * COALESCE(c.approver_ti_trong, 0)) / 100
-                    , 2)), 0
-                  )
-                  FROM `{DB_SCHEMA}`.competencymbo c
-                  WHERE c.employee_code COLLATE utf8mb4_unicode_ci = e.employee_code COLLATE utf8mb4_unicode_ci
-                    AND c.mbo_year = %s
-                ) AS competency_score_approved,
-
-                /* Điểm thái độ (AVG theo năm, dùng cho cả reviewed/approved) */
-                (
-                  SELECT COALESCE(ROUND(AVG(a.score), 2), 0)
-                  FROM `{DB_SCHEMA}`.attitudembo a
-                  WHERE a.employee_code COLLATE utf8mb4_unicode_ci = e.employee_code COLLATE utf8mb4_unicode_ci
-                    AND a.mbo_year = %s
-                ) AS attitude_score_year,
-
-                /* Tên phòng ban nhỏ nhất để hiển thị */
-                CASE
-                    WHEN e.group_name      IS NOT NULL AND e.group_name      != '' THEN e.group_name
-                    WHEN e.section         IS NOT NULL AND e.section         != '' THEN e.section
-                    WHEN e.sub_division    IS NOT NULL AND e.sub_division    != '' THEN e.sub_division
-                    WHEN e.division        IS NOT NULL AND e.division        != '' THEN e.division
-                    WHEN e.factory         IS NOT NULL AND e.factory         != '' THEN e.factory
-                    WHEN e.company         IS NOT NULL AND e.company         != '' THEN e.company
-                    WHEN e.corporation     IS NOT NULL AND e.corporation     != '' THEN e.corporation
-                    ELSE NULL
-                END AS department_name
-
-            FROM `{DB_SCHEMA}`.employees2026 e
-            JOIN descendants d ON e.organization_unit_id = d.id
-            LEFT JOIN `{DB_SCHEMA}`.mbo_sessions ms
-                ON e.id = ms.employee_id AND ms.mbo_year = %s
+        WITH descendants AS (
+            SELECT descendant_id AS id FROM {CLOSURE_TABLE} WHERE ancestor_id = %s
         )
+        SELECT
+            e.id,
+            e.full_name,
+            e.employee_code,
+            e.position,
+            e.phone,
+            e.entry_date,
+            e.birth_date,
+            e.gender,
+            e.note,
+            e.corporation,
+            e.company,
+            e.factory,
+            e.division,
+            e.sub_division,
+            e.section,
+            e.group_name,
+            e.organization_unit_id,
 
-        /* Lớp 2: chọn điểm theo status + tính computed_final */
-        , prepared AS (
-            SELECT
-                b.*,
-
-                /* job_score theo status */
-                CASE
-                  WHEN b.status = 'reviewed_final' THEN b.job_score_reviewed
-                  WHEN b.status = 'approved_final' THEN b.job_score_approved
-                  ELSE 0
-                END AS job_score,
-
-                /* competency_score theo status */
-                CASE
-                  WHEN b.status = 'reviewed_final' THEN b.competency_score_reviewed
-                  WHEN b.status = 'approved_final' THEN b.competency_score_approved
-                  ELSE 0
-                END AS competency_score,
-
-                /* attitude_score theo status (2 trạng thái dùng chung thái độ năm) */
-                CASE
-                  WHEN b.status IN ('reviewed_final','approved_final') THEN b.attitude_score_year
-                  ELSE 0
-                END AS attitude_score,
-
-                /* computed_final theo position + status (các trạng thái khác = 0) */
-                CASE
-                  WHEN b.status NOT IN ('reviewed_final','approved_final') THEN 0
-                  ELSE
-                    CASE
-                      /* TL/Trưởng nhóm/Phó nhóm */
-                      WHEN  LOWER(b.position) REGEXP 'trưởng[[:space:]]*nhóm|truong[[:space:]]*nhom|phó[[:space:]]*nhóm|pho[[:space:]]*nhom|team[[:space:]]*lead'
-                         OR  CONCAT(' ', LOWER(b.position), ' ') LIKE '% tl %'
-                      THEN ROUND(
-                           0.10 * b.attitude_score_year
-                         + 0.45 * (CASE WHEN b.status='reviewed_final' THEN b.job_score_reviewed        ELSE b.job_score_approved        END)
-                         + 0.45 * (CASE WHEN b.status='reviewed_final' THEN b.competency_score_reviewed ELSE b.competency_score_approved END)
-                      , 2)
-
-                      /* Nhân viên */
-                      WHEN  LOWER(b.position) REGEXP 'nhân[[:space:]]*viên|nhan[[:space:]]*vien|staff|employee'
-                      THEN ROUND(
-                           0.20 * b.attitude_score_year
-                         + 0.40 * (CASE WHEN b.status='reviewed_final' THEN b.job_score_reviewed        ELSE b.job_score_approved        END)
-                         + 0.40 * (CASE WHEN b.status='reviewed_final' THEN b.competency_score_reviewed ELSE b.competency_score_approved END)
-                      , 2)
-
-                      /* Cấp khác: bỏ thái độ */
-                      ELSE ROUND(
-                           0.50 * (CASE WHEN b.status='reviewed_final' THEN b.job_score_reviewed        ELSE b.job_score_approved        END)
-                         + 0.50 * (CASE WHEN b.status='reviewed_final' THEN b.competency_score_reviewed ELSE b.competency_score_approved END)
-                      , 2)
-                    END
-                END AS computed_final
-            FROM base b
-        )
+            COALESCE(ms.status, 'draft')        AS status,
+            ms.reviewer_id,
+            ms.approver_id,
+            ms.score_final                      AS ms_score_final,
+            COALESCE(ms.attitude_status,'none') AS attitude_status,
 
-        /* Lớp 3: xuất dữ liệu cuối cùng + score_final theo yêu cầu */
-        SELECT
-            p.id,
-            p.full_name,
-            p.employee_code,
-            p.position,
-            p.phone,
-            p.entry_date,
-            p.birth_date,
-            p.gender,
-            p.note,
-            p.corporation,
-            p.company,
-            p.factory,
-            p.division,
-            p.sub_division,
-            p.section,
-            p.group_name,
-            p.organization_unit_id,
-
-            p.status,
-            p.reviewer_id,
-            p.approver_id,
-
-            p.job_score,
-            p.competency_score,
-            p.attitude_score,
-            p.attitude_status,
-
-            p.computed_final,
-
-            /* score_final: chỉ cho reviewed/approved; ưu tiên ms_score_final nếu có */
+            /* Tên phòng ban nhỏ nhất để hiển thị */
             CASE
-              WHEN p.ms_score_final IS NOT NULL THEN ROUND(p.ms_score_final, 2)
-              WHEN p.status IN ('reviewed_final','approved_final') THEN p.computed_final
-              ELSE 0
-            END AS score_final,
+                WHEN e.group_name      IS NOT NULL AND e.group_name      != '' THEN e.group_name
+                WHEN e.section         IS NOT NULL AND e.section         != '' THEN e.section
+                WHEN e.sub_division    IS NOT NULL AND e.sub_division    != '' THEN e.sub_division
+                WHEN e.division        IS NOT NULL AND e.division        != '' THEN e.division
+                WHEN e.factory         IS NOT NULL AND e.factory         != '' THEN e.factory
+                WHEN e.company         IS NOT NULL AND e.company         != '' THEN e.company
+                WHEN e.corporation     IS NOT NULL AND e.corporation     != '' THEN e.corporation
+                ELSE NULL
+            END AS department_name
 
-            p.department_name
-        FROM prepared p
+        FROM `{DB_SCHEMA}`.employees2026 e
+        JOIN descendants d ON e.organization_unit_id = d.id
+        LEFT JOIN `{DB_SCHEMA}`.mbo_sessions ms
+            ON e.id = ms.employee_id AND ms.mbo_year = %s
     """
 
     try:
-        # placeholders: unit_id + 5×mbo_year (job_r, job_a, comp_r, comp_a, attitude) + 1×mbo_year (join ms)
-        cursor.execute(
-            query,
-            (
-                unit_id,
-                mbo_year,  # job_score_reviewed
-                mbo_year,  # job_score_approved
-                mbo_year,  # competency_score_reviewed
-                mbo_year,  # competency_score_approved
-                mbo_year,  # attitude_score_year
-                mbo_year,  # join mbo_sessions
-            ),
-        )
+        cursor.execute(query, (unit_id, mbo_year))
         rows = cursor.fetchall()
+
+        # job/competency/attitude_score, computed_final, score_final: tính bằng engine MBO.scoring
+        # (nạp điểm thành phần của cả nhóm trong 3 query, công thức theo position + status)
+        apply_scores_to_rows(cursor, mbo_year, rows)
+        for row in rows:
+            row.pop("ms_score_final", None)
         return jsonify(rows)
     finally:
         cursor.close()
@@ -512,69 +429,78 @@ def get_employees_by_department(unit_id):
 
 
 
+# Memo kết quả accessible-units theo (unit_id, tập quyền, snapshot cây tổ chức).
+# Snapshot nhận diện bằng (version, loaded_at): nạp lại do hết TTL giữ nguyên version nhưng loaded_at đổi.
+_ACCESSIBLE_CACHE_SIZE = 512
+_accessible_cache = OrderedDict()
+_accessible_lock = threading.Lock()
+
+
+def _resolve_accessible_units(org_unit_id, permissions):
+    """Danh sách unit được xem, tính hoàn toàn trong bộ nhớ từ snapshot cây (không query theo từng node)."""
+    snap = get_org_snapshot()
+    key = (org_unit_id, permissions, snap.version, snap.loaded_at)
+
+    with _accessible_lock:
+        cached = _accessible_cache.get(key)
+        if cached is not None:
+            _accessible_cache.move_to_end(key)
+            return cached
+
+    if "view_FY_review" in permissions:
+        result = list(snap.units.values())
+    else:
+        result = [
+            {k: snap.units[uid][k] for k in ("id", "name", "type", "parent_id")}
+            for uid in snap.descendant_ids(org_unit_id)
+        ]
+
+    with _accessible_lock:
+        _accessible_cache[key] = result
+        _accessible_cache.move_to_end(key)
+        while len(_accessible_cache) > _ACCESSIBLE_CACHE_SIZE:
+            _accessible_cache.popitem(last=False)
+    return result
+
+
 @employees_bp.route("/accessible-units", methods=["GET"])
 def get_accessible_organization_units():
     org_unit_id = request.headers.get("X-Org-Unit-Id")
     permissions = request.headers.get("X-Permissions", "")
 
     # Parse quyền
-    try:
-        permissions_list = [p.strip() for p in permissions.split(",") if p.strip()]
-    except:
-        permissions_list = []
+    permissions_set = frozenset(p.strip() for p in permissions.split(",") if p.strip())
 
-    connection = get_connection()
     try:
-        with connection.cursor(dictionary=True) as cursor:
-            # ✅ Nếu có quyền cao nhất thì trả toàn bộ cây
-            if "view_FY_review" in permissions_list:
-                cursor.execute("SELECT * FROM organization_units")
-                return jsonify(cursor.fetchall())
+        # ✅ Nếu có quyền cao nhất thì trả toàn bộ cây
+        if "view_FY_review" in permissions_set:
+            return jsonify(_resolve_accessible_units(None, permissions_set))
 
-            # ✅ Nếu không có quyền thì cần org_unit_id
-            if not org_unit_id or org_unit_id == "null":
-                return jsonify([])  # Trả mảng rỗng nếu không có quyền truy cập
+        # ✅ Nếu không có quyền thì cần org_unit_id
+        if not org_unit_id or org_unit_id == "null":
+            return jsonify([])  # Trả mảng rỗng nếu không có quyền truy cập
 
-            try:
-                org_unit_id = int(org_unit_id)
-            except ValueError:
-                return jsonify({"error": "Invalid organization unit ID"}), 400
+        try:
+            org_unit_id = int(org_unit_id)
+        except ValueError:
+            return jsonify({"error": "Invalid organization unit ID"}), 400
 
-            # ✅ Truy vấn đệ quy để lấy các phòng ban con
-            query = """
-                WITH RECURSIVE sub_units AS (
-                    SELECT id, name, type, parent_id
-                    FROM organization_units
-                    WHERE id = %s
-                    UNION ALL
-                    SELECT ou.id, ou.name, ou.type, ou.parent_id
-                    FROM organization_units ou
-                    JOIN sub_units su ON ou.parent_id = su.id
-                )
-                SELECT * FROM sub_units;
-            """
-            cursor.execute(query, (org_unit_id,))
-            return jsonify(cursor.fetchall())
+        # ✅ Phòng ban và toàn bộ phòng ban con (duyệt trên snapshot)
+        return jsonify(_resolve_accessible_units(org_unit_id, permissions_set))
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        connection.close()
 
-def get_all_sub_unit_ids(start_ids, cursor):
+
+def get_all_sub_unit_ids(start_ids, cursor=None):
     """
-    Đệ quy lấy tất cả organization_unit_id con của các ID được truyền vào
+    Tất cả organization_unit_id con (gồm chính nó) của các ID được truyền vào.
+    Duyệt trên snapshot cây trong bộ nhớ; tham số cursor giữ lại cho tương thích.
     """
+    snap = get_org_snapshot()
     all_ids = set(start_ids)
-    queue = list(start_ids)
-
-    while queue:
-        current_id = queue.pop(0)
-        cursor.execute("SELECT id FROM organization_units WHERE parent_id = %s", (current_id,))
-        children = [row["id"] for row in cursor.fetchall()]
-        queue.extend(children)
-        all_ids.update(children)
-
+    for uid in start_ids:
+        all_ids.update(snap.descendant_ids(uid))
     return list(all_ids)
 
 @employees_bp.route("/accessible-units-v2", methods=["GET"])
@@ -617,34 +543,16 @@ def get_accessible_organization_units_v2():
             except ValueError:
                 return jsonify({"error": "Invalid organization unit ID"}), 400
 
-            # CTE đệ quy: lấy descendants và ancestors, rồi UNION DISTINCT
-            query = """
-                WITH RECURSIVE
-                desc_units AS (
-                    SELECT id, name, type, parent_id
-                    FROM organization_units
-                    WHERE id = %s
-                    UNION ALL
-                    SELECT ou.id, ou.name, ou.type, ou.parent_id
-                    FROM organization_units ou
-                    JOIN desc_units d ON ou.parent_id = d.id
-                ),
-                anc_units AS (
-                    SELECT id, name, type, parent_id
-                    FROM organization_units
-                    WHERE id = %s
-                    UNION ALL
-                    SELECT p.id, p.name, p.type, p.parent_id
-                    FROM organization_units p
-                    JOIN anc_units a ON a.parent_id = p.id
+            # Bảng closure: con cháu (ancestor_id = X) + tổ tiên (descendant_id = X)
+            query = f"""
+                SELECT ou.id, ou.name, ou.type, ou.parent_id
+                FROM organization_units ou
+                WHERE ou.id IN (
+                    SELECT descendant_id FROM {CLOSURE_TABLE} WHERE ancestor_id = %s
+                    UNION
+                    SELECT ancestor_id FROM {CLOSURE_TABLE} WHERE descendant_id = %s
                 )
-                SELECT DISTINCT id, name, type, parent_id
-                FROM (
-                    SELECT * FROM desc_units
-                    UNION ALL
-                    SELECT * FROM anc_units
-                ) u
-                ORDER BY id;
+                ORDER BY ou.id;
             """
             cursor.execute(query, (managed_id, managed_id))
             data = cursor.fetchall()
@@ -659,9 +567,8 @@ def get_accessible_organization_units_v2():
             pass
 
 @employees_bp.route('/by-subordinates', methods=['POST'])
+@read_only
 def get_employees_for_allocation():
-    from datetime import date, datetime
-
     data = request.get_json()
     managed_ids = data.get("managed_organization_unit_ids")
     current_user_id = data.get("current_user_id")
@@ -675,12 +582,8 @@ def get_employees_for_allocation():
     cursor = conn.cursor(dictionary=True)
 
     try:
-        # 1) Preload toàn bộ organization_units
-        cursor.execute("""
-            SELECT id, parent_id, employee_id
-            FROM organization_units
-        """)
-        units = cursor.fetchall()
+        # 1) Toàn bộ organization_units lấy từ snapshot cây (không query DB)
+        units = list(get_org_snapshot().units.values())
 
         # Build maps
         children_map = {}
@@ -792,16 +695,13 @@ def get_employees_for_allocation():
             )
             result_rows.extend(cursor.fetchall())
 
-        # 4) Khử trùng lặp + chuẩn hoá ngày
+        # 4) Khử trùng lặp
         seen = set()
         final = []
         for emp in result_rows:
             emp_id = emp.get("id")
             if emp_id and emp_id not in seen:
                 seen.add(emp_id)
-                for field in ("entry_date", "birth_date"):
-                    if isinstance(emp.get(field), (date, datetime)):
-                        emp[field] = emp[field].isoformat()
                 final.append(emp)
 
         return jsonify(final)
@@ -886,7 +786,7 @@ def get_employee_summary_by_code(employee_code):
     from datetime import date
     mbo_year = request.args.get('mbo_year', type=int) or date.today().year
 
-    conn = get_connection()
+    conn = get_connection(READ)
     cursor = conn.cursor(dictionary=True)
     cursor.execute("SET NAMES utf8mb4 COLLATE utf8mb4_unicode_ci")
 
@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify
 from database import get_connection
+from query_cache import cached
 
 employees_notifications_bp = Blueprint(
     "employees_notifications",
@@ -11,6 +12,7 @@ employees_notifications_bp = Blueprint(
 # API 1: Lấy danh sách employee_id là Nhân viên (active)
 # ======================================================
 @employees_notifications_bp.route("/staff", methods=["GET"])
+@cached("employees2026_base")
 def get_active_staff_ids():
     """
     GET /employees/notifications/staff
@@ -63,6 +65,7 @@ def get_active_staff_ids():
 # API 2: Lấy danh sách employee_id KHÔNG phải Nhân viên (active)
 # ======================================================
 @employees_notifications_bp.route("/managers", methods=["GET"])
+@cached("employees2026_base")
 def get_active_non_staff_ids():
     """
     GET /employees/notifications/managers
@@ -113,6 +116,7 @@ def get_active_non_staff_ids():
 # API 3: Lấy danh sách employee_id đang active (tất cả)
 # ======================================================
 @employees_notifications_bp.route("/active", methods=["GET"])
+@cached("employees2026_base")
 def get_all_active_employee_ids():
     """
     GET /employees/notifications/active
@@ -0,0 +1,47 @@
+# gunicorn.conf.py
+# gunicorn -c gunicorn.conf.py wsgi:app   (hoặc python serve.py)
+#
+# Master preload app (import + create_app 1 lần), chạy bootstrap (DDL, schema registry) 1 lần rồi fork worker;
+# mỗi worker gthread có WEB_THREADS thread và pool connection riêng (serve.worker_init).
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import serve  # noqa: E402
+
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = serve.WEB_BIND
+workers = serve.WEB_WORKERS
+threads = serve.WEB_THREADS
+worker_class = "gthread"
+preload_app = True
+
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))  # export năm / recompute có thể chạy lâu
+graceful_timeout = serve.WEB_GRACEFUL_TIMEOUT
+keepalive = 5
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "0"))  # >0 => tái tạo worker định kỳ
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("WEB_ACCESS_LOG", "-")
+errorlog = "-"
+loglevel = os.getenv("WEB_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    # Master, sau khi preload app, trước khi fork: DDL chạy đúng 1 lần cho cả cụm worker
+    from bootstrap import bootstrap
+
+    bootstrap()
+
+
+def post_fork(server, worker):
+    serve.worker_init()
+
+
+def worker_int(worker):
+    serve.worker_shutdown()
+
+
+def worker_exit(server, worker):
+    serve.worker_shutdown()
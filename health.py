@@ -0,0 +1,54 @@
+# health.py
+# Kiểm tra sống / sẵn sàng cho load balancer / orchestrator.
+#   GET /health/live   tiến trình còn chạy (không chạm DB)
+#   GET /health/ready  200 khi đã bootstrap, primary trả lời SELECT 1 và worker chưa vào trạng thái dừng;
+#                      ngược lại 503 (LB ngừng gửi request mới cho worker này)
+import time
+
+from flask import Blueprint, jsonify
+from mysql.connector import Error
+
+from bootstrap import is_bootstrapped
+from database import get_connection
+from db_routing import replicas
+
+health_bp = Blueprint("health", __name__, url_prefix="/health")
+
+_draining = False
+
+
+def mark_draining():
+    """Gọi khi bắt đầu graceful shutdown: /health/ready trả 503 trong lúc xử lý nốt request đang chạy."""
+    global _draining
+    _draining = True
+
+
+@health_bp.route("/live", methods=["GET"])
+def live():
+    return jsonify({"status": "ok"}), 200
+
+
+@health_bp.route("/ready", methods=["GET"])
+def ready():
+    checks = {"bootstrapped": is_bootstrapped(), "draining": _draining}
+
+    started = time.perf_counter()
+    try:
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+        finally:
+            conn.close()
+        checks["database"] = "ok"
+    except Error as e:
+        checks["database"] = str(e)
+    checks["database_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+    now = time.monotonic()
+    checks["replicas"] = {r.label: "ok" if r.available(now) else "down" for r in replicas()}
+
+    ok = checks["bootstrapped"] and not _draining and checks["database"] == "ok"
+    return jsonify({"status": "ok" if ok else "unavailable", "checks": checks}), 200 if ok else 503
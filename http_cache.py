@@ -0,0 +1,52 @@
+# http_cache.py
+# Tiện ích HTTP dùng chung: ETag / 304 cho các API đọc nhiều.
+import hashlib
+import json
+
+from flask import Response, request
+
+from json_provider import dumps_bytes
+
+
+def make_etag(payload) -> str:
+    """
+    Tạo ETag (chưa có dấu nháy) từ nội dung: bytes/str hoặc object JSON.
+    ETag tính theo nội dung nên các worker khác nhau vẫn cho cùng một giá trị.
+    """
+    if isinstance(payload, str):
+        payload = payload.encode("utf-8")
+    elif not isinstance(payload, (bytes, bytearray)):
+        payload = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()[:20]
+
+
+def is_not_modified(etag: str, weak: bool = False) -> bool:
+    """
+    Client đã có đúng phiên bản này (If-None-Match khớp) hay chưa.
+    If-None-Match luôn so sánh kiểu yếu (RFC 9110): response nén gzip/br bị đổi ETag sang W/"..."
+    và client gửi lại đúng dạng đó. Tham số weak giữ để tương thích chỗ gọi cũ.
+    """
+    if not etag:
+        return False
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified_response(etag: str, weak: bool = False) -> Response:
+    resp = Response(status=304)
+    resp.set_etag(etag, weak=weak)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def json_response(body, etag: str = None, status: int = 200, weak: bool = False) -> Response:
+    """
+    Trả JSON đã serialize sẵn (bytes/str) hoặc object; gắn ETag nếu có.
+    Cache-Control: no-cache => trình duyệt luôn hỏi lại server bằng If-None-Match.
+    """
+    if not isinstance(body, (bytes, bytearray, str)):
+        body = dumps_bytes(body)
+    resp = Response(body, status=status, mimetype="application/json")
+    if etag:
+        resp.set_etag(etag, weak=weak)
+        resp.headers["Cache-Control"] = "no-cache"
+    return resp
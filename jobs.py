@@ -0,0 +1,145 @@
+# jobs.py
+# Các job bảo trì chạy qua scheduler.py (trước đây chạy ngay trong request):
+#   - notification_retention: xoá thông báo đã đọc quá NOTIFICATION_RETENTION_DAYS ngày (MBO / nhân sự / ELN)
+#   - eln_counter_reconcile:  đối soát counter eln.tong_nhan_vien_hoc / so_nhan_vien_hoan_thanh
+#                             và eln_employee_status.tong_so_mon_hoc / so_mon_hoc_hoan_thanh
+#   - org_employee_counts:    tính lại employee_count cây tổ chức (rebuild_employee_counts)
+#   - timeline_seed_years:    tạo sẵn 5 phase timeline cho năm nay và năm sau
+#   - eln_course_reminders:   thông báo tổng hợp môn học quá hạn / sắp đến hạn (ELearning/eln_reminders.py)
+import os
+from datetime import date
+
+from database import get_connection
+from scheduler import job
+
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "30"))
+NOTIFICATION_DELETE_BATCH = int(os.getenv("NOTIFICATION_DELETE_BATCH", "5000"))
+NOTIFICATION_TABLES = ["nsh.mbo_notifications", "nsh.personnel_notifications", "nsh.eln_notifications"]
+
+
+# ======================
+# Dọn thông báo đã đọc
+# ======================
+@job("notification_retention", interval=6 * 3600)
+def notification_retention():
+    """Xoá theo lô (DELETE ... LIMIT, commit từng lô) để không giữ khoá lâu trên bảng thông báo."""
+    deleted = {}
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        for table in NOTIFICATION_TABLES:
+            total = 0
+            while True:
+                cursor.execute(f"""
+                    DELETE FROM {table}
+                    WHERE status = 'read'
+                      AND created_at < DATE_SUB(NOW(), INTERVAL %s DAY)
+                    LIMIT %s
+                """, (NOTIFICATION_RETENTION_DAYS, NOTIFICATION_DELETE_BATCH))
+                conn.commit()
+                total += cursor.rowcount
+                if cursor.rowcount < NOTIFICATION_DELETE_BATCH:
+                    break
+            deleted[table] = total
+    finally:
+        cursor.close()
+        conn.close()
+    return {"retention_days": NOTIFICATION_RETENTION_DAYS, "deleted": deleted}
+
+
+# ======================
+# Đối soát counter ELN
+# ======================
+@job("eln_counter_reconcile", interval=24 * 3600, timeout=1800)
+def eln_counter_reconcile():
+    """
+    Counter được cộng / trừ dần ở update_eln, quizz, eln_request; job này tính lại từ eln_employee_courses
+    (hoàn thành = status 'pass'; ket_qua là điểm) và chỉ ghi những dòng bị lệch.
+    """
+    from data_versions import ELN, bump_data_version
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE eln e
+            LEFT JOIN (
+                SELECT course_id,
+                       COUNT(*) AS total,
+                       SUM(CASE WHEN status = 'pass' THEN 1 ELSE 0 END) AS passed
+                FROM nsh.eln_employee_courses
+                GROUP BY course_id
+            ) c ON c.course_id = e.id
+            SET e.tong_nhan_vien_hoc = COALESCE(c.total, 0),
+                e.so_nhan_vien_hoan_thanh = COALESCE(c.passed, 0)
+            WHERE COALESCE(e.tong_nhan_vien_hoc, -1) <> COALESCE(c.total, 0)
+               OR COALESCE(e.so_nhan_vien_hoan_thanh, -1) <> COALESCE(c.passed, 0)
+        """)
+        courses_fixed = cursor.rowcount
+
+        cursor.execute("""
+            UPDATE nsh.eln_employee_status s
+            LEFT JOIN (
+                SELECT employee_id,
+                       COUNT(*) AS total,
+                       SUM(CASE WHEN status = 'pass' THEN 1 ELSE 0 END) AS passed
+                FROM nsh.eln_employee_courses
+                GROUP BY employee_id
+            ) c ON c.employee_id = s.employee_id
+            SET s.tong_so_mon_hoc = COALESCE(c.total, 0),
+                s.so_mon_hoc_hoan_thanh = COALESCE(c.passed, 0)
+            WHERE COALESCE(s.tong_so_mon_hoc, -1) <> COALESCE(c.total, 0)
+               OR COALESCE(s.so_mon_hoc_hoan_thanh, -1) <> COALESCE(c.passed, 0)
+        """)
+        employees_fixed = cursor.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+    if courses_fixed or employees_fixed:
+        bump_data_version(ELN)  # ETag /eln và query cache (tag "eln") dùng chung nhóm này
+    return {"courses_fixed": courses_fixed, "employees_fixed": employees_fixed}
+
+
+# ======================
+# Cây tổ chức / timeline
+# ======================
+@job("org_employee_counts", interval=24 * 3600, timeout=1800)
+def org_employee_counts():
+    from employees import rebuild_employee_counts
+
+    return rebuild_employee_counts()
+
+
+@job("timeline_seed_years", interval=24 * 3600)
+def timeline_seed_years():
+    from data_versions import TIMELINE, bump_data_version
+    from MBO.timelineMBO import _ensure_year_has_5_rows, invalidate_timeline_cache
+
+    years = [date.today().year, date.today().year + 1]
+    conn = get_connection()
+    try:
+        inserted = sum(_ensure_year_has_5_rows(conn, year) for year in years)
+        conn.commit()
+    finally:
+        conn.close()
+    if inserted:
+        invalidate_timeline_cache()
+        bump_data_version(TIMELINE)  # worker khác bỏ cache timeline
+    return {"years": years, "inserted": inserted}
+
+
+# ======================
+# Nhắc học ELN
+# ======================
+@job("eln_course_reminders", interval=int(os.getenv("REMINDER_INTERVAL_SECONDS", "3600")), timeout=1800)
+def eln_course_reminders():
+    from ELearning.eln_reminders import purge_reminder_log, send_course_reminders
+
+    stats = send_course_reminders()
+    stats["log_purged"] = purge_reminder_log()
+    return stats
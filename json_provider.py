@@ -0,0 +1,146 @@
+# json_provider.py
+# Serialize JSON dùng chung cho toàn app (jsonify, current_app.json, các response cache sẵn):
+#   - dùng orjson nếu có cài (nhanh hơn nhiều với danh sách hàng nghìn dòng), không có thì json chuẩn
+#   - Decimal -> số, date/datetime -> ISO 8601, time (timedelta) -> "HH:MM:SS", bytes -> chuỗi UTF-8, set -> list
+#
+# Đi kèm RowConverter: converter của mysql.connector đổi cột binary/BLOB sang str ngay khi đọc dòng,
+# nên các blueprint trả thẳng cursor.fetchall() mà không cần vòng lặp chuẩn hoá riêng.
+#
+# Đăng ký: app.json = FastJSONProvider(app) trong main.py.
+import dataclasses
+import json
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from flask.json.provider import DefaultJSONProvider
+from mysql.connector.conversion import MySQLConverter
+
+try:
+    import orjson
+except ImportError:  # orjson là tuỳ chọn
+    orjson = None
+
+
+def _decode_bytes(value):
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.hex()
+
+
+def _timedelta_text(value):
+    # Cột TIME của MySQL được đọc ra timedelta
+    total = int(value.total_seconds())
+    sign = "-" if total < 0 else ""
+    total = abs(total)
+    return f"{sign}{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}"
+
+
+def default(o):
+    """Kiểu mà encoder không tự xử lý được."""
+    if isinstance(o, Decimal):
+        return float(o)
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, timedelta):
+        return _timedelta_text(o)
+    if isinstance(o, (bytes, bytearray, memoryview)):
+        return _decode_bytes(bytes(o))
+    if isinstance(o, (set, frozenset)):
+        return sorted(o, key=str)
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def dumps_bytes(obj, sort_keys=False, indent=False):
+        opts = _ORJSON_OPTS
+        if sort_keys:
+            opts |= orjson.OPT_SORT_KEYS
+        if indent:
+            opts |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=default, option=opts)
+
+    def loads(s):
+        return orjson.loads(s)
+else:
+    def dumps_bytes(obj, sort_keys=False, indent=False):
+        return json.dumps(
+            obj,
+            default=default,
+            ensure_ascii=False,
+            sort_keys=sort_keys,
+            indent=2 if indent else None,
+            separators=None if indent else (",", ":"),
+        ).encode("utf-8")
+
+    def loads(s):
+        return json.loads(s)
+
+
+def dumps(obj, sort_keys=False, indent=False):
+    return dumps_bytes(obj, sort_keys=sort_keys, indent=indent).decode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider của Flask dùng dumps_bytes ở trên (key giữ theo thứ tự cột, không sort)."""
+
+    sort_keys = False
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - {"sort_keys", "indent", "separators", "ensure_ascii", "default"}:
+            return super().dumps(obj, **kwargs)  # tham số lạ => để json chuẩn xử lý
+        return dumps(obj, sort_keys=kwargs.get("sort_keys", self.sort_keys), indent=bool(kwargs.get("indent")))
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = dumps_bytes(obj, sort_keys=self.sort_keys, indent=indent) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# ======================
+# Converter cho mysql.connector (use_pure)
+# ======================
+def _binary_to_text(value):
+    if isinstance(value, (bytes, bytearray)):
+        try:
+            return value.decode("utf-8")
+        except UnicodeDecodeError:
+            return bytes(value)  # dữ liệu nhị phân thật thì giữ nguyên
+    return value
+
+
+class RowConverter(MySQLConverter):
+    """Cột binary / BLOB chứa văn bản -> str ngay khi đọc dòng (Decimal, date... giữ nguyên kiểu)."""
+
+
+def _wrap(name):
+    base = getattr(MySQLConverter, name, None)
+    if base is None:
+        return
+
+    def method(self, value, dsc=None):
+        return _binary_to_text(base(self, value, dsc))
+
+    method.__name__ = name
+    setattr(RowConverter, name, method)
+
+
+# Tên method khác nhau giữa các bản mysql-connector (_blob_to_python / _BLOB_to_python)
+for _type in ("string", "var_string", "json", "blob", "tiny_blob", "medium_blob", "long_blob"):
+    _wrap(f"_{_type}_to_python")
+    _wrap(f"_{_type.upper()}_to_python")
@@ -1,60 +1,54 @@
 # main.py
-from flask import Flask, send_from_directory, abort
-from flask_cors import CORS
+import importlib
+import logging
 import os
+import time
+
+from flask import Flask, send_from_directory, abort
+
+from bootstrap import bootstrap
+
+logger = logging.getLogger(__name__)
+
+# ==== Danh sách Blueprint: (module, biến blueprint, tham số register) ====
+# Module chỉ được import trong create_app() => "import main" rẻ; APP_BLUEPRINTS="auth,ELearning.eln,..."
+# (theo tên module) giới hạn các blueprint được nạp cho worker chuyên biệt / benchmark khởi động.
+BLUEPRINTS = [
+    ("auth", "auth_bp", {}),
+    ("project", "project_bp", {}),
+    ("employees", "employees_bp", {}),
+    ("employee_import", "employee_import_bp", {}),
+    ("department", "department_bp", {}),
+    ("permission.project_permission", "permission_bp", {}),
+    ("MBO.personalMBO", "employees_bpp", {}),
+    ("MBO.competencyMBO", "competency_bp", {}),
+    ("MBO.allocationsMBO", "allocations_bp", {}),
+    ("permission.roles", "roles_bp", {}),
+    ("MBO.submit", "submit_bp", {}),
+    ("MBO.timelineMBO", "mbo_timeline_bpp", {}),
+    ("MBO.phase_guard", "phase_guard_bp", {}),
+    ("MBO.status", "status_bp", {}),
+    ("MBO.scoring", "scoring_bp", {}),
+    ("MBO.year_export", "year_export_bp", {}),
+    ("MBO.attitudeMBO", "attitude_bp", {"url_prefix": "/attitude"}),
+    ("ELearning.eln", "eln_bp", {}),
+    ("ELearning.eln_employee_list", "eln_employee_bp", {}),
+    ("ELearning.eln_request", "eln_request_bp", {}),
+    ("ELearning.eln_courses", "eln_courses_bp", {}),
+    ("ELearning.quizz", "bp", {}),
+    ("personnel_notifications", "personnel_notifications_bp", {}),
+    ("MBO.mbo_notifications", "mbo_notifications_bp", {}),
+    ("employees_notifications", "employees_notifications_bp", {}),
+    ("schema_registry", "schema_bp", {}),
+    ("scheduler", "scheduler_bp", {}),
+    ("health", "health_bp", {}),
+]
+
+
+def _enabled_blueprints():
+    only = {m.strip() for m in os.getenv("APP_BLUEPRINTS", "").split(",") if m.strip()}
+    return [bp for bp in BLUEPRINTS if not only or bp[0] in only or bp[0] == "health"]
 
-# ==== Import các Blueprint hiện có ====
-from auth import auth_bp
-from project import project_bp
-from permission.project_permission import permission_bp
-from employees import employees_bp
-from department import department_bp
-from MBO.personalMBO import employees_bpp
-from MBO.competencyMBO import competency_bp
-from MBO.allocationsMBO import allocations_bp
-from permission.roles import roles_bp
-from MBO.submit import submit_bp
-from MBO.timelineMBO import mbo_timeline_bpp, ensure_table
-from MBO.status import status_bp
-from MBO.attitudeMBO import attitude_bp
-from MBO.mbo_notifications import mbo_notifications_bp
-
-from ELearning.eln import eln_bp
-from ELearning.eln_employee_list import eln_employee_bp
-from ELearning.eln_request import eln_request_bp
-from ELearning.eln_courses import eln_courses_bp
-from ELearning.quizz import bp as quiz_bp
-from personnel_notifications import personnel_notifications_bp
-from employees_notifications import employees_notifications_bp
-# ==== Khởi tạo Flask ====
-app = Flask(__name__)
-CORS(app)
-
-# ==== Đăng ký Blueprints ====
-app.register_blueprint(auth_bp)
-app.register_blueprint(project_bp)
-app.register_blueprint(employees_bp)
-app.register_blueprint(department_bp)
-app.register_blueprint(permission_bp)
-app.register_blueprint(employees_bpp)
-app.register_blueprint(competency_bp)
-app.register_blueprint(allocations_bp)
-app.register_blueprint(roles_bp)
-app.register_blueprint(submit_bp)
-app.register_blueprint(mbo_timeline_bpp)
-app.register_blueprint(status_bp)
-app.register_blueprint(attitude_bp, url_prefix="/attitude")
-app.register_blueprint(eln_bp)
-app.register_blueprint(eln_employee_bp)
-app.register_blueprint(eln_request_bp)
-app.register_blueprint(eln_courses_bp)
-app.register_blueprint(quiz_bp)
-app.register_blueprint(personnel_notifications_bp)
-app.register_blueprint(mbo_notifications_bp)
-app.register_blueprint(employees_notifications_bp)
-# ==== Đảm bảo bảng timeline tồn tại ====
-with app.app_context():
-    ensure_table()
 
 # ============================================================
 # MEDIA ROOT: LUÔN LẤY FILE Ở FILE SERVER (UNC)
@@ -107,23 +101,63 @@ def _send_from_media(rel_path: str):
     return resp
 
 
-# ===== Route chuẩn: /uploads/... =====
-@app.get("/uploads/<path:filename>")
 def serve_uploads(filename):
     return _send_from_media(filename)
 
 
-# ===== Alias cho frontend đang gọi /covers/... và /videos/... =====
-@app.get("/covers/<path:filename>")
 def serve_covers(filename):
     return _send_from_media(f"covers/{filename}")
 
 
-@app.get("/videos/<path:filename>")
 def serve_videos(filename):
     return _send_from_media(f"videos/{filename}")
 
 
-# ==== Chạy server ====
+# ============================================================
+# APP FACTORY
+# Không chạy DDL / tạo thư mục ở đây — các bước đó nằm trong bootstrap.py (chạy 1 lần).
+# Production: gunicorn -c gunicorn.conf.py wsgi:app  (hoặc python serve.py)
+# ============================================================
+def create_app():
+    started = time.perf_counter()
+    from flask_cors import CORS
+    from compression import init_compression
+    from data_versions import init_data_versions
+    from db_routing import STICKY_HEADER, init_db_routing
+    from json_provider import FastJSONProvider
+    from request_metrics import init_request_metrics
+
+    app = Flask(__name__)
+    # FE khác origin, không dùng cookie (không bật credentials) => header read-your-writes phải được expose
+    CORS(app, expose_headers=[STICKY_HEADER])  # header gửi lại: allow_headers mặc định "*"
+    app.json = FastJSONProvider(app)  # orjson nếu có; Decimal/date/bytes xử lý tập trung
+    init_compression(app)  # đăng ký trước => after_request chạy sau cùng, nén body cuối
+    init_data_versions(app)  # request ghi thành công => tăng version nhóm dữ liệu (ETag yếu / 304)
+    init_db_routing(app)  # header / cookie read-your-writes sau request ghi (đọc replica)
+    init_request_metrics(app)  # đo SQL theo request, /metrics, log request chậm
+
+    # ==== Đăng ký Blueprints ====
+    timings = []
+    for module_name, attr, options in _enabled_blueprints():
+        t = time.perf_counter()
+        module = importlib.import_module(module_name)
+        timings.append(((time.perf_counter() - t) * 1000, module_name))
+        app.register_blueprint(getattr(module, attr), **options)
+    app.config["STARTUP_IMPORT_MS"] = {name: round(ms, 1) for ms, name in timings}
+
+    # ===== Route chuẩn: /uploads/... =====
+    app.add_url_rule("/uploads/<path:filename>", view_func=serve_uploads, methods=["GET"])
+    # ===== Alias cho frontend đang gọi /covers/... và /videos/... =====
+    app.add_url_rule("/covers/<path:filename>", view_func=serve_covers, methods=["GET"])
+    app.add_url_rule("/videos/<path:filename>", view_func=serve_videos, methods=["GET"])
+
+    slowest = ", ".join(f"{name} {ms:.0f}ms" for ms, name in sorted(timings, reverse=True)[:5])
+    logger.info("create_app: %d blueprint, %.0f ms (import chậm nhất: %s)",
+                len(app.blueprints), (time.perf_counter() - started) * 1000, slowest)
+    return app
+
+
+# ==== Chạy server (dev, 1 tiến trình) ====
 if __name__ == "__main__":
-    app.run(debug=True, use_reloader=False, host="0.0.0.0", port=5000)
+    bootstrap()
+    create_app().run(debug=True, use_reloader=False, host="0.0.0.0", port=5000)
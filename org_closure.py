@@ -0,0 +1,177 @@
+# org_closure.py
+# Bảng closure cho organization_units: mỗi cặp (tổ tiên, con cháu) là 1 dòng, kèm độ sâu.
+#   - Cây con của X:   WHERE c.ancestor_id = X            (dùng PRIMARY KEY)
+#   - Tổ tiên của X:   WHERE c.descendant_id = X          (dùng idx_closure_descendant)
+# Được cập nhật trong cùng transaction với các API /department/add|update|delete.
+#
+# Rebuild (khi nghi ngờ lệch dữ liệu): POST /department/closure/rebuild
+#                                    hoặc: python org_closure.py
+import argparse
+import json
+import sys
+
+from database import get_connection
+
+CLOSURE_TABLE = "organization_unit_closure"
+
+_BATCH_SIZE = 1000
+
+
+class ClosureCycleError(ValueError):
+    """Chuyển bộ phận vào chính nó hoặc vào con cháu của nó."""
+
+
+# ======================
+# DDL
+# ======================
+def ensure_closure_table(build_if_empty=True):
+    """Tạo bảng closure nếu chưa có; bảng rỗng thì build lần đầu từ organization_units."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {CLOSURE_TABLE} (
+                ancestor_id   INT NOT NULL,
+                descendant_id INT NOT NULL,
+                depth         INT NOT NULL,
+                PRIMARY KEY (ancestor_id, descendant_id),
+                KEY idx_closure_descendant (descendant_id, depth)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        cursor.execute(f"SELECT 1 FROM {CLOSURE_TABLE} LIMIT 1")
+        empty = cursor.fetchone() is None
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    if empty and build_if_empty:
+        rebuild_closure()
+
+
+# ======================
+# Cập nhật tăng dần (gọi bên trong transaction của caller)
+# ======================
+def closure_insert(cursor, unit_id, parent_id=None):
+    """Thêm node mới: dòng (chính nó, 0) + (mỗi tổ tiên của cha, depth + 1)."""
+    cursor.execute(
+        f"INSERT INTO {CLOSURE_TABLE} (ancestor_id, descendant_id, depth) VALUES (%s, %s, 0)",
+        (unit_id, unit_id),
+    )
+    if parent_id:
+        cursor.execute(f"""
+            INSERT INTO {CLOSURE_TABLE} (ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, %s, depth + 1
+            FROM {CLOSURE_TABLE}
+            WHERE descendant_id = %s
+        """, (unit_id, parent_id))
+
+
+def _detach_subtree(cursor, unit_id):
+    """Cắt các liên kết giữa cây con của unit_id và các tổ tiên (không tính chính nó)."""
+    cursor.execute(f"""
+        DELETE link
+        FROM {CLOSURE_TABLE} link
+        JOIN {CLOSURE_TABLE} sub ON sub.descendant_id = link.descendant_id
+        JOIN {CLOSURE_TABLE} sup ON sup.ancestor_id   = link.ancestor_id
+        WHERE sub.ancestor_id   = %s
+          AND sup.descendant_id = %s
+          AND sup.depth > 0
+    """, (unit_id, unit_id))
+
+
+def closure_move(cursor, unit_id, new_parent_id):
+    """
+    Chuyển cây con unit_id sang cha mới.
+    Raise ClosureCycleError nếu cha mới là chính nó hoặc nằm trong cây con của nó.
+    """
+    if new_parent_id:
+        cursor.execute(
+            f"SELECT 1 FROM {CLOSURE_TABLE} WHERE ancestor_id = %s AND descendant_id = %s",
+            (unit_id, new_parent_id),
+        )
+        if cursor.fetchone() is not None:
+            raise ClosureCycleError("Không thể chuyển bộ phận vào chính nó hoặc bộ phận con của nó")
+
+    _detach_subtree(cursor, unit_id)
+
+    if new_parent_id:
+        cursor.execute(f"""
+            INSERT INTO {CLOSURE_TABLE} (ancestor_id, descendant_id, depth)
+            SELECT sup.ancestor_id, sub.descendant_id, sup.depth + sub.depth + 1
+            FROM {CLOSURE_TABLE} sup
+            JOIN {CLOSURE_TABLE} sub ON sub.ancestor_id = %s
+            WHERE sup.descendant_id = %s
+        """, (unit_id, new_parent_id))
+
+
+def closure_delete(cursor, unit_id):
+    """Xoá node: các con còn lại trở thành gốc của cây con riêng (giống cách cây hiển thị)."""
+    _detach_subtree(cursor, unit_id)
+    cursor.execute(
+        f"DELETE FROM {CLOSURE_TABLE} WHERE ancestor_id = %s OR descendant_id = %s",
+        (unit_id, unit_id),
+    )
+
+
+# ======================
+# Rebuild toàn bộ
+# ======================
+def _compute_closure(units):
+    """units: [(id, parent_id)] -> [(ancestor_id, descendant_id, depth)] (chống vòng lặp)."""
+    parent_of = {uid: pid for uid, pid in units}
+    rows = []
+    for uid in parent_of:
+        rows.append((uid, uid, 0))
+        seen = {uid}
+        depth = 0
+        pid = parent_of.get(uid)
+        while pid and pid in parent_of and pid not in seen:
+            depth += 1
+            seen.add(pid)
+            rows.append((pid, uid, depth))
+            pid = parent_of.get(pid)
+    return rows
+
+
+def rebuild_closure(conn=None):
+    """Xoá và build lại toàn bộ bảng closure từ organization_units (1 transaction)."""
+    own_conn = conn is None
+    if own_conn:
+        conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, parent_id FROM organization_units")
+        units = cursor.fetchall()
+        rows = _compute_closure(units)
+
+        cursor.execute(f"DELETE FROM {CLOSURE_TABLE}")
+        for i in range(0, len(rows), _BATCH_SIZE):
+            chunk = rows[i:i + _BATCH_SIZE]
+            placeholders = ", ".join(["(%s, %s, %s)"] * len(chunk))
+            params = [v for row in chunk for v in row]
+            cursor.execute(
+                f"INSERT INTO {CLOSURE_TABLE} (ancestor_id, descendant_id, depth) VALUES {placeholders}",
+                params,
+            )
+        conn.commit()
+        return {"units": len(units), "rows": len(rows)}
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build lại bảng organization_unit_closure")
+    parser.parse_args(argv)
+    ensure_closure_table(build_if_empty=False)
+    print(json.dumps(rebuild_closure(), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+# org_tree.py
+# Cache trong bộ nhớ cho cây organization_units (đã build + serialize sẵn).
+import os
+import re
+import threading
+import time
+
+from data_versions import ORG_UNITS, bump_data_version, get_data_version
+from database import get_connection
+from http_cache import make_etag
+from json_provider import dumps as dumps_json
+
+# Snapshot build lại khi version (bảng data_versions) đổi; TTL chỉ là lưới an toàn khi DB bị sửa tay
+ORG_TREE_TTL = int(os.getenv("ORG_TREE_TTL", "300"))
+
+_CODE_NUMBER_RE = re.compile(r'(\d+)$')
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def extract_code_number(code):
+    """Số ở cuối mã bộ phận, dùng để sắp xếp; mã trống bị đẩy xuống cuối."""
+    if not code:
+        return float('inf')
+    match = _CODE_NUMBER_RE.search(code)
+    return int(match.group(1)) if match else float('inf')
+
+
+def get_org_version():
+    """Version cây tổ chức, lưu ở bảng data_versions nên worker khác bump cũng thấy."""
+    return get_data_version(ORG_UNITS)
+
+
+def bump_org_version():
+    """Gọi sau khi thêm/sửa/xoá bộ phận hoặc thay đổi employee_count."""
+    return bump_data_version(ORG_UNITS)[ORG_UNITS]
+
+
+class OrgSnapshot:
+    """
+    Ảnh chụp toàn bộ organization_units tại một version:
+    - units:    id -> row
+    - children: parent_id -> [id con] (đã sắp theo mã)
+    - roots:    [id gốc]
+    - tree / tree_json / etag: cây đã render cho GET /department/tree
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.units = {row["id"]: row for row in rows}
+        self.children = {}
+        self.roots = []
+
+        for row in rows:
+            parent_id = row["parent_id"]
+            if parent_id and parent_id in self.units:
+                self.children.setdefault(parent_id, []).append(row["id"])
+            else:
+                self.roots.append(row["id"])
+
+        def sort_key(uid):
+            return extract_code_number(self.units[uid]["code"])
+
+        for ids in self.children.values():
+            ids.sort(key=sort_key)
+        self.roots.sort(key=sort_key)
+
+        self.nodes_by_id = {}
+        self.tree = self._build_tree(self.roots, "")
+        self.tree_json = dumps_json(self.tree)
+        self.etag = "org-" + make_etag(self.tree_json)
+
+    def _build_tree(self, ids, prefix):
+        result = []
+        for idx, uid in enumerate(ids):
+            unit = self.units[uid]
+            children = self._build_tree(self.children.get(uid, []), f"{prefix}{idx}-")
+            node = {
+                "key": f"{prefix}{idx}",
+                "data": {
+                    "id": unit["id"],
+                    "name": unit["name"],
+                    "type": unit["type"],
+                    "code": unit["code"],
+                    "parent_id": unit["parent_id"],
+                    "employee_count": unit["employee_count"] or 0,
+                    "employee_id": unit["employee_id"],
+                },
+                "children": children if children else None,
+            }
+            self.nodes_by_id[uid] = node
+            result.append(node)
+        return result
+
+    def subtree(self, root_id=None, depth=None):
+        """
+        Trích cây con từ cấu trúc đã cache (không query DB).
+        - root_id: None => toàn bộ các gốc
+        - depth:   None => không giới hạn; 0 => chỉ node gốc
+        Trả về list node (cùng format với cây đầy đủ) hoặc None nếu root_id không tồn tại.
+        """
+        if root_id is None:
+            nodes = self.tree
+        elif root_id in self.nodes_by_id:
+            nodes = [self.nodes_by_id[root_id]]
+        else:
+            return None
+
+        if depth is None:
+            return nodes
+        return [self._truncate(n, max(depth, 0)) for n in nodes]
+
+    def _truncate(self, node, depth):
+        if depth == 0 or not node["children"]:
+            return {**node, "children": None}
+        return {**node, "children": [self._truncate(c, depth - 1) for c in node["children"]]}
+
+    def descendant_ids(self, unit_id, include_self=True):
+        """Tất cả id con cháu của unit_id (duyệt trong bộ nhớ)."""
+        if unit_id not in self.units:
+            return []
+        result = [unit_id] if include_self else []
+        stack = list(self.children.get(unit_id, []))
+        while stack:
+            uid = stack.pop()
+            result.append(uid)
+            stack.extend(self.children.get(uid, []))
+        return result
+
+    def ancestor_ids(self, unit_id, include_self=True):
+        """Chuỗi tổ tiên [unit, cha, ông, ...] (chống vòng lặp)."""
+        result, seen = [], set()
+        uid = unit_id if include_self else (self.units.get(unit_id) or {}).get("parent_id")
+        while uid and uid in self.units and uid not in seen:
+            seen.add(uid)
+            result.append(uid)
+            uid = self.units[uid]["parent_id"]
+        return result
+
+
+def _load_rows():
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT * FROM organization_units")
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def get_org_snapshot() -> OrgSnapshot:
+    """Lấy snapshot hiện hành; build lại khi version đổi hoặc quá TTL."""
+    global _snapshot
+    snap = _snapshot
+    version = get_org_version()
+    if snap and snap.version == version and time.monotonic() - snap.loaded_at < ORG_TREE_TTL:
+        return snap
+
+    with _lock:
+        snap = _snapshot
+        if snap and snap.version == version and time.monotonic() - snap.loaded_at < ORG_TREE_TTL:
+            return snap
+        snap = OrgSnapshot(version, _load_rows())
+        _snapshot = snap
+        return snap
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify
 from database import get_connection
+from data_versions import conditional_get
+from query_cache import cached, invalidates
 
 roles_bp = Blueprint("roles", __name__)
 
@@ -34,6 +36,8 @@ def _fetch_employee_roles(cur, employee_id):
 # Trả về nhân viên + roles (tên) + role_descriptions (mô tả) dạng chuỗi, dễ dùng cho FE hiện tại
 # -------------------------
 @roles_bp.route("/roles/employees", methods=["GET"])
+@conditional_get("roles", "employees")
+@cached("roles", "employee_roles", "employees2026_base")
 def get_employees_with_roles():
     conn = None
     cursor = None
@@ -72,6 +76,7 @@ def get_employees_with_roles():
 # Trả về id, name, description cho popup cấp quyền
 # -------------------------
 @roles_bp.route("/roles", methods=["GET"])
+@cached("roles")
 def get_all_roles():
     conn = None
     cursor = None
@@ -100,6 +105,7 @@ def get_all_roles():
 # Body: { employee_id, role_id? , role_name? }
 # -------------------------
 @roles_bp.route("/roles/add", methods=["POST"])
+@invalidates("employee_roles")
 def add_role_to_employee():
     conn = None
     cursor = None
@@ -153,6 +159,7 @@ def add_role_to_employee():
 # Body: { employee_id, role_id? , role_name? }
 # -------------------------
 @roles_bp.route("/roles/delete", methods=["POST"])
+@invalidates("employee_roles")
 def delete_role_from_employee():
     conn = None
     cursor = None
@@ -4,29 +4,6 @@ from database import get_connection  # dùng kết nối có sẵn
 
 personnel_notifications_bp = Blueprint("personnel_notifications", __name__)
 
-def cleanup_old_notifications(conn):
-    """
-    Xoá thông báo đã đọc quá 30 ngày.
-    (Không commit tại đây, để hàm gọi chủ động commit 1 lần)
-    """
-    cur = None
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            DELETE FROM nsh.personnel_notifications
-            WHERE status = 'read'
-              AND created_at < DATE_SUB(NOW(), INTERVAL 30 DAY)
-            """
-        )
-    finally:
-        try:
-            if cur:
-                cur.close()
-        except:
-            pass
-
-
 # ============================
 # API: Lấy danh sách thông báo theo employee_id
 # ============================
@@ -132,10 +109,6 @@ def mark_personnel_notification_as_read(notification_id):
         )
         conn.commit()
 
-        # (tuỳ chọn) dọn thông báo cũ sau khi có thay đổi
-        cleanup_old_notifications(conn)
-        conn.commit()
-
         return jsonify({
             "message": "Cập nhật trạng thái thành công.",
             "notification_id": notification_id,
@@ -378,9 +351,6 @@ def add_personnel_notification():
             (employee_id, content),
         )
 
-        # dọn thông báo đã đọc quá 30 ngày
-        cleanup_old_notifications(conn)
-
         conn.commit()
 
         return jsonify({
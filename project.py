@@ -3,6 +3,8 @@ from datetime import datetime
 import traceback
 
 from database import get_connection
+from data_versions import conditional_get
+from query_cache import cached, invalidates
 
 project_bp = Blueprint('project', __name__)
 
@@ -16,6 +18,8 @@ def validate_date(date_str):
         return None
 
 @project_bp.route('/projects', methods=['GET'])
+@conditional_get("projects")
+@cached("dataprojects")
 def get_projects():
     try:
         conn = get_connection()
@@ -58,6 +62,7 @@ def get_project(no):
         return jsonify({"error": str(e)}), 500
 
 @project_bp.route('/projects', methods=['POST'])
+@invalidates("dataprojects")
 def add_project():
     try:
         data = request.get_json()
@@ -113,6 +118,7 @@ def add_project():
         return jsonify({"error": str(e)}), 500
 
 @project_bp.route('/projects/<int:no>', methods=['PUT'])
+@invalidates("dataprojects")
 def update_project(no):
     try:
         data = request.get_json()
@@ -186,6 +192,7 @@ def update_project(no):
         return jsonify({"error": str(e)}), 500
 
 @project_bp.route('/projects/<int:no>', methods=['DELETE'])
+@invalidates("dataprojects")
 def delete_project(no):
     try:
         conn = get_connection()
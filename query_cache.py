@@ -0,0 +1,271 @@
+# query_cache.py
+# Cache kết quả cho các API đọc dữ liệu tham chiếu (đọc hàng nghìn lần, vài lần sửa mỗi ngày).
+#
+#   @cached("roles")                       -> cache response 200 theo route + tham số, gắn tag = bảng đã đọc
+#   @invalidates("roles", "employee_roles") -> route ghi: request thành công => các entry gắn tag đó hết hiệu lực
+#   invalidate_tags("employees2026_base")   -> code ghi ngoài request (CLI, job nền)
+#
+# Hết hiệu lực theo tag dùng bộ đếm ở bảng data_versions: tag (tên bảng) quy về nhóm của nó
+# (data_versions.TABLE_GROUPS, vd. "eln" -> nhóm eln cũng dùng cho ETag của @conditional_get), bảng chưa có nhóm
+# dùng "table:<bảng>". Version nằm trong key, nên nhóm bị bump (invalidate_tags, request ghi của blueprint,
+# bump_data_version ở job) thì key mới khác key cũ — mọi worker cùng thấy (trễ tối đa DATA_VERSION_TTL giây),
+# entry cũ không còn ai đọc và tự bị đẩy ra theo LRU / TTL.
+#
+# Backend (QUERY_CACHE_BACKEND):
+#   memory (mặc định)  LRU trong tiến trình, giới hạn số entry + tổng byte
+#   redis              dùng chung giữa các worker (cần package redis + QUERY_CACHE_REDIS_URL);
+#                      không kết nối được thì quay về memory
+#
+# Cấu hình: QUERY_CACHE_ENABLED (1/0), QUERY_CACHE_TTL (giây, 300), QUERY_CACHE_MAX_ENTRIES (512),
+#           QUERY_CACHE_MAX_BYTES (64MB).
+# Số liệu hit/miss/evict xuất ra /metrics (mbo_query_cache_*).
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from flask import Response, current_app, request
+
+from data_versions import bump_data_version, get_data_versions, groups_for_tables
+from db_routing import served_from_replica
+from json_provider import dumps_bytes, loads
+from request_metrics import register_metrics_renderer
+
+logger = logging.getLogger(__name__)
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "1") != "0"
+QUERY_CACHE_BACKEND = os.getenv("QUERY_CACHE_BACKEND", "memory")
+QUERY_CACHE_REDIS_URL = os.getenv("QUERY_CACHE_REDIS_URL", "redis://127.0.0.1:6379/0")
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", "300"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512"))
+QUERY_CACHE_MAX_BYTES = int(os.getenv("QUERY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+_KEY_PREFIX = "mbo:qc:"
+
+
+# ======================
+# Backend
+# ======================
+class MemoryBackend:
+    """LRU + TTL trong tiến trình; cũng là bản thay thế cục bộ cho backend dùng chung."""
+
+    name = "memory"
+
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, max_bytes=QUERY_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key -> (expires_at, value bytes)
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._bytes += len(value)
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, value = self._data.pop(key)
+        self._bytes -= len(value)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes, "evictions": self.evictions}
+
+
+class RedisBackend:
+    """Cache dùng chung giữa các worker; TTL do Redis quản lý."""
+
+    name = "redis"
+
+    def __init__(self, url):
+        import redis  # tuỳ chọn, chỉ cần khi QUERY_CACHE_BACKEND=redis
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._client.ping()
+
+    def get(self, key):
+        return self._client.get(_KEY_PREFIX + key)
+
+    def set(self, key, value, ttl):
+        self._client.setex(_KEY_PREFIX + key, ttl, value)
+
+    def clear(self):
+        for key in self._client.scan_iter(_KEY_PREFIX + "*"):
+            self._client.delete(key)
+
+    def stats(self):
+        return {}
+
+
+def _make_backend():
+    if QUERY_CACHE_BACKEND == "redis":
+        try:
+            return RedisBackend(QUERY_CACHE_REDIS_URL)
+        except Exception as e:
+            logger.warning("Không dùng được Redis cho query cache (%s), dùng cache trong bộ nhớ", e)
+    return MemoryBackend()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _make_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """Thay backend (vd. MemoryBackend riêng khi chạy benchmark)."""
+    global _backend
+    _backend = backend
+
+
+# ======================
+# Số liệu
+# ======================
+_stats_lock = threading.Lock()
+_counters = defaultdict(int)  # (cache name, result) -> số lần; result: hit | miss | store | error
+
+
+def _count(name, result):
+    with _stats_lock:
+        _counters[(name, result)] += 1
+
+
+def _render_metrics(lines):
+    with _stats_lock:
+        counters = sorted(_counters.items())
+    lines.append("# HELP mbo_query_cache_requests_total Số lần tra cache kết quả theo cache và kết quả")
+    lines.append("# TYPE mbo_query_cache_requests_total counter")
+    for (name, result), count in counters:
+        lines.append(f'mbo_query_cache_requests_total{{cache="{name}",result="{result}"}} {count}')
+    backend_stats = get_backend().stats() if _backend is not None else {}
+    if backend_stats:
+        lines.append("# TYPE mbo_query_cache_entries gauge")
+        lines.append(f"mbo_query_cache_entries {backend_stats['entries']}")
+        lines.append("# TYPE mbo_query_cache_bytes gauge")
+        lines.append(f"mbo_query_cache_bytes {backend_stats['bytes']}")
+        lines.append("# TYPE mbo_query_cache_evictions_total counter")
+        lines.append(f"mbo_query_cache_evictions_total {backend_stats['evictions']}")
+
+
+register_metrics_renderer(_render_metrics)
+
+
+# ======================
+# Key / tag
+# ======================
+def _cache_key(name, tags):
+    versions = get_data_versions(*groups_for_tables(*tags))
+    args = sorted((k, tuple(request.args.getlist(k))) for k in request.args)
+    view_args = sorted((request.view_args or {}).items())
+    raw = repr((name, view_args, args, sorted(versions.items())))
+    return name + ":" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def invalidate_tags(*tags):
+    """
+    Cho các entry gắn tag (tên bảng) hết hiệu lực ở mọi worker; gọi sau khi commit.
+    Bump nhóm data_versions của bảng => ETag (@conditional_get) của cùng nhóm cũng đổi.
+    """
+    if tags:
+        bump_data_version(*groups_for_tables(*tags))
+
+
+# ======================
+# Decorator
+# ======================
+def _pack(resp):
+    head = dumps_bytes({"status": resp.status_code, "mimetype": resp.mimetype})
+    return head + b"\n" + resp.get_data()
+
+
+def _unpack(value):
+    head, _, body = value.partition(b"\n")
+    meta = loads(head)
+    return Response(body, status=meta["status"], mimetype=meta["mimetype"])
+
+
+def cached(*tags, ttl=None):
+    """
+    Cache response 200 của route GET. tags = các bảng route đọc.
+    Key = endpoint + view args + query string + version các tag.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not QUERY_CACHE_ENABLED or request.method != "GET":
+                return view(*args, **kwargs)
+
+            name = request.endpoint or view.__name__
+            backend = get_backend()
+            try:
+                key = _cache_key(name, tags)
+                value = backend.get(key)
+            except Exception:
+                logger.exception("Đọc query cache %s lỗi", name)
+                _count(name, "error")
+                return view(*args, **kwargs)
+
+            if value is not None:
+                _count(name, "hit")
+                return _unpack(value)
+
+            _count(name, "miss")
+            resp = current_app.make_response(view(*args, **kwargs))
+            # body đọc từ replica có thể cũ hơn version trong key => không lưu
+            if (resp.status_code == 200 and not resp.is_streamed and "Set-Cookie" not in resp.headers
+                    and not served_from_replica()):
+                try:
+                    backend.set(key, _pack(resp), ttl or QUERY_CACHE_TTL)
+                    _count(name, "store")
+                except Exception:
+                    logger.exception("Ghi query cache %s lỗi", name)
+                    _count(name, "error")
+            return resp
+        return wrapper
+    return decorator
+
+
+def invalidates(*tags):
+    """Route ghi: response < 400 => invalidate_tags(*tags)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            resp = current_app.make_response(view(*args, **kwargs))
+            if resp.status_code < 400:
+                invalidate_tags(*tags)
+            return resp
+        return wrapper
+    return decorator
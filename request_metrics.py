@@ -0,0 +1,379 @@
+# request_metrics.py
+# Đo SQL theo từng request + metrics kiểu Prometheus + log request chậm + cProfile lấy mẫu.
+#
+#   - database.get_connection() trả về connection bọc (InstrumentedConnection): mỗi execute/fetch/commit
+#     được bấm giờ và cộng vào thống kê của request hiện tại (flask.g). Ngoài request (job nền, CLI)
+#     thì không ghi nhận gì, chỉ chuyển tiếp.
+#   - Cuối request: cộng vào histogram theo endpoint; request vượt SLOW_REQUEST_MS thì ghi 1 dòng log JSON
+#     (logger "mbo.slow_request") kèm các câu SQL tốn thời gian nhất.
+#   - GET /metrics: text format của Prometheus (số liệu riêng từng process).
+#   - PROFILE_ENDPOINTS="employees.get_employees_by_department,..." hoặc "*", PROFILE_SAMPLE_RATE=0.05:
+#     chạy cProfile cho 1 phần request của endpoint đó, ghi file .prof vào PROFILE_DIR.
+#
+# Đăng ký: init_request_metrics(app) trong main.py.
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from flask import Blueprint, Response, g, has_request_context, request
+
+metrics_bp = Blueprint("metrics", __name__)
+
+logger = logging.getLogger("mbo.slow_request")
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+SLOW_REQUEST_TOP_STATEMENTS = int(os.getenv("SLOW_REQUEST_TOP_STATEMENTS", "5"))
+PROFILE_ENDPOINTS = {e.strip() for e in os.getenv("PROFILE_ENDPOINTS", "").split(",") if e.strip()}
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.05"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "mbo_profiles"))
+
+_WS_RE = re.compile(r"\s+")
+_STATEMENT_MAX_LEN = 300
+
+
+# ======================
+# Thống kê của 1 request
+# ======================
+class RequestStats:
+    __slots__ = ("statements", "rows", "db_time", "connect_time", "connections", "by_statement")
+
+    def __init__(self):
+        self.statements = 0
+        self.rows = 0
+        self.db_time = 0.0
+        self.connect_time = 0.0
+        self.connections = 0
+        self.by_statement = defaultdict(lambda: [0, 0.0])  # sql -> [số lần, tổng giây]
+
+    def add_statement(self, sql, elapsed):
+        self.statements += 1
+        self.db_time += elapsed
+        key = _WS_RE.sub(" ", str(sql)).strip()[:_STATEMENT_MAX_LEN]
+        entry = self.by_statement[key]
+        entry[0] += 1
+        entry[1] += elapsed
+
+    def top_statements(self, n):
+        ranked = sorted(self.by_statement.items(), key=lambda kv: kv[1][1], reverse=True)[:n]
+        return [{"sql": sql, "count": c, "total_ms": round(t * 1000, 2)} for sql, (c, t) in ranked]
+
+
+def current_stats():
+    """Thống kê của request hiện tại (None nếu không ở trong request)."""
+    if not has_request_context():
+        return None
+    stats = g.get("_db_stats")
+    if stats is None:
+        stats = g._db_stats = RequestStats()
+    return stats
+
+
+# ======================
+# Connection / cursor bọc
+# ======================
+def _count_rows(result):
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+class InstrumentedCursor:
+    def __init__(self, cursor, stats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._cursor, name, value)
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._stats.rows += 1
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._stats.add_statement(operation, time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._stats.add_statement(operation, time.perf_counter() - start)
+
+    def _timed_fetch(self, method, *args):
+        start = time.perf_counter()
+        result = getattr(self._cursor, method)(*args)
+        self._stats.db_time += time.perf_counter() - start
+        self._stats.rows += _count_rows(result)
+        return result
+
+    def fetchone(self):
+        return self._timed_fetch("fetchone")
+
+    def fetchmany(self, *args, **kwargs):
+        start = time.perf_counter()
+        result = self._cursor.fetchmany(*args, **kwargs)
+        self._stats.db_time += time.perf_counter() - start
+        self._stats.rows += len(result)
+        return result
+
+    def fetchall(self):
+        return self._timed_fetch("fetchall")
+
+
+class InstrumentedConnection:
+    def __init__(self, conn, stats):
+        self._conn = conn
+        self._stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        # vd. conn.autocommit = False phải tới connection thật
+        if name.startswith("_"):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._conn.close()
+        return False
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._stats)
+
+    def commit(self):
+        start = time.perf_counter()
+        try:
+            return self._conn.commit()
+        finally:
+            self._stats.add_statement("COMMIT", time.perf_counter() - start)
+
+    def rollback(self):
+        start = time.perf_counter()
+        try:
+            return self._conn.rollback()
+        finally:
+            self._stats.add_statement("ROLLBACK", time.perf_counter() - start)
+
+
+def instrument_connection(connect):
+    """Gọi connect() (tạo connection thật), bấm giờ và bọc lại nếu đang ở trong request."""
+    stats = current_stats()
+    if stats is None:
+        return connect()
+    start = time.perf_counter()
+    conn = connect()
+    stats.connect_time += time.perf_counter() - start
+    stats.connections += 1
+    return InstrumentedConnection(conn, stats)
+
+
+# ======================
+# Histogram theo endpoint
+# ======================
+class _Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}  # endpoint -> [counts theo bucket..., sum, count]
+
+    def observe(self, endpoint, value):
+        series = self.series.get(endpoint)
+        if series is None:
+            series = self.series[endpoint] = [0] * len(self.buckets) + [0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[i] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for endpoint, series in sorted(self.series.items()):
+            label = _label(endpoint)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{endpoint="{label}",le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{endpoint="{label}",le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{endpoint="{label}"}} {series[-2]}')
+            lines.append(f'{self.name}_count{{endpoint="{label}"}} {series[-1]}')
+
+
+_TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+_metrics_lock = threading.Lock()
+_histograms = {
+    "duration": _Histogram("mbo_http_request_duration_seconds", "Thời gian xử lý request", _TIME_BUCKETS),
+    "db_time": _Histogram("mbo_db_time_seconds", "Tổng thời gian SQL (execute + fetch + commit) mỗi request", _TIME_BUCKETS),
+    "connect": _Histogram("mbo_db_connect_seconds", "Thời gian mở connection mỗi request", _TIME_BUCKETS),
+    "statements": _Histogram("mbo_db_statements", "Số câu SQL mỗi request", _COUNT_BUCKETS),
+    "rows": _Histogram("mbo_db_rows_fetched", "Số dòng đọc về mỗi request", (0, 1, 10, 100, 1000, 10000, 100000)),
+}
+_requests_total = defaultdict(int)  # (endpoint, status) -> số request
+_slow_total = defaultdict(int)      # endpoint -> số request chậm
+_extra_renderers = []               # module khác góp số liệu vào /metrics: fn(lines)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _record(endpoint, status, duration, stats):
+    with _metrics_lock:
+        _histograms["duration"].observe(endpoint, duration)
+        _histograms["db_time"].observe(endpoint, stats.db_time)
+        _histograms["connect"].observe(endpoint, stats.connect_time)
+        _histograms["statements"].observe(endpoint, stats.statements)
+        _histograms["rows"].observe(endpoint, stats.rows)
+        _requests_total[(endpoint, status)] += 1
+
+
+def register_metrics_renderer(fn):
+    """fn(lines) thêm các dòng Prometheus của module khác (vd. query_cache)."""
+    _extra_renderers.append(fn)
+
+
+def render_metrics():
+    lines = []
+    with _metrics_lock:
+        lines.append("# HELP mbo_http_requests_total Số request theo endpoint và status")
+        lines.append("# TYPE mbo_http_requests_total counter")
+        for (endpoint, status), count in sorted(_requests_total.items()):
+            lines.append(f'mbo_http_requests_total{{endpoint="{_label(endpoint)}",status="{status}"}} {count}')
+        lines.append("# HELP mbo_http_slow_requests_total Số request vượt SLOW_REQUEST_MS")
+        lines.append("# TYPE mbo_http_slow_requests_total counter")
+        for endpoint, count in sorted(_slow_total.items()):
+            lines.append(f'mbo_http_slow_requests_total{{endpoint="{_label(endpoint)}"}} {count}')
+        for hist in _histograms.values():
+            hist.render(lines)
+    for render in _extra_renderers:
+        render(lines)
+    return "\n".join(lines) + "\n"
+
+
+# ======================
+# Hook request
+# ======================
+def _should_profile(endpoint):
+    if not PROFILE_ENDPOINTS or not endpoint:
+        return False
+    if "*" not in PROFILE_ENDPOINTS and endpoint not in PROFILE_ENDPOINTS:
+        return False
+    return random.random() < PROFILE_SAMPLE_RATE
+
+
+def _before_request():
+    g._request_started = time.perf_counter()
+    current_stats()
+    if _should_profile(request.endpoint):
+        import cProfile  # chỉ nạp khi bật PROFILE_ENDPOINTS
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            g._profiler = profiler
+        except ValueError:
+            pass  # đã có profiler khác đang chạy trong thread này
+
+
+def _stop_profiler(endpoint):
+    profiler = g.pop("_profiler", None)
+    if profiler is None:
+        return None
+    profiler.disable()
+    try:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{endpoint}-{int(time.time() * 1000)}.prof")
+        profiler.dump_stats(path)
+        return path
+    except OSError:
+        return None
+
+
+def _finish_request(status):
+    if g.get("_request_finished") or g.get("_request_started") is None:
+        return
+    g._request_finished = True
+
+    endpoint = request.endpoint or "unknown"
+    profile_path = _stop_profiler(endpoint)
+    duration = time.perf_counter() - g._request_started
+    stats = current_stats()
+    _record(endpoint, status, duration, stats)
+
+    if duration * 1000 >= SLOW_REQUEST_MS or profile_path:
+        if duration * 1000 >= SLOW_REQUEST_MS:
+            with _metrics_lock:
+                _slow_total[endpoint] += 1
+        logger.warning(json.dumps({
+            "event": "slow_request" if duration * 1000 >= SLOW_REQUEST_MS else "profiled_request",
+            "endpoint": endpoint,
+            "method": request.method,
+            "path": request.path,
+            "status": status,
+            "duration_ms": round(duration * 1000, 2),
+            "db_ms": round(stats.db_time * 1000, 2),
+            "connect_ms": round(stats.connect_time * 1000, 2),
+            "connections": stats.connections,
+            "statements": stats.statements,
+            "rows": stats.rows,
+            "top_statements": stats.top_statements(SLOW_REQUEST_TOP_STATEMENTS),
+            "profile": profile_path,
+        }, ensure_ascii=False))
+
+
+def _after_request(response):
+    _finish_request(response.status_code)
+    return response
+
+
+def _teardown_request(exc):
+    # after_request không chạy khi view ném exception chưa bắt
+    if exc is not None:
+        _finish_request(500)
+
+
+def init_request_metrics(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.register_blueprint(metrics_bp)
+    if not logger.handlers and not logging.getLogger().handlers:
+        logging.basicConfig(level=logging.INFO)
+
+
+# GET /metrics — Prometheus text format
+@metrics_bp.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,332 @@
+# scheduler.py
+# Chạy job bảo trì định kỳ ngoài luồng request (dọn thông báo, đối soát counter, rebuild employee_count...).
+#
+#   - Bảng scheduled_jobs lưu lịch chạy / trạng thái / lỗi gần nhất của từng job (dùng chung mọi worker).
+#   - Khoá: worker "nhận" job bằng 1 câu UPDATE có điều kiện (next_run_at tới hạn, chưa ai giữ khoá hoặc khoá
+#     đã hết hạn) => chỉ đúng 1 worker chạy mỗi lượt; worker chết giữa chừng thì khoá tự hết hạn sau timeout.
+#   - Lỗi: thử lại sau retry_delay * 2^(lần lỗi - 1) (tối đa max_retries lần), sau đó quay về lịch thường.
+#
+# Chạy:
+#   - trong worker web: start_scheduler() (serve.worker_init, khi SCHEDULER_ENABLED=1) — thread nền
+#   - tiến trình riêng:  python scheduler.py            (vòng lặp)
+#                        python scheduler.py --once     (chạy các job tới hạn rồi thoát)
+#                        python scheduler.py --run notification_retention   (chạy ngay 1 job)
+#
+# Khai báo job: @job("tên", interval=3600) trong jobs.py.
+# API: GET /scheduler/jobs, POST /scheduler/jobs/<name>/run (đưa job lên chạy ở lượt quét kế tiếp)
+import argparse
+import json
+import logging
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+from flask import Blueprint, jsonify
+
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+scheduler_bp = Blueprint("scheduler", __name__, url_prefix="/scheduler")
+
+JOBS_TABLE = "scheduled_jobs"
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") != "0"
+SCHEDULER_POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", "30"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_jobs = {}  # name -> Job
+
+
+class Job:
+    def __init__(self, name, fn, interval, timeout, max_retries, retry_delay):
+        self.name = name
+        self.fn = fn
+        self.interval = int(interval)
+        self.timeout = int(timeout)
+        self.max_retries = int(max_retries)
+        self.retry_delay = int(retry_delay)
+
+
+def job(name, interval, timeout=600, max_retries=3, retry_delay=60):
+    """
+    Đăng ký hàm làm job định kỳ. Hàm không nhận tham số, trả dict kết quả (ghi vào last_result).
+    - interval:    giây giữa 2 lần chạy thành công
+    - timeout:     thời hạn khoá (giây); quá hạn coi như worker chạy job đã chết
+    """
+    def decorator(fn):
+        _jobs[name] = Job(name, fn, interval, timeout, max_retries, retry_delay)
+        return fn
+    return decorator
+
+
+def registered_jobs():
+    _load_jobs()
+    return dict(_jobs)
+
+
+def _load_jobs():
+    import jobs  # noqa: F401  (đăng ký các job qua @job)
+
+
+# ======================
+# Bảng scheduled_jobs
+# ======================
+def ensure_jobs_table():
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {JOBS_TABLE} (
+                name             VARCHAR(64) NOT NULL PRIMARY KEY,
+                interval_seconds INT NOT NULL,
+                next_run_at      DATETIME NOT NULL,
+                locked_by        VARCHAR(128) NULL,
+                locked_until     DATETIME NULL,
+                attempts         INT NOT NULL DEFAULT 0,
+                run_count        INT NOT NULL DEFAULT 0,
+                last_status      VARCHAR(16) NULL,
+                last_started_at  DATETIME NULL,
+                last_finished_at DATETIME NULL,
+                last_duration_ms INT NULL,
+                last_error       TEXT NULL,
+                last_result      TEXT NULL,
+                updated_at       TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def sync_jobs():
+    """Thêm job mới vào bảng (lần chạy đầu lệch ngẫu nhiên để các job không dồn cùng lúc), cập nhật interval."""
+    _load_jobs()
+    if not _jobs:
+        return
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(f"""
+            INSERT INTO {JOBS_TABLE} (name, interval_seconds, next_run_at)
+            VALUES (%s, %s, NOW() + INTERVAL %s SECOND)
+            ON DUPLICATE KEY UPDATE interval_seconds = VALUES(interval_seconds)
+        """, [(j.name, j.interval, random.randint(30, 300)) for j in _jobs.values()])
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _claim(conn, job_obj, force=False):
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            UPDATE {JOBS_TABLE}
+               SET locked_by = %s,
+                   locked_until = NOW() + INTERVAL %s SECOND,
+                   last_status = 'running',
+                   last_started_at = NOW()
+             WHERE name = %s
+               AND (%s OR next_run_at <= NOW())
+               AND (locked_until IS NULL OR locked_until < NOW())
+        """, (WORKER_ID, job_obj.timeout, job_obj.name, bool(force)))
+        claimed = cursor.rowcount == 1
+        conn.commit()
+        return claimed
+    finally:
+        cursor.close()
+
+
+def _finish(conn, job_obj, ok, duration_ms, result=None, error=None):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        if ok:
+            cursor.execute(f"""
+                UPDATE {JOBS_TABLE}
+                   SET next_run_at = NOW() + INTERVAL interval_seconds SECOND,
+                       attempts = 0, run_count = run_count + 1,
+                       locked_by = NULL, locked_until = NULL,
+                       last_status = 'ok', last_finished_at = NOW(), last_duration_ms = %s,
+                       last_error = NULL, last_result = %s
+                 WHERE name = %s AND locked_by = %s
+            """, (duration_ms, json.dumps(result, ensure_ascii=False, default=str), job_obj.name, WORKER_ID))
+        else:
+            cursor.execute(f"SELECT attempts FROM {JOBS_TABLE} WHERE name = %s", (job_obj.name,))
+            attempts = (cursor.fetchone() or {"attempts": 0})["attempts"] + 1
+            if attempts <= job_obj.max_retries:
+                delay = min(job_obj.retry_delay * 2 ** (attempts - 1), job_obj.interval)
+            else:
+                delay, attempts = job_obj.interval, 0  # hết lượt thử lại => chờ lịch thường
+            cursor.execute(f"""
+                UPDATE {JOBS_TABLE}
+                   SET next_run_at = NOW() + INTERVAL %s SECOND,
+                       attempts = %s, run_count = run_count + 1,
+                       locked_by = NULL, locked_until = NULL,
+                       last_status = 'error', last_finished_at = NOW(), last_duration_ms = %s,
+                       last_error = %s
+                 WHERE name = %s AND locked_by = %s
+            """, (delay, attempts, duration_ms, (error or "")[:4000], job_obj.name, WORKER_ID))
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+def run_job(name, force=False):
+    """
+    Nhận khoá rồi chạy 1 job. Trả None nếu job chưa tới hạn / worker khác đang chạy,
+    ngược lại trả {"status": "ok"|"error", ...}.
+    """
+    job_obj = registered_jobs()[name]
+    conn = get_connection()
+    try:
+        if not _claim(conn, job_obj, force=force):
+            return None
+    finally:
+        conn.close()
+
+    started = time.perf_counter()
+    try:
+        result = job_obj.fn()
+        ok, error = True, None
+    except Exception as e:
+        logger.exception("Job %s lỗi", name)
+        result, ok, error = None, False, f"{type(e).__name__}: {e}"
+    duration_ms = int((time.perf_counter() - started) * 1000)
+
+    conn = get_connection()
+    try:
+        _finish(conn, job_obj, ok, duration_ms, result=result, error=error)
+    finally:
+        conn.close()
+    logger.info("Job %s %s trong %d ms: %s", name, "xong" if ok else "lỗi", duration_ms, result or error)
+    return {"status": "ok" if ok else "error", "duration_ms": duration_ms, "result": result, "error": error}
+
+
+def run_due_jobs():
+    results = {}
+    for name in registered_jobs():
+        try:
+            outcome = run_job(name)
+        except Exception:
+            logger.exception("Không chạy được job %s", name)  # lỗi DB khi nhận khoá: thử lại lượt sau
+            continue
+        if outcome is not None:
+            results[name] = outcome
+    return results
+
+
+# ======================
+# Thread nền trong worker
+# ======================
+_stop_event = threading.Event()
+_thread = None
+
+
+def _loop():
+    # lệch pha giữa các worker để không cùng lúc tranh khoá
+    if _stop_event.wait(random.uniform(0, SCHEDULER_POLL_SECONDS)):
+        return
+    while not _stop_event.is_set():
+        run_due_jobs()
+        _stop_event.wait(SCHEDULER_POLL_SECONDS)
+
+
+def start_scheduler():
+    """Gọi sau bootstrap() (bảng scheduled_jobs và danh sách job đã được tạo / đồng bộ ở đó)."""
+    global _thread
+    if not SCHEDULER_ENABLED or (_thread is not None and _thread.is_alive()):
+        return False
+    _stop_event.clear()
+    _thread = threading.Thread(target=_loop, name="mbo-scheduler", daemon=True)
+    _thread.start()
+    return True
+
+
+def stop_scheduler(timeout=5):
+    """Dừng nhận job mới; job đang chạy dở giữ khoá tới khi xong hoặc khoá hết hạn."""
+    _stop_event.set()
+    if _thread is not None:
+        _thread.join(timeout)
+
+
+# ======================
+# API
+# ======================
+@scheduler_bp.route("/jobs", methods=["GET"])
+def list_jobs():
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"""
+            SELECT name, interval_seconds, next_run_at, locked_by, locked_until, attempts, run_count,
+                   last_status, last_started_at, last_finished_at, last_duration_ms, last_error, last_result
+            FROM {JOBS_TABLE}
+            ORDER BY name
+        """)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    registered = registered_jobs()
+    for row in rows:
+        row["registered"] = row["name"] in registered
+    return jsonify(rows), 200
+
+
+@scheduler_bp.route("/jobs/<name>/run", methods=["POST"])
+def trigger_job(name):
+    if name not in registered_jobs():
+        return jsonify({"error": f"Không có job {name}"}), 404
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"UPDATE {JOBS_TABLE} SET next_run_at = NOW() WHERE name = %s", (name,))
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return jsonify({"message": f"Job {name} sẽ chạy ở lượt quét kế tiếp"}), 202
+
+
+# ======================
+# CLI (tiến trình riêng)
+# ======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chạy job bảo trì định kỳ")
+    parser.add_argument("--once", action="store_true", help="Chạy các job tới hạn rồi thoát")
+    parser.add_argument("--run", metavar="NAME", help="Chạy ngay 1 job (bỏ qua lịch, vẫn giữ khoá)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    ensure_jobs_table()
+    sync_jobs()
+
+    if args.run:
+        if args.run not in registered_jobs():
+            print(f"Không có job {args.run}; các job: {', '.join(sorted(registered_jobs()))}")
+            return 2
+        outcome = run_job(args.run, force=True)
+        print(json.dumps(outcome if outcome is not None else {"status": "locked"}, ensure_ascii=False, default=str))
+        return 0 if outcome and outcome["status"] == "ok" else 1
+    if args.once:
+        print(json.dumps(run_due_jobs(), ensure_ascii=False, default=str, indent=2))
+        return 0
+
+    try:
+        while True:
+            run_due_jobs()
+            time.sleep(SCHEDULER_POLL_SECONDS)
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    # chạy qua module "scheduler" (không phải __main__) để jobs.py đăng ký vào cùng registry
+    import scheduler
+
+    sys.exit(scheduler.main())
@@ -0,0 +1,83 @@
+# schema_registry.py
+# Registry cấu trúc DB (bảng -> cột) nạp 1 lần từ information_schema rồi tra cứu trong bộ nhớ.
+# Thay cho việc query information_schema / SHOW COLUMNS trong từng request.
+#
+# Nạp lúc khởi động (main.py); sau khi migrate DB gọi POST /schema/refresh để nạp lại.
+import threading
+
+from flask import Blueprint, jsonify
+from database import get_connection, DB_SCHEMA
+
+schema_bp = Blueprint("schema_registry", __name__, url_prefix="/schema")
+
+_SYSTEM_SCHEMAS = ("mysql", "information_schema", "performance_schema", "sys")
+
+_lock = threading.Lock()
+_columns = None  # {(schema, table): {column, ...}} - tất cả viết thường
+
+
+def _split(name):
+    """'nsh.personalmbo' / '`nsh`.`PersonalMBO`' / 'personalmbo' -> ('nsh', 'personalmbo')."""
+    name = name.replace("`", "").strip().lower()
+    if "." in name:
+        schema, table = name.split(".", 1)
+        return schema, table
+    return DB_SCHEMA.lower(), name
+
+
+def refresh():
+    """Đọc lại toàn bộ information_schema.COLUMNS (1 query). Trả về số bảng đã nạp."""
+    global _columns
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(_SYSTEM_SCHEMAS))
+        cursor.execute(f"""
+            SELECT TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA NOT IN ({placeholders})
+        """, _SYSTEM_SCHEMAS)
+        columns = {}
+        for schema, table, column in cursor.fetchall():
+            columns.setdefault((schema.lower(), table.lower()), set()).add(column.lower())
+    finally:
+        cursor.close()
+        conn.close()
+
+    with _lock:
+        _columns = columns
+    return len(columns)
+
+
+def _registry():
+    if _columns is None:
+        with _lock:
+            loaded = _columns is not None
+        if not loaded:
+            refresh()
+    return _columns
+
+
+def has_table(name):
+    return _split(name) in _registry()
+
+
+def has_column(table, column):
+    return column.lower() in _registry().get(_split(table), ())
+
+
+def table_columns(table):
+    """Tập cột (viết thường) của bảng; bảng không tồn tại -> set()."""
+    return set(_registry().get(_split(table), ()))
+
+
+# ======================
+# API
+# ======================
+@schema_bp.route("/refresh", methods=["POST"])
+def refresh_schema_registry():
+    try:
+        tables = refresh()
+        return jsonify({"message": "Đã nạp lại cấu trúc DB", "tables": tables})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
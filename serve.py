@@ -0,0 +1,91 @@
+# serve.py
+# Chạy server production (thay cho app.run(debug=True) của main.py).
+#
+#   python serve.py
+#
+#   - Linux: exec gunicorn với gunicorn.conf.py — master preload app + bootstrap 1 lần, fork WEB_WORKERS worker,
+#     mỗi worker WEB_THREADS thread, pool connection riêng từng worker.
+#   - Windows (server hiện tại) hoặc chưa cài gunicorn: waitress, 1 tiến trình WEB_THREADS thread.
+#
+# Cấu hình: WEB_BIND (mặc định 0.0.0.0:5000), WEB_WORKERS, WEB_THREADS (mặc định 8),
+#           WEB_GRACEFUL_TIMEOUT (giây, mặc định 30), DB_POOL_SIZE (mặc định = WEB_THREADS + 2).
+import logging
+import os
+import signal
+import sys
+
+logger = logging.getLogger(__name__)
+
+WEB_BIND = os.getenv("WEB_BIND", "0.0.0.0:5000")
+WEB_THREADS = int(os.getenv("WEB_THREADS", "8"))
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", str(min((os.cpu_count() or 1) * 2 + 1, 8))))
+WEB_GRACEFUL_TIMEOUT = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "0")) or WEB_THREADS + 2
+
+
+# ======================
+# Vòng đời worker (dùng chung cho gunicorn.conf.py và waitress)
+# ======================
+def worker_init():
+    """
+    Trong từng worker sau khi fork: pool connection riêng; bootstrap nếu master chưa chạy (không preload);
+    thread scheduler (SCHEDULER_ENABLED=0 khi chạy job bằng tiến trình riêng: python scheduler.py).
+    """
+    from bootstrap import bootstrap
+    from database import init_pool
+    from scheduler import start_scheduler
+
+    init_pool(DB_POOL_SIZE)
+    bootstrap()
+    start_scheduler()
+
+
+def worker_shutdown():
+    """Bắt đầu dừng: /health/ready trả 503, dừng nhận job, đóng connection rảnh trong pool."""
+    from database import close_pool
+    from health import mark_draining
+    from scheduler import stop_scheduler
+
+    mark_draining()
+    stop_scheduler()
+    close_pool()
+
+
+def _run_waitress():
+    from waitress import serve
+
+    from bootstrap import bootstrap
+    from main import create_app
+
+    bootstrap()
+    app = create_app()
+    worker_init()
+
+    def _stop(signum, frame):
+        worker_shutdown()
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, _stop)
+    host, _, port = WEB_BIND.rpartition(":")
+    logger.info("waitress %s, %s thread", WEB_BIND, WEB_THREADS)
+    try:
+        serve(app, host=host or "0.0.0.0", port=int(port), threads=WEB_THREADS)
+    finally:
+        worker_shutdown()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    if os.name != "nt":
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            logger.warning("Chưa cài gunicorn, chạy waitress 1 tiến trình")
+        else:
+            conf = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")
+            os.execvp(sys.executable, [sys.executable, "-m", "gunicorn", "-c", conf, "wsgi:app"])
+    _run_waitress()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+# wsgi.py
+# Entry point WSGI cho production: gunicorn -c gunicorn.conf.py wsgi:app
+# App tạo 1 lần lúc import (preload ở master rồi fork worker); bootstrap chạy trong hook của gunicorn.
+from main import create_app
+
+app = create_app()